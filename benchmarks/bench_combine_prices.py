@@ -0,0 +1,46 @@
+"""
+Compares combining a universe of single-asset frames in one combine_prices call against reducing them pairwise.
+
+  python3 benchmarks/bench_combine_prices.py [days] [tickers]
+"""
+import os
+import sys
+import timeit
+from functools import reduce
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+from mega_money_millions.priceutils import combine_prices # pylint: disable=wrong-import-position
+
+
+def single_asset_frames(days, tickers):
+  times = pd.date_range('2018-01-01', periods=days, freq='D', name='time')
+  rng = np.random.default_rng(0)
+  frames = []
+
+  for i in range(tickers):
+    closes = np.exp(rng.normal(0, 0.02, days).cumsum()) * 100
+    frames.append(pd.DataFrame({'close': closes, 'complete': True, 'high': closes * 1.01, 'low': closes * 0.99,
+                                'open': closes, 'ticker': f'T{i:04d}', 'volume': 1000.0}, index=times))
+
+  return frames
+
+
+def main(days=2000, tickers=100):
+  frames = single_asset_frames(days, tickers)
+
+  pairwise_seconds = timeit.timeit(lambda: reduce(combine_prices, frames), number=1)
+  n_way_seconds = min(timeit.repeat(lambda: combine_prices(*frames), number=1, repeat=3))
+
+  assert reduce(combine_prices, frames[:10]).equals(combine_prices(*frames[:10]))
+
+  print(f"combine_prices on {tickers} tickers x {days} days ({days * tickers} rows)")
+  print(f"  pairwise:   {pairwise_seconds * 1000:10.2f} ms")
+  print(f"  n-way:      {n_way_seconds * 1000:10.2f} ms")
+  print(f"  speedup:    {pairwise_seconds / n_way_seconds:10.1f}x")
+
+
+if __name__ == '__main__':
+  main(*map(int, sys.argv[1:]))
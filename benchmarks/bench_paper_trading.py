@@ -0,0 +1,51 @@
+"""
+Measures PaperTrader's bar-to-decision latency replaying a synthetic universe with SMA crossover indicators.
+
+  python3 benchmarks/bench_paper_trading.py [days] [tickers]
+"""
+import os
+import sys
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# pylint: disable=wrong-import-position
+from mega_money_millions.exchange import FreeExchange
+from mega_money_millions.indicators.streaming import StreamingCrossover, StreamingSMA
+from mega_money_millions.paper import ReplaySource, run_paper_trading
+
+
+def universe(days, tickers):
+  times = pd.date_range('2018-01-01', periods=days, freq='D', name='time')
+  index = pd.MultiIndex.from_product([times, [f'T{i:04d}' for i in range(tickers)]], names=['time', 'ticker'])
+  closes = np.exp(np.random.default_rng(0).normal(0, 0.02, (days, tickers)).cumsum(axis=0)).ravel() * 100
+
+  return pd.DataFrame({'close': closes, 'complete': True, 'high': closes, 'low': closes, 'open': closes,
+                       'volume': 1000.0}, index=index)
+
+
+def on_tick(date, portfolio, prices_for_date):
+  for ticker, crossed_up, crossed_down, close in zip(prices_for_date.index, prices_for_date['SMACrossUp'],
+                                                     prices_for_date['SMACrossDown'], prices_for_date['close']):
+    if crossed_up and portfolio.cash() > 100:
+      portfolio.buy(ticker, date, close, quantity=100 / close)
+    elif crossed_down and portfolio.quantity_owned(ticker) > 0:
+      portfolio.sell(ticker, date, close, percentage_of_shares=100)
+
+
+def main(days=1000, tickers=50):
+  def indicators():
+    return [StreamingSMA(45), StreamingSMA(90), StreamingCrossover('SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')]
+
+  trader = run_paper_trading(ReplaySource(universe(days, tickers)), 100000, on_tick=on_tick, indicators=indicators,
+                             exchange=FreeExchange())
+  report = trader.latency_report()
+
+  print(f"PaperTrader on {days} bars x {tickers} tickers ({len(trader.portfolio.transactions)} trades)")
+  for name in ['mean_ms', 'p50_ms', 'p99_ms', 'max_ms']:
+    print(f"  {name[:-3] + ':':5} {report[name]:8.3f} ms")
+
+
+if __name__ == '__main__':
+  main(*map(int, sys.argv[1:]))
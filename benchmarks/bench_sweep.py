@@ -0,0 +1,69 @@
+"""
+Measures how run_sweep scales with the number of worker processes: the same sweep is run with 1, 2, 4, ... processes
+(up to the number of CPUs) and the speedup and efficiency over one process are reported.  Close to linear scaling means
+an efficiency near 1.0.
+
+  python3 benchmarks/bench_sweep.py [runs] [days] [tickers] [max_processes]
+"""
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# pylint: disable=wrong-import-position
+from mega_money_millions.sweep import run_sweep
+
+
+def universe(days, tickers):
+  times = pd.date_range('2018-01-01', periods=days, freq='D', name='time')
+  index = pd.MultiIndex.from_product([times, [f'T{i:04d}' for i in range(tickers)]], names=['time', 'ticker'])
+  closes = np.exp(np.random.default_rng(0).normal(0, 0.02, (days, tickers)).cumsum(axis=0)) * 100
+  prices = pd.DataFrame({'close': closes.ravel()}, index=index)
+
+  # A few moving averages for the strategies to choose between
+  for window in (10, 20, 50, 100):
+    prices[f'SMA{window}'] = pd.DataFrame(closes).rolling(window).mean().to_numpy().ravel()
+
+  return prices
+
+
+# Holds T0000 while its fast SMA is above its slow SMA.  Module-level, so it can be pickled to the workers.
+def sma_trend(fast, slow):
+  def on_tick(date, portfolio, prices_for_date):
+    prices = prices_for_date.loc['T0000']
+
+    if prices[f'SMA{fast}'] > prices[f'SMA{slow}'] and portfolio.cash() > 1:
+      portfolio.buy('T0000', date, prices['close'], percentage_of_cash=100)
+    elif prices[f'SMA{fast}'] < prices[f'SMA{slow}'] and portfolio.quantity_owned('T0000') > 0:
+      portfolio.sell('T0000', date, prices['close'], percentage_of_shares=100)
+
+  return on_tick
+
+
+def main(runs=16, days=2000, tickers=10, max_processes=os.cpu_count()):
+  prices = universe(days, tickers)
+  start_at, end_at = prices.index[0][0], prices.index[-1][0]
+  fasts, slows = [10, 20], [50, 100]
+  grid = [{'fast': fasts[i % 2], 'slow': slows[(i // 2) % 2]} for i in range(runs)]
+
+  process_counts = [1]
+  while process_counts[-1] * 2 <= max_processes:
+    process_counts.append(process_counts[-1] * 2)
+
+  print(f"run_sweep of {runs} backtests over {days} ticks x {tickers} tickers ({os.cpu_count()} CPUs)")
+  baseline = None
+  for processes in process_counts:
+    started_at = time.perf_counter()
+    run_sweep(prices, grid, sma_trend, 10000, start_at, end_at, processes=processes)
+    seconds = time.perf_counter() - started_at
+    baseline = baseline or seconds
+
+    print(f"  {processes:3d} processes: {seconds:8.2f} s  speedup {baseline / seconds:5.2f}x  "
+          f"efficiency {baseline / seconds / processes:4.2f}")
+
+
+if __name__ == '__main__':
+  main(*map(int, sys.argv[1:]))
@@ -0,0 +1,56 @@
+"""
+Compares run_backtest's per-tick overhead when on_tick reads prices from the prices_for_date DataFrame against reading
+them from a TickContext.
+
+  python3 benchmarks/bench_tick_context.py [days] [tickers]
+"""
+import os
+import sys
+import timeit
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'src'))
+
+# pylint: disable=wrong-import-position
+from mega_money_millions.backtester import run_backtest
+from mega_money_millions.panel import PricePanel
+
+
+def universe(days, tickers):
+  times = pd.date_range('2018-01-01', periods=days, freq='D', name='time')
+  index = pd.MultiIndex.from_product([times, [f'T{i:04d}' for i in range(tickers)]], names=['time', 'ticker'])
+  closes = np.exp(np.random.default_rng(0).normal(0, 0.02, (days, tickers)).cumsum(axis=0)).ravel() * 100
+
+  return pd.DataFrame({'close': closes, 'SMA45': closes}, index=index)
+
+
+def main(days=5000, tickers=10):
+  prices = universe(days, tickers)
+  panel = PricePanel.from_long(prices)
+  start_at, end_at = prices.index[0][0], prices.index[-1][0]
+
+  def read_frame(_date, _portfolio, prices_for_date):
+    return prices_for_date.loc['T0000']['close'] > prices_for_date.loc['T0000']['SMA45']
+
+  def read_context(_date, _portfolio, ctx):
+    return ctx.close['T0000'] > ctx.SMA45['T0000']
+
+  def noop(_date, _portfolio, _ctx):
+    pass
+
+  frame_seconds = min(timeit.repeat(lambda: run_backtest(prices, 1, start_at, end_at, on_tick=read_frame),
+                                    number=1, repeat=3))
+  context_seconds = min(timeit.repeat(lambda: run_backtest(panel, 1, start_at, end_at, on_tick=read_context,
+                                                           context=True), number=1, repeat=3))
+  loop_seconds = min(timeit.repeat(lambda: run_backtest(panel, 1, start_at, end_at, on_tick=noop, context=True),
+                                   number=1, repeat=3))
+
+  print(f"run_backtest over {days} ticks x {tickers} tickers, reading two fields per tick")
+  print(f"  prices_for_date: {frame_seconds / days * 1e6:8.2f} us/tick")
+  print(f"  TickContext:     {context_seconds / days * 1e6:8.2f} us/tick")
+  print(f"  empty on_tick:   {loop_seconds / days * 1e6:8.2f} us/tick")
+
+
+if __name__ == '__main__':
+  main(*map(int, sys.argv[1:]))
@@ -1,13 +1,369 @@
+import time
+import numpy as np
+import pandas as pd
+
 from .portfolio import Portfolio
 from .exchange import Coinbase
-from .dateutils import now, all_days_since
+from .dateutils import now, tick_schedule, positions_between, positions_at
+from .money import to_float
+from .panel import PricePanel
+
+
+class TickIndex:
+  """
+  Groups a multi-asset `prices` frame (multi-indexed on `time` and `ticker`) by `time` once, up front.  Each tick is
+  then just a pair of row offsets, so getting the prices for a tick is a positional slice instead of a MultiIndex
+  lookup.
+  """
+
+  def __init__(self, prices: pd.DataFrame):
+    if not prices.index.is_monotonic_increasing:
+      prices = prices.sort_index()
+
+    times = prices.index.get_level_values('time')
+    values = times.asi8
+    changes = np.ones(len(values), dtype=bool)
+    changes[1:] = values[1:] != values[:-1]
+    starts = np.flatnonzero(changes)
+
+    self.times: pd.DatetimeIndex = times[starts]
+    self.offsets: np.ndarray = np.append(starts, len(values))
+    # A shallow copy with the time level dropped, so the price data itself isn't copied
+    self.prices_by_ticker: pd.DataFrame = prices.copy(deep=False)
+    self.prices_by_ticker.index = prices.index.droplevel('time')
+
+  def __len__(self) -> int:
+    return len(self.times)
+
+  def between(self, start_at, end_at) -> range:
+    return positions_between(self.times, start_at, end_at)
+
+  def at_schedule(self, schedule: np.ndarray) -> np.ndarray:
+    return positions_at(self.times, schedule)
+
+  def prices_at(self, i: int) -> pd.DataFrame:
+    return self.prices_by_ticker.iloc[self.offsets[i]:self.offsets[i + 1]]
+
+
+class FieldView:
+  """
+  One field of a `TickContext` at its current tick: `view['BTC']` is the field's value for BTC.
+  """
+  __slots__ = ('context', 'values', 'positions')
+
+  def __init__(self, context: 'TickContext', values: np.ndarray, positions: dict[str, int]):
+    self.context: TickContext = context
+    self.values: np.ndarray = values
+    self.positions: dict[str, int] = positions
+
+  def __getitem__(self, ticker: str):
+    return self.values[self.context.i, self.positions[ticker]]
+
+  def __contains__(self, ticker: str) -> bool:
+    return ticker in self.positions
+
+
+class TickContext:
+  """
+  A low-overhead alternative to the `prices_for_date` DataFrame passed to `on_tick`, backed by a `PricePanel`:
+  `ctx.close['BTC']` (or `ctx.field('close')['BTC']`) is BTC's close at the current tick.  Field and ticker positions
+  are resolved once, so each lookup is a dict lookup and a NumPy index rather than a chain of pandas calls.
+
+  Boolean fields read as `bool` (False for a ticker missing at the current tick) and other fields as float64 (NaN when
+  missing); `present(ticker)` tells the two apart.  `prices_for_date()` builds the DataFrame `on_tick` would otherwise
+  have received.
+  """
+
+  def __init__(self, panel: PricePanel):
+    self.panel: PricePanel = panel
+    self.i: int = 0
+    self.views: dict[str, FieldView] = {}
+
+  def field(self, name: str) -> FieldView:
+    view = self.views.get(name)
+
+    if view is None:
+      values = self.panel.field(name)
+      if pd.api.types.is_bool_dtype(self.panel.dtypes[name]):
+        values = values == 1.0
+      view = self.views[name] = FieldView(self, values, self.panel.ticker_positions)
+
+    return view
+
+  # Only called for attributes that aren't found otherwise, ie: field names.  The view is then kept as an attribute, so
+  # later lookups of the same field don't come through here.
+  def __getattr__(self, name: str) -> FieldView:
+    panel = self.__dict__.get('panel')
+    if panel is None or name not in panel.field_positions:
+      raise AttributeError(name)
+
+    view = self.__dict__[name] = self.field(name)
+    return view
+
+  @property
+  def time(self) -> pd.Timestamp:
+    return self.panel.times[self.i]
+
+  @property
+  def tickers(self) -> list[str]:
+    return [ticker for ticker, present in zip(self.panel.tickers, self.panel.present[self.i]) if present]
+
+  def present(self, ticker: str) -> bool:
+    return bool(self.panel.present[self.i, self.panel.ticker_positions[ticker]])
+
+  def prices_for_date(self) -> pd.DataFrame:
+    return self.panel.prices_at(self.i)
+
+
+class EquityRecorder:
+  """
+  Records a portfolio's mark-to-market equity (cash plus each holding valued at its ticker's latest close) after each
+  tick of a `TickIndex` or `PricePanel` into preallocated arrays.  Each tick's closes update a vector of marks, one per
+  ticker, and the holdings are read from the portfolio's position book into a matching vector only after trades, so
+  recording a tick is a couple of NumPy operations rather than a lookup per ticker.  A ticker missing at a tick keeps
+  its last close.
+
+  Only every `every`th tick recorded is kept, plus the last one (eg: `every=60` keeps one point an hour of a minute-bar
+  run), so a long run's curve stays small.  Drawdowns between kept points are missed.
+  """
+
+  def __init__(self, ticks, size: int, every: int = 1):
+    if every < 1:
+      raise ValueError("every must be at least 1")
+
+    if isinstance(ticks, PricePanel):
+      self.tickers: list[str] = ticks.tickers
+      self.codes: np.ndarray | None = None
+      self.closes: np.ndarray = ticks.field('close')
+      self.present: np.ndarray | None = ticks.present
+      self.offsets: np.ndarray | None = None
+    else:
+      codes, tickers = pd.factorize(ticks.prices_by_ticker.index)
+      self.tickers = list(tickers)
+      self.codes = codes
+      self.closes = ticks.prices_by_ticker['close'].to_numpy(dtype='float64', na_value=np.nan)
+      self.present = None
+      self.offsets = ticks.offsets
+
+    self.ticks = ticks
+    self.every: int = every
+    self.ticker_positions: dict[str, int] = {ticker: i for i, ticker in enumerate(self.tickers)}
+    self.marks: np.ndarray = np.zeros(len(self.tickers))
+    self.held: np.ndarray = np.zeros(len(self.tickers))
+    # The number of transactions when held was last read from the position book
+    self.trades: int = -1
+    self.seen: int = 0
+    self.length: int = 0
+    self.positions: np.ndarray = np.empty(-(-size // every) + 1, dtype='int64')
+    self.values: np.ndarray = np.empty(len(self.positions))
+
+  def record(self, i: int, portfolio: Portfolio, last: bool = False):
+    if self.present is None:
+      start, end = self.offsets[i], self.offsets[i + 1]
+      closes = self.closes[start:end]
+      known = ~np.isnan(closes)
+      self.marks[self.codes[start:end][known]] = closes[known]
+    else:
+      np.copyto(self.marks, self.closes[i], where=self.present[i] & ~np.isnan(self.closes[i]))
+
+    if self.seen % self.every == 0 or last:
+      if len(portfolio.ledger) != self.trades:
+        self.__read_holdings(portfolio)
+
+      self.positions[self.length] = i
+      self.values[self.length] = portfolio.cash() + self.held @ self.marks
+      self.length += 1
+
+    self.seen += 1
+
+  def to_series(self) -> pd.Series:
+    return pd.Series(self.values[:self.length].copy(), index=self.ticks.times[self.positions[:self.length]],
+                     name='equity')
+
+  def __read_holdings(self, portfolio: Portfolio):
+    self.held[:] = 0.0
+
+    for position in portfolio.positions:
+      i = self.ticker_positions.get(position.ticker)
+      if i is not None:
+        self.held[i] = to_float(position.quantity) if portfolio.fixed_point else position.quantity
+
+    self.trades = len(portfolio.ledger)
+
+
+# on_tick is called once for every time present in prices between start_at and end_at.  If a frequency is given (see
+# dateutils.tick_schedule), only the times on that schedule are visited.  prices may also be a TickIndex or a
+# PricePanel built ahead of time.  With context=True, on_tick receives a TickContext instead of a prices_for_date
+# DataFrame (prices is converted to a PricePanel first if need be).  fixed_point is passed on to the Portfolio.  With
+# record_equity=True, the portfolio's equity after each tick (or every equity_every ticks, see EquityRecorder) is kept
+# as portfolio.equity_curve, which report() and max_drawdown() then measure.  Given a profiling.Profiler, the time spent
+# in each phase of each tick is recorded (see Profiler.report()).
+def run_backtest(prices, initial_cash, start_at, end_at=now(), *, on_tick, frequency=None, exchange=None,
+                 context=False, fixed_point=False, record_equity=False, equity_every=1, profiler=None):
+  portfolio = Portfolio(exchange or Coinbase(), initial_cash, fixed_point=fixed_point)
+
+  if context:
+    if isinstance(prices, TickIndex):
+      raise ValueError("context=True needs prices as a DataFrame or PricePanel, not a TickIndex")
+    ticks = prices if isinstance(prices, PricePanel) else PricePanel.from_long(prices)
+  else:
+    ticks = prices if isinstance(prices, (TickIndex, PricePanel)) else TickIndex(prices)
+
+  if frequency is None:
+    positions = ticks.between(start_at, end_at)
+  else:
+    positions = ticks.at_schedule(tick_schedule(start_at, end_at, frequency))
+
+  recorder = EquityRecorder(ticks, len(positions), equity_every) if record_equity else None
+  last = positions[-1] if len(positions) > 0 else None
+
+  if profiler is not None:
+    __run_profiled(ticks, positions, portfolio, on_tick, TickContext(ticks) if context else None, recorder, profiler)
+  elif context:
+    tick_context = TickContext(ticks)
+    # Timestamps are created in bulk rather than one per tick
+    for i, date in zip(positions, ticks.times[positions]):
+      tick_context.i = i
+      on_tick(date, portfolio, tick_context)
+      if recorder is not None:
+        recorder.record(i, portfolio, i == last)
+  else:
+    for i in positions:
+      on_tick(ticks.times[i], portfolio, ticks.prices_at(i))
+      if recorder is not None:
+        recorder.record(i, portfolio, i == last)
+
+  if recorder is not None:
+    portfolio.equity_curve = recorder.to_series()
+
+  return portfolio
+
+
+# run_backtest's loop, timing each phase of each tick.  Kept apart so the loop isn't slowed down when not profiling.
+def __run_profiled(ticks, positions, portfolio, on_tick, tick_context, recorder, profiler):
+  profiler.instrument(portfolio)
+  profiler.start()
+  last = positions[-1] if len(positions) > 0 else None
+
+  try:
+    for i, date in zip(positions, ticks.times[positions]):
+      profiler.tick_started()
+      started_at = time.perf_counter()
+
+      if tick_context is not None:
+        tick_context.i = i
+        prices_for_date = tick_context
+      else:
+        prices_for_date = ticks.prices_at(i)
+
+      sliced_at = time.perf_counter()
+      on_tick(date, portfolio, prices_for_date)
+      ticked_at = time.perf_counter()
+
+      if recorder is not None:
+        recorder.record(i, portfolio, i == last)
+        profiler.tick_finished(started_at, sliced_at, ticked_at, time.perf_counter())
+      else:
+        profiler.tick_finished(started_at, sliced_at, ticked_at)
+  finally:
+    profiler.stop()
+    profiler.restore()
+
+
+# Like run_backtest, but prices arrive as an iterable of multi-asset chunks in time order (eg: PriceStore.iter_chunks),
+# so only one chunk plus the lookback is held in memory at a time rather than the whole history.  Each chunk is joined
+# to the last `lookback` times before it and passed to prepare, which adds indicators in place (eg: add_sma), before its
+# ticks are visited.  lookback must be at least the longest window prepare uses (which also covers a crossover's
+# previous bar).  pandas' rolling sums carry float error along the whole history, so a rolling mean recomputed from the
+# lookback can occasionally round a cent differently; the streaming indicators carry their state exactly instead.
+def run_streaming_backtest(chunks, initial_cash, start_at, end_at=now(), *, on_tick, lookback=0, prepare=None,
+                           frequency=None, exchange=None, fixed_point=False):
+  portfolio = Portfolio(exchange or Coinbase(), initial_cash, fixed_point=fixed_point)
+  schedule = tick_schedule(start_at, end_at, frequency) if frequency is not None else None
+  history = None
+
+  for chunk in chunks:
+    if len(chunk) == 0:
+      continue
+
+    first_time = chunk.index.get_level_values('time').min()
+    if first_time > pd.Timestamp(end_at):
+      break
+
+    window = chunk if history is None else pd.concat([history, chunk])
+    if lookback > 0:
+      # Kept before prepare runs, so the next chunk's indicators are computed from the raw prices again
+      times = window.index.get_level_values('time')
+      history = window.loc[times >= times.unique().sort_values()[-lookback:][0]]
+
+    if prepare is not None:
+      prepare(window)
+
+    ticks = TickIndex(window)
+    if schedule is None:
+      positions = ticks.between(max(pd.Timestamp(start_at), first_time), end_at)
+    else:
+      positions = ticks.at_schedule(schedule[schedule >= first_time.to_datetime64()])
+
+    for i in positions:
+      on_tick(ticks.times[i], portfolio, ticks.prices_at(i))
+
+  return portfolio
+
+
+def __signal(prices, signal, ticker):
+  if isinstance(signal, str):
+    signal = prices[signal]
+  elif isinstance(signal, pd.Series) and isinstance(signal.index, pd.MultiIndex):
+    signal = signal.xs(ticker, level='ticker')
+
+  return pd.Series(signal).fillna(False).to_numpy(dtype=bool)
+
+
+# Fill positions for a long-only strategy that enters when flat and exits when holding
+def signal_fills(entries: np.ndarray, exits: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+  # A bar with both signals is ambiguous, so it's ignored
+  entries, exits = entries & ~exits, exits & ~entries
+  events = np.flatnonzero(entries | exits)
+  is_entry = entries[events]
+
+  # Only the first signal of each run of entries (or exits) changes whether we're holding.  We start out flat, so a
+  # leading exit is dropped too.
+  changes = np.empty(len(events), dtype=bool)
+  changes[:1] = is_entry[:1]
+  changes[1:] = is_entry[1:] != is_entry[:-1]
+
+  return events[changes & is_entry], events[changes & ~is_entry]
+
+
+# A vectorized alternative to run_backtest for strategies that go all in on a single ticker when an entry signal fires
+# and sell everything when an exit signal fires.  entries and exits are either column names in prices (eg:
+# 'SMACrossUp'/'SMACrossDown' from add_crossover) or boolean Series indexed like prices.  The fills are found with
+# NumPy in one pass over the bars, so Python only runs once per trade instead of once per bar.  The result is the same
+# Portfolio run_backtest would produce for the equivalent on_tick.
+def run_vectorized_backtest(prices, entries, exits, initial_cash, start_at, end_at=now(), *, ticker=None,
+                            exchange=None, fixed_point=False):
+  if isinstance(prices.index, pd.MultiIndex):
+    if ticker is None:
+      raise ValueError("ticker is required when prices has multiple tickers")
+    bars = prices.xs(ticker, level='ticker')
+  else:
+    bars = prices
+    ticker = ticker or bars['ticker'].iloc[0]
+
+  portfolio = Portfolio(exchange or Coinbase(), initial_cash, fixed_point=fixed_point)
+
+  first = bars.index.searchsorted(pd.Timestamp(start_at), side='left')
+  last = bars.index.searchsorted(pd.Timestamp(end_at), side='right')
+  times = bars.index[first:last]
+  closes = bars['close'].to_numpy()[first:last]
+  buys, sells = signal_fills(__signal(bars, entries, ticker)[first:last], __signal(bars, exits, ticker)[first:last])
 
+  # Buys and sells alternate, starting with a buy
+  for i, buy_at in enumerate(buys):
+    portfolio.buy(ticker, times[buy_at], closes[buy_at], percentage_of_cash=100)
 
-# on_tick is called 1x/day.  TODO (davebenvenuti 2024-01-10): support configurable tick frequency
-def run_backtest(prices, initial_cash, start_at, end_at=now(), *, on_tick):
-  portfolio = Portfolio(Coinbase(), initial_cash)
+    if i < len(sells):
+      portfolio.sell(ticker, times[sells[i]], closes[sells[i]], percentage_of_shares=100)
 
-  for date in all_days_since(start_at, end_at):
-    prices_for_date = prices.loc[date]
-    on_tick(date, portfolio, prices_for_date)
   return portfolio
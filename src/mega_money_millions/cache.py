@@ -0,0 +1,235 @@
+import functools
+import hashlib
+import os
+import pickle
+import sysconfig
+import time
+import types
+import pandas as pd
+
+from .backtester import run_backtest
+from .dateutils import now
+from .exchange import Coinbase
+from .portfolio import Portfolio
+from .sweep import summarize
+
+
+# Installed packages and the standard library aren't hashed, only the strategy's own code
+__LIBRARY_PATHS = tuple({sysconfig.get_path(name) for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')})
+# Module-level values that are hashed by repr when a strategy refers to them (eg: a THRESHOLD constant)
+__CONSTANT_TYPES = (bool, int, float, complex, str, bytes, tuple, frozenset, type(None))
+
+
+def __update_with_code(digest, code: types.CodeType):
+  digest.update(code.co_code)
+  digest.update(repr(code.co_names).encode())
+
+  for const in code.co_consts:
+    if isinstance(const, types.CodeType):
+      __update_with_code(digest, const)
+    else:
+      digest.update(repr(const).encode())
+
+
+# The global names used by code, including by the functions nested in it
+def __global_names(code: types.CodeType) -> list[str]:
+  names = list(code.co_names)
+  for const in code.co_consts:
+    if isinstance(const, types.CodeType):
+      names.extend(__global_names(const))
+  return names
+
+
+def __is_library_function(function: types.FunctionType) -> bool:
+  return function.__code__.co_filename.startswith(__LIBRARY_PATHS)
+
+
+# The class and attributes of the object a method is called on (eg: a strategy's parameters)
+def __update_with_state(digest, value):
+  cls = value if isinstance(value, type) else type(value)
+  digest.update(f"{cls.__module__}.{cls.__qualname__}".encode())
+
+  if not isinstance(value, type) and hasattr(value, '__dict__'):
+    digest.update(repr(sorted(vars(value).items())).encode())
+
+
+# Hashes a strategy's code along with everything it depends on that could change its results: its defaults, the values
+# and functions it closes over, and the module-level functions (recursively) and constants it refers to, so editing a
+# helper that on_tick calls changes the key too.  functools.partial objects, bound methods and callable objects are
+# unwrapped to the functions they call.
+def __update_with_function(digest, function, seen: set):
+  if isinstance(function, functools.partial):
+    digest.update(repr((function.args, sorted(function.keywords.items()))).encode())
+    __update_with_function(digest, function.func, seen)
+    return
+
+  if isinstance(function, types.MethodType):
+    __update_with_state(digest, function.__self__)
+    __update_with_function(digest, function.__func__, seen)
+    return
+
+  if not isinstance(function, types.FunctionType):
+    call = getattr(type(function), '__call__', None)
+    if not isinstance(call, types.FunctionType):
+      raise TypeError(f"Can't fingerprint {function!r}: on_tick must be a Python function, a functools.partial, a "
+                      "bound method or an object with a Python __call__ method")
+
+    __update_with_state(digest, function)
+    __update_with_function(digest, call, seen)
+    return
+
+  if function in seen:
+    return
+  seen.add(function)
+
+  __update_with_code(digest, function.__code__)
+  digest.update(repr(function.__defaults__).encode())
+  digest.update(repr(sorted((function.__kwdefaults__ or {}).items())).encode())
+
+  # Closures usually hold the strategy's parameters (and sometimes helper functions)
+  for cell in function.__closure__ or ():
+    value = cell.cell_contents
+    if isinstance(value, types.FunctionType):
+      __update_with_function(digest, value, seen)
+    else:
+      digest.update(repr(value).encode())
+
+  for name in __global_names(function.__code__):
+    value = function.__globals__.get(name)
+    if isinstance(value, types.FunctionType) and not __is_library_function(value):
+      digest.update(name.encode())
+      __update_with_function(digest, value, seen)
+    elif isinstance(value, __CONSTANT_TYPES):
+      digest.update(f"{name}={value!r}".encode())
+
+
+# Fingerprints the rows of prices that fall within [start_at, end_at]
+def prices_fingerprint(prices: pd.DataFrame, start_at, end_at) -> str:
+  times = prices.index.get_level_values('time') if isinstance(prices.index, pd.MultiIndex) else prices.index
+  in_range = (times >= pd.Timestamp(start_at)) & (times <= pd.Timestamp(end_at))
+  rows = prices.loc[in_range]
+
+  digest = hashlib.sha256(repr(list(rows.columns)).encode())
+  digest.update(pd.util.hash_pandas_object(rows, index=True).to_numpy().tobytes())
+  return digest.hexdigest()
+
+
+def exchange_fingerprint(exchange) -> str:
+  attributes = {}
+  for cls in reversed(type(exchange).__mro__):
+    attributes.update({name: value for name, value in vars(cls).items()
+                       if not name.startswith('_') and not callable(value)})
+  attributes.update(vars(exchange))
+
+  return f"{type(exchange).__module__}.{type(exchange).__qualname__}{sorted(attributes.items())!r}"
+
+
+def backtest_fingerprint(prices_key: str, initial_cash, start_at, end_at, exchange, on_tick, params=None,
+                         frequency=None) -> str:
+  digest = hashlib.sha256(prices_key.encode())
+  digest.update(repr((initial_cash, pd.Timestamp(start_at), pd.Timestamp(end_at), frequency)).encode())
+  digest.update(exchange_fingerprint(exchange).encode())
+  __update_with_function(digest, on_tick, set())
+  digest.update(repr(sorted((params or {}).items())).encode())
+  return digest.hexdigest()
+
+
+class BacktestCache:
+  """
+  A content-addressed, on-disk cache of backtest results.  Each entry is the ledger and metrics of one run, stored in
+  `directory` under the fingerprint of its inputs.  Entries are evicted least recently used first once the cache grows
+  past `max_bytes`.
+  """
+  EXTENSION: str = '.pickle'
+
+  def __init__(self, directory: str, max_bytes: int = 512 * 1024 * 1024):
+    self.directory: str = directory
+    self.max_bytes: int = max_bytes
+    os.makedirs(directory, exist_ok=True)
+
+  def path(self, key: str) -> str:
+    return os.path.join(self.directory, key + BacktestCache.EXTENSION)
+
+  def get(self, key: str) -> dict | None:
+    path = self.path(key)
+
+    try:
+      with open(path, 'rb') as file:
+        entry = pickle.load(file)
+    except FileNotFoundError:
+      return None
+
+    # Bump the entry to most recently used
+    BacktestCache.__touch(path)
+
+    portfolio = Portfolio.from_transactions(entry['exchange'], entry['initial_cash'], entry['transactions'],
+                                            fixed_point=entry.get('fixed_point', False))
+    return {'portfolio': portfolio, 'metrics': entry['metrics']}
+
+  def put(self, key: str, portfolio: Portfolio, metrics: dict | None = None):
+    entry = {
+      'exchange': portfolio.exchange,
+      'initial_cash': portfolio.initial_cash,
+      'transactions': portfolio.transactions,
+      'fixed_point': portfolio.fixed_point,
+      'metrics': metrics,
+    }
+
+    # Write then rename so a reader never sees a partial entry
+    path = self.path(key)
+    with open(path + '.tmp', 'wb') as file:
+      pickle.dump(entry, file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(path + '.tmp', path)
+    BacktestCache.__touch(path)
+
+    self.evict()
+
+  def entries(self) -> list[os.DirEntry]:
+    with os.scandir(self.directory) as entries:
+      return [entry for entry in entries if entry.name.endswith(BacktestCache.EXTENSION)]
+
+  def size(self) -> int:
+    return sum(entry.stat().st_size for entry in self.entries())
+
+  def evict(self):
+    entries = sorted(self.entries(), key=lambda entry: entry.stat().st_mtime_ns)
+    size = sum(entry.stat().st_size for entry in entries)
+
+    while size > self.max_bytes and len(entries) > 0:
+      oldest = entries.pop(0)
+      size -= oldest.stat().st_size
+      os.remove(oldest.path)
+
+  def clear(self):
+    for entry in self.entries():
+      os.remove(entry.path)
+
+  # Sets the mtime from time.time_ns(): the filesystem's own clock can be coarse enough that an entry written and one
+  # bumped moments later get the same mtime, and then the wrong one could be evicted
+  @staticmethod
+  def __touch(path: str):
+    touched_at = time.time_ns()
+    os.utime(path, ns=(touched_at, touched_at))
+
+
+# run_backtest, but the result is looked up in cache first.  The cache key covers the prices between start_at and
+# end_at, initial_cash, the exchange's fee model, the code of on_tick (and any functions or values it closes over),
+# params and frequency.  When sweeping, pass prices_key=prices_fingerprint(prices, start_at, end_at) to avoid hashing
+# the prices again on every run.
+def cached_run_backtest(cache: BacktestCache, prices, initial_cash, start_at, end_at=now(), *, on_tick, params=None,
+                        frequency=None, exchange=None, prices_key=None) -> Portfolio:
+  exchange = exchange or Coinbase()
+  prices_key = prices_key or prices_fingerprint(prices, start_at, end_at)
+  key = backtest_fingerprint(prices_key, initial_cash, start_at, end_at, exchange, on_tick, params, frequency)
+
+  entry = cache.get(key)
+  if entry is not None:
+    return entry['portfolio']
+
+  portfolio = run_backtest(prices, initial_cash, start_at, end_at, on_tick=on_tick, frequency=frequency,
+                           exchange=exchange)
+  metrics = summarize(portfolio)
+  del metrics['transactions']
+  cache.put(key, portfolio, metrics)
+
+  return portfolio
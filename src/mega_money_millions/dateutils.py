@@ -1,5 +1,7 @@
 import datetime
 from enum import Enum
+import numpy as np
+import pandas as pd
 
 
 def now():
@@ -101,3 +103,51 @@ def all_days_since(start_at, end_at=now()):
   while current <= end_at:
     yield current
     current += datetime.timedelta(days=1)
+
+
+__WEEKLY_FREQUENCIES = {
+  'W-MON': next_monday_midnight,
+  'W-TUE': next_tuesday_midnight,
+  'W-WED': next_wednesday_midnight,
+  'W-THU': next_thursday_midnight,
+  'W-FRI': next_friday_midnight,
+  'W-SAT': next_saturday_midnight,
+  'W-SUN': next_sunday_midnight,
+}
+
+
+# Returns every tick from start_at to end_at (inclusive) as a datetime64[ns] array.  frequency is either a fixed
+# interval pandas understands ('1min', '1h', '4h', '1D', ...), in which case ticks fall on multiples of that interval
+# since the epoch, or a weekly anchor ('W-MON', 'W-TUE', ...) which yields every Midnight UTC on that day like
+# all_mondays_since.
+def tick_schedule(start_at, end_at=now(), frequency='1D'):
+  end = pd.Timestamp(end_at).value
+
+  if frequency in __WEEKLY_FREQUENCIES:
+    first = pd.Timestamp(__WEEKLY_FREQUENCIES[frequency](start_at)).value
+    step = pd.Timedelta(days=7).value
+  else:
+    step = pd.Timedelta(frequency).value
+    if step <= 0:
+      raise ValueError(f"frequency must be positive, got {frequency}")
+
+    first = -(-pd.Timestamp(start_at).value // step) * step
+
+  if first > end:
+    return np.empty(0, dtype='datetime64[ns]')
+
+  return np.arange(first, end + 1, step, dtype='int64').view('datetime64[ns]')
+
+
+# Positions in times (a sorted DatetimeIndex) that fall within [start_at, end_at]
+def positions_between(times, start_at, end_at) -> range:
+  return range(times.searchsorted(pd.Timestamp(start_at), side='left'),
+               times.searchsorted(pd.Timestamp(end_at), side='right'))
+
+
+# Positions in times (a sorted DatetimeIndex) of the times that appear in schedule (a sorted datetime64 array)
+def positions_at(times, schedule) -> np.ndarray:
+  positions = times.searchsorted(schedule)
+  found = positions < len(times)
+  found[found] = times.asi8[positions[found]] == schedule.view('int64')[found]
+  return positions[found]
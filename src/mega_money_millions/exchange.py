@@ -1,9 +1,39 @@
 from abc import ABC, abstractmethod
+from bisect import bisect_right
+from collections import deque
+import functools
+import inspect
+import numpy as np
+import pandas as pd
 
+from .money import round_decimal, round_units, to_float, to_units, truncate_decimal, truncate_units
 
+
+# Prices, quantities and cash can be scalars or arrays (one element per order), in which case the fees and quantities
+# returned are arrays too.  Array results are exactly what the scalar methods would return element by element, given
+# the elements as Python floats (see money.round_decimal for how NumPy float scalars can differ on a tie).
 class Exchange(ABC):
+  # Exchanges written before max_quantity took a date keep working: Portfolio passes it the date, which their
+  # max_quantity is wrapped to drop
+  def __init_subclass__(cls, **kwargs):
+    super().__init_subclass__(**kwargs)
+    max_quantity = cls.__dict__.get('max_quantity')
+
+    if max_quantity is not None and not Exchange.__takes_date(max_quantity):
+      @functools.wraps(max_quantity)
+      def dated_max_quantity(self, ticker, price, cash, date=None):
+        return max_quantity(self, ticker, price, cash)
+
+      cls.max_quantity = dated_max_quantity
+
+  @staticmethod
+  def __takes_date(method) -> bool:
+    parameters = inspect.signature(method).parameters
+    return 'date' in parameters or any(parameter.kind == inspect.Parameter.VAR_POSITIONAL
+                                       for parameter in parameters.values())
+
   @abstractmethod
-  def max_quantity(self, ticker, price, cash):
+  def max_quantity(self, ticker, price, cash, date=None):
     pass
 
   @abstractmethod
@@ -14,39 +44,127 @@ class Exchange(ABC):
   def fee_for_sell(self, ticker, date, price, quantity):
     pass
 
+  # The same for a fixed-point Portfolio (see money.py): cash, quantities and fees are integer units of 0.0001.  These
+  # go through the float methods above, so max_quantity must return a multiple of 0.0001; exchanges can override them
+  # to skip the conversions.
+  def max_quantity_units(self, ticker, price, cash_units, date=None):
+    return to_units(self.max_quantity(ticker, price, to_float(cash_units), date))
+
+  def fee_units_for_buy(self, ticker, date, price, quantity_units):
+    return to_units(self.fee_for_buy(ticker, date, price, to_float(quantity_units)))
 
-# TODO: (davebenvenuti 2023-01-17) this doesn't belong here
-def truncate_decimal(number, decimal_places=4):
-  multiplier = 10 ** decimal_places
-  return int(number * multiplier) / multiplier
+  def fee_units_for_sell(self, ticker, date, price, quantity_units):
+    return to_units(self.fee_for_sell(ticker, date, price, to_float(quantity_units)))
+
+  # Called by Portfolio after each trade, for exchanges whose fees depend on trading history
+  def record_trade(self, ticker, date, price, quantity):
+    pass
+
+  # The exchange a new portfolio trades on.  Exchanges that keep trading history return a fresh copy, so portfolios
+  # (eg: the runs of a sweep) sharing one exchange don't share their history.
+  def new_account(self) -> 'Exchange':
+    return self
 
 
 class FreeExchange(Exchange):
-  def max_quantity(self, ticker, price, cash):
+  def max_quantity(self, ticker, price, cash, date=None):
     return cash / price
 
+  def max_quantity_units(self, ticker, price, cash_units, date=None):
+    return truncate_units(to_float(cash_units) / price)
+
   def fee_for_buy(self, ticker, date, price, quantity):
-    return 0.0
+    return 0.0 if isinstance(price, (int, float)) or np.ndim(price) == 0 else np.zeros(np.shape(price))
 
   def fee_for_sell(self, ticker, date, price, quantity):
-    return 0.0
+    return 0.0 if isinstance(price, (int, float)) or np.ndim(price) == 0 else np.zeros(np.shape(price))
 
 
 class Coinbase(Exchange):
   FEE = 0.0060
 
-  def max_quantity(self, ticker, price, cash):
+  # The taker fee rate on date
+  def fee_rate(self, date=None) -> float:
+    return self.FEE
+
+  def max_quantity(self, ticker, price, cash, date=None):
     # https://help.coinbase.com/en/exchange/trading-and-funding/trading-rules-and-fees/fees
     # Assume taker
-    price_with_fee = price * (1 + self.FEE)
+    price_with_fee = price * (1 + self.fee_rate(date))
     return truncate_decimal(cash / price_with_fee, 4)
 
   def fee_for_buy(self, ticker, date, price, quantity):
     # https://help.coinbase.com/en/exchange/trading-and-funding/exchange-fees
     # Assume taker
-    return round(price * quantity * self.FEE, 4)
+    return round_decimal(price * quantity * self.fee_rate(date), 4)
 
   def fee_for_sell(self, ticker, date, price, quantity):
     # https://help.coinbase.com/en/exchange/trading-and-funding/exchange-fees
     # Assume taker
-    return truncate_decimal(price * quantity * self.FEE, 4)
+    return truncate_decimal(price * quantity * self.fee_rate(date), 4)
+
+  # Exactly the units of the above
+  def max_quantity_units(self, ticker, price, cash_units, date=None):
+    return truncate_units(to_float(cash_units) / (price * (1 + self.fee_rate(date))))
+
+  def fee_units_for_buy(self, ticker, date, price, quantity_units):
+    return round_units(price * to_float(quantity_units) * self.fee_rate(date))
+
+  def fee_units_for_sell(self, ticker, date, price, quantity_units):
+    return truncate_units(price * to_float(quantity_units) * self.fee_rate(date))
+
+
+class TieredCoinbase(Coinbase):
+  """
+  Coinbase's taker fees, which step down as the trailing 30 day trading volume (in quote currency) grows.  Each trade
+  recorded is kept in a window of (time, volume) that's evicted from the front as time moves on, with a running total,
+  so finding the rate is a binary search of `VOLUME_TIERS` rather than a rescan of the trades.  The volume is kept in
+  integer units of 0.0001, so the total doesn't drift as trades leave the window.
+
+  `date=None` uses the rate as of the latest date seen.
+  """
+  # https://help.coinbase.com/en/exchange/trading-and-funding/exchange-fees
+  VOLUME_TIERS: tuple[int, ...] = (0, 10_000, 50_000, 100_000, 1_000_000, 15_000_000, 75_000_000, 250_000_000,
+                                   400_000_000)
+  TAKER_FEES: tuple[float, ...] = (0.0060, 0.0040, 0.0025, 0.0020, 0.0018, 0.0016, 0.0012, 0.0008, 0.0005)
+  WINDOW: pd.Timedelta = pd.Timedelta(days=30)
+
+  def __init__(self):
+    self.trades: deque[tuple[pd.Timestamp, int]] = deque()
+    # The volume of trades, in units of 0.0001
+    self.volume_units: int = 0
+    self.rate: float = self.TAKER_FEES[0]
+
+  def new_account(self) -> 'TieredCoinbase':
+    return type(self)()
+
+  def volume(self) -> float:
+    return self.volume_units / 10_000
+
+  def fee_rate(self, date=None) -> float:
+    if date is not None:
+      self.__evict(pd.Timestamp(date))
+    return self.rate
+
+  def record_trade(self, ticker, date, price, quantity):
+    date = pd.Timestamp(date)
+    units = int(round(abs(price * quantity) * 10_000))
+
+    self.__evict(date)
+    self.trades.append((date, units))
+    self.volume_units += units
+    self.__update_rate()
+
+  # Trades at or before date - WINDOW no longer count
+  def __evict(self, date: pd.Timestamp):
+    cutoff = date - self.WINDOW
+    if len(self.trades) == 0 or self.trades[0][0] > cutoff:
+      return
+
+    while len(self.trades) > 0 and self.trades[0][0] <= cutoff:
+      self.volume_units -= self.trades.popleft()[1]
+    self.__update_rate()
+
+  def __update_rate(self):
+    tier = bisect_right(self.VOLUME_TIERS, self.volume_units / 10_000) - 1
+    self.rate = self.TAKER_FEES[tier]
@@ -1,14 +1,34 @@
+import pandas as pd
+
+from ..panel import PricePanel
+
+
+# prices may be multi-indexed on time and ticker, or a PricePanel where each time is already a row of tickers
 def add_ranking(prices, on_stat, to_stat, threshold=None):
+  if isinstance(prices, PricePanel):
+    ranks = pd.DataFrame(prices.field(on_stat)).rank(axis=1, method='dense', ascending=False).to_numpy()
+    prices.add_field(to_stat, ranks)
+    if threshold is not None:
+      prices.add_field(f'Past{to_stat}Threshold', ranks <= threshold, dtype='bool')
+    return
+
   prices[to_stat] = prices.groupby('time')[on_stat].rank(method='dense', ascending=False)
   if threshold is not None:
     prices[f'Past{to_stat}Threshold'] = prices[to_stat] <= threshold
 
 
 def unique_dates(prices):
+  if isinstance(prices, PricePanel):
+    return prices.times
+
   return prices.index.get_level_values('time').unique()
 
 
+# Flags every (time, ticker) row where on_stat (eg: 'close') is at or above threshold_column (eg: 'SMA45'), across all
+# dates and tickers at once.  Rows where either value is missing are False.
 def add_filter(prices, on_stat, to_stat, threshold_column='SMA45'):
-  for date in unique_dates(prices):
-    values_for_date = prices.loc[(date, on_stat)]
-    prices.loc[date, to_stat] = values_for_date['close'] >= values_for_date[threshold_column]
+  if isinstance(prices, PricePanel):
+    prices.add_field(to_stat, prices.field(on_stat) >= prices.field(threshold_column), dtype='bool')
+    return
+
+  prices[to_stat] = prices[on_stat] >= prices[threshold_column]
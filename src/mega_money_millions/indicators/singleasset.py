@@ -1,18 +1,74 @@
+import numpy as np
 import pandas as pd
 
+from ..panel import PricePanel
+
+
+# These work on a single asset's prices indexed by time, or on multi-asset prices multi-indexed on time and ticker (as
+# built by priceutils.combine_prices), in which case each ticker is computed separately in one grouped pass.  They also
+# work on a PricePanel, where each ticker is a column of a time x ticker array.  A ticker's missing bars are skipped
+# there, just as the long form has no rows for them, so the results match the long form's.
+def is_multi_asset(prices):
+  return isinstance(prices.index, pd.MultiIndex) and 'ticker' in prices.index.names
+
+
+# A panel field's values where their ticker is present, grouped by ticker.  Row-major order is time, then ticker, the
+# same order as the long form's rows.
+def __present_by_ticker(panel: PricePanel, column: str):
+  return pd.Series(panel.field(column)[panel.present]).groupby(np.nonzero(panel.present)[1], sort=False)
+
+
+# Puts values computed from __present_by_ticker back in place, with NaN where tickers are missing
+def __from_present(panel: PricePanel, values: pd.Series) -> np.ndarray:
+  result = np.full(panel.present.shape, np.nan)
+  result[panel.present] = values.to_numpy()
+  return result
+
+
+# Shifts just the one column rather than the whole frame
+def shifted(prices, column, periods):
+  if isinstance(prices, PricePanel):
+    return __from_present(prices, __present_by_ticker(prices, column).shift(periods))
+
+  if is_multi_asset(prices):
+    return prices[column].groupby(level='ticker', sort=False).shift(periods)
+
+  return prices[column].shift(periods)
+
 
 def add_sma(prices, window, prefix='SMA'):
-  prices[f'{prefix}{window}'] = prices['close'].rolling(window).mean().round(2)
+  if isinstance(prices, PricePanel):
+    sma = __present_by_ticker(prices, 'close').rolling(window).mean().droplevel(0).sort_index()
+    prices.add_field(f'{prefix}{window}', __from_present(prices, sma.round(2)))
+    return prices
+
+  if is_multi_asset(prices):
+    # The group key is prepended to the index, so drop it to line the result back up with prices
+    sma = prices['close'].groupby(level='ticker', sort=False).rolling(window).mean().droplevel(0)
+  else:
+    sma = prices['close'].rolling(window).mean()
+
+  prices[f'{prefix}{window}'] = sma.round(2)
   return prices
 
 
 def add_roc(prices, window, prefix='ROC'):
-  prices[f'{prefix}{window}'] = ((prices['close'] - prices.shift(window)['close']) /
-                                 prices.shift(window)['close'] * 100)
+  previous_close = shifted(prices, 'close', window)
+
+  if isinstance(prices, PricePanel):
+    prices.add_field(f'{prefix}{window}', (prices.field('close') - previous_close) / previous_close * 100)
+  else:
+    prices[f'{prefix}{window}'] = (prices['close'] - previous_close) / previous_close * 100
   return prices
 
 
 def add_crossover(prices, on_stat1, on_stat2, to_stat1, to_stat2):
-  previous = prices.shift(1)
-  prices[to_stat1] = (previous[on_stat1] > previous[on_stat2]) & (prices[on_stat1] < prices[on_stat2])
-  prices[to_stat2] = (previous[on_stat1] < previous[on_stat2]) & (prices[on_stat1] > prices[on_stat2])
+  previous1, previous2 = shifted(prices, on_stat1, 1), shifted(prices, on_stat2, 1)
+
+  if isinstance(prices, PricePanel):
+    current1, current2 = prices.field(on_stat1), prices.field(on_stat2)
+    prices.add_field(to_stat1, (previous1 > previous2) & (current1 < current2), dtype='bool')
+    prices.add_field(to_stat2, (previous1 < previous2) & (current1 > current2), dtype='bool')
+  else:
+    prices[to_stat1] = (previous1 > previous2) & (prices[on_stat1] < prices[on_stat2])
+    prices[to_stat2] = (previous1 < previous2) & (prices[on_stat1] > prices[on_stat2])
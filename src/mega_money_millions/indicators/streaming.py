@@ -0,0 +1,130 @@
+import math
+
+
+class StreamingSMA:
+  """
+  The incremental version of `singleasset.add_sma`: `update(close)` consumes one bar in O(1) and returns the moving
+  average for that bar.  The running sum follows the same compensated add/remove steps as pandas' rolling mean, so the
+  values are bit-for-bit equal to `add_sma`, `.round(2)` included.
+  """
+
+  def __init__(self, window: int, prefix='SMA'):
+    self.window: int = window
+    self.name: str = f'{prefix}{window}'
+    self.ring: list[float] = [math.nan] * window
+    self.position: int = 0
+    self.count: int = 0
+    self.nobs: int = 0
+    self.sum: float = 0.0
+    self.compensation_add: float = 0.0
+    self.compensation_remove: float = 0.0
+    self.negatives: int = 0
+    self.same_values: int = 0
+    self.previous: float = math.nan
+
+  def __add(self, value: float):
+    if math.isnan(value):
+      return
+
+    self.nobs += 1
+    y = value - self.compensation_add
+    t = self.sum + y
+    self.compensation_add = t - self.sum - y
+    self.sum = t
+
+    if math.copysign(1.0, value) < 0:
+      self.negatives += 1
+
+    # Runs of identical values are reported as-is rather than as a float-noisy average
+    if value == self.previous:
+      self.same_values += 1
+    else:
+      self.same_values = 1
+    self.previous = value
+
+  def __remove(self, value: float):
+    if math.isnan(value):
+      return
+
+    self.nobs -= 1
+    y = -value - self.compensation_remove
+    t = self.sum + y
+    self.compensation_remove = t - self.sum - y
+    self.sum = t
+
+    if math.copysign(1.0, value) < 0:
+      self.negatives -= 1
+
+  def update(self, close: float) -> float:
+    close = float(close)
+
+    if self.count >= self.window:
+      self.__remove(self.ring[self.position])
+    self.__add(close)
+
+    self.ring[self.position] = close
+    self.position = (self.position + 1) % self.window
+    self.count += 1
+
+    if self.nobs < self.window:
+      return math.nan
+
+    if self.same_values >= self.nobs:
+      mean = self.previous
+    else:
+      mean = self.sum / self.nobs
+      if (self.negatives == 0 and mean < 0) or (self.negatives == self.nobs and mean > 0):
+        mean = 0.0
+
+    # np.round(mean, 2) without the overhead of a NumPy call: it's also rint(mean * 100) / 100, and round() is
+    # round-half-even like rint (copysign keeps the sign of a result rounded to zero)
+    return math.copysign(round(mean * 100) / 100, mean)
+
+
+class StreamingROC:
+  """
+  The incremental version of `singleasset.add_roc`: `update(close)` consumes one bar and returns the rate of change
+  from the close `window` bars ago, keeping only those `window` closes in a ring buffer.
+  """
+
+  def __init__(self, window: int, prefix='ROC'):
+    self.window: int = window
+    self.name: str = f'{prefix}{window}'
+    self.ring: list[float] = [math.nan] * window
+    self.position: int = 0
+
+  def update(self, close: float) -> float:
+    close = float(close)
+    previous = self.ring[self.position]
+
+    self.ring[self.position] = close
+    self.position = (self.position + 1) % self.window
+
+    change = close - previous
+    if previous == 0:
+      # A zero close divides to inf or NaN, as it does in NumPy for add_roc, rather than raising
+      if change == 0 or math.isnan(change):
+        return math.nan
+      return math.copysign(math.inf, change) * math.copysign(1.0, previous)
+
+    return change / previous * 100
+
+
+class StreamingCrossover:
+  """
+  The incremental version of `singleasset.add_crossover`: `update(value1, value2)` consumes one bar's `on_stat1` and
+  `on_stat2` and returns the `(to_stat1, to_stat2)` booleans for it, remembering only the previous bar's values.
+  """
+
+  def __init__(self, on_stat1: str, on_stat2: str, to_stat1: str, to_stat2: str):
+    self.on_stats: tuple[str, str] = (on_stat1, on_stat2)
+    self.to_stats: tuple[str, str] = (to_stat1, to_stat2)
+    self.previous1: float = math.nan
+    self.previous2: float = math.nan
+
+  def update(self, value1: float, value2: float) -> tuple[bool, bool]:
+    crossed = (self.previous1 > self.previous2 and value1 < value2,
+               self.previous1 < self.previous2 and value1 > value2)
+    self.previous1, self.previous2 = value1, value2
+
+    return crossed
@@ -0,0 +1,228 @@
+import asyncio
+import json
+import ssl
+import time
+from urllib.parse import urlencode, urlsplit
+import pandas as pd
+
+from .store import PriceStore
+
+
+class FetchError(Exception):
+  def __init__(self, url: str, status: int, body: bytes):
+    super().__init__(f"GET {url} failed with {status}: {body[:200]!r}")
+    self.status: int = status
+
+
+class ConnectionPool:
+  """
+  A minimal HTTP/1.1 client over asyncio streams that keeps connections to one host alive between requests.  At most
+  `size` requests are in flight at once, each on its own connection, and connections are reused once a response has
+  been read.
+  """
+
+  def __init__(self, base_url: str, size: int = 4):
+    url = urlsplit(base_url)
+    self.host: str = url.hostname
+    self.port: int = url.port or (443 if url.scheme == 'https' else 80)
+    self.ssl: ssl.SSLContext | None = ssl.create_default_context() if url.scheme == 'https' else None
+    self.base_path: str = url.path.rstrip('/')
+    self.idle: list[tuple[asyncio.StreamReader, asyncio.StreamWriter]] = []
+    self.semaphore: asyncio.Semaphore = asyncio.Semaphore(size)
+    self.connections_opened: int = 0
+
+  async def get(self, path: str) -> tuple[int, bytes]:
+    async with self.semaphore:
+      # Kept-alive connections may have been closed by the server while idle, so each idle one is tried in turn before
+      # opening a new one
+      while len(self.idle) > 0:
+        connection = self.idle.pop()
+        try:
+          return await self.__request(connection, path)
+        except (ConnectionError, asyncio.IncompleteReadError):
+          connection[1].close()
+
+      connection = await self.__connect()
+      try:
+        return await self.__request(connection, path)
+      except BaseException:
+        # It never made it back to idle, so nothing else would close it
+        connection[1].close()
+        raise
+
+  async def close(self):
+    while len(self.idle) > 0:
+      _, writer = self.idle.pop()
+      writer.close()
+      await writer.wait_closed()
+
+  async def __connect(self) -> tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    self.connections_opened += 1
+    return await asyncio.open_connection(self.host, self.port, ssl=self.ssl)
+
+  async def __request(self, connection, path: str) -> tuple[int, bytes]:
+    reader, writer = connection
+    writer.write((f"GET {self.base_path}{path} HTTP/1.1\r\nHost: {self.host}\r\nAccept: application/json\r\n"
+                  "User-Agent: mega-money-millions\r\nConnection: keep-alive\r\n\r\n").encode('ascii'))
+    await writer.drain()
+
+    status_line = await reader.readline()
+    if not status_line:
+      raise ConnectionResetError("Connection closed before a response was read")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+      name, _, value = line.decode('latin-1').partition(':')
+      headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+      body = b''
+      while (chunk_size := int((await reader.readline()).split(b';')[0], 16)) > 0:
+        body += await reader.readexactly(chunk_size)
+        await reader.readline()
+      await reader.readline()
+    elif 'content-length' in headers:
+      body = await reader.readexactly(int(headers['content-length']))
+    else:
+      headers['connection'] = 'close'
+      body = await reader.read()
+
+    if headers.get('connection', '').lower() == 'close':
+      writer.close()
+    else:
+      self.idle.append(connection)
+
+    return status, body
+
+
+class TokenBucket:
+  """
+  Allows `rate` acquisitions per second on average, with bursts of up to `burst`.
+  """
+
+  def __init__(self, rate: float, burst: int = 1):
+    self.rate: float = rate
+    self.burst: int = burst
+    self.tokens: float = burst
+    self.updated_at: float = time.monotonic()
+    self.lock: asyncio.Lock = asyncio.Lock()
+
+  async def acquire(self):
+    async with self.lock:
+      while True:
+        current = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (current - self.updated_at) * self.rate)
+        self.updated_at = current
+
+        if self.tokens >= 1:
+          self.tokens -= 1
+          return
+
+        await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class CandleFetcher:
+  """
+  Fetches OHLCV candles from a Coinbase Exchange style candles endpoint
+  (`GET /products/<ticker>-<quote>/candles?granularity=&start=&end=`, at most `MAX_CANDLES` per request) and writes
+  them into a `PriceStore`.  Requests for all tickers share one kept-alive connection pool, at most `concurrency` are
+  in flight at once and they're rate limited to `requests_per_second`.
+  """
+  MAX_CANDLES: int = 300
+
+  def __init__(self, store: PriceStore, base_url: str = 'https://api.exchange.coinbase.com', *,
+               granularity: int = 86400, quote: str = 'USD', concurrency: int = 4, requests_per_second: float = 10,
+               retries: int = 3):
+    self.store: PriceStore = store
+    self.base_url: str = base_url
+    self.granularity: int = granularity
+    self.quote: str = quote
+    self.concurrency: int = concurrency
+    self.requests_per_second: float = requests_per_second
+    self.retries: int = retries
+
+  # Fetches and stores the bars of each ticker after the last one already stored (or from start_at when none are),
+  # returning the number of bars written per ticker.  A last bar stored while it was still forming (complete=False) is
+  # fetched again, and the store replaces it with the finished one.
+  async def ingest(self, tickers: list[str], start_at, end_at=None) -> dict[str, int]:
+    end_at = pd.Timestamp(end_at) if end_at is not None else CandleFetcher.__utc_now()
+    pool = ConnectionPool(self.base_url, self.concurrency)
+    bucket = TokenBucket(self.requests_per_second, self.concurrency)
+
+    async def __ingest_ticker(ticker):
+      last_timestamp = self.store.last_timestamp(ticker)
+      if last_timestamp is None:
+        since = pd.Timestamp(start_at)
+      elif not self.__is_complete(ticker, last_timestamp):
+        since = last_timestamp
+      else:
+        since = last_timestamp + pd.Timedelta(seconds=self.granularity)
+
+      prices = await self.fetch(pool, bucket, ticker, since, end_at)
+
+      if len(prices) > 0:
+        self.store.write(prices)
+      return len(prices)
+
+    try:
+      counts = await asyncio.gather(*(__ingest_ticker(ticker) for ticker in tickers))
+    finally:
+      await pool.close()
+
+    return dict(zip(tickers, counts))
+
+  # The single-asset prices of ticker between start_at and end_at (inclusive), formatted like the pickles in tests/
+  async def fetch(self, pool: ConnectionPool, bucket: TokenBucket, ticker: str, start_at, end_at) -> pd.DataFrame:
+    start_at, end_at = pd.Timestamp(start_at), pd.Timestamp(end_at)
+    step = pd.Timedelta(seconds=self.granularity)
+    windows = []
+    window_start = start_at
+
+    while window_start <= end_at:
+      window_end = min(window_start + step * (CandleFetcher.MAX_CANDLES - 1), end_at)
+      windows.append((window_start, window_end))
+      window_start = window_end + step
+
+    pages = await asyncio.gather(*(self.__fetch_window(pool, bucket, ticker, start, end) for start, end in windows))
+    candles = [candle for page in pages for candle in page]
+
+    prices = pd.DataFrame(candles, columns=['time', 'low', 'high', 'open', 'close', 'volume'], dtype='float64')
+    prices['time'] = pd.to_datetime(prices['time'].astype('int64'), unit='s')
+    prices = prices.drop_duplicates('time').set_index('time').sort_index()
+    prices = prices.loc[(prices.index >= start_at) & (prices.index <= end_at)]
+
+    # The latest candle is still forming until its whole interval has passed
+    prices = prices.assign(complete=pd.array(prices.index + step <= CandleFetcher.__utc_now(), dtype='boolean'),
+                           ticker=ticker)
+
+    return prices[['close', 'complete', 'high', 'low', 'open', 'ticker', 'volume']]
+
+  # Whether ticker's stored bar at timestamp had finished forming (unknown counts as not)
+  def __is_complete(self, ticker: str, timestamp: pd.Timestamp) -> bool:
+    complete = self.store.load([ticker], start_at=timestamp, end_at=timestamp, columns=['complete'])['complete']
+    return bool(complete.fillna(False).iloc[-1])
+
+  @staticmethod
+  def __utc_now() -> pd.Timestamp:
+    return pd.Timestamp.now('UTC').tz_localize(None)
+
+  async def __fetch_window(self, pool: ConnectionPool, bucket: TokenBucket, ticker: str, start_at, end_at) -> list:
+    query = urlencode({'granularity': self.granularity, 'start': start_at.isoformat(), 'end': end_at.isoformat()})
+    path = f"/products/{ticker}-{self.quote}/candles?{query}"
+
+    for attempt in range(self.retries + 1):
+      await bucket.acquire()
+      status, body = await pool.get(path)
+
+      if status == 200:
+        return json.loads(body)
+      if status != 429 and status < 500 or attempt == self.retries:
+        raise FetchError(self.base_url + path, status, body)
+
+      await asyncio.sleep(2 ** attempt / self.requests_per_second)
+
+
+# Runs CandleFetcher.ingest to completion, eg: ingest(PriceStore('data/prices'), ['BTC', 'ETH'], '2018-01-01')
+def ingest(store: PriceStore, tickers: list[str], start_at, end_at=None, **kwargs) -> dict[str, int]:
+  return asyncio.run(CandleFetcher(store, **kwargs).ingest(tickers, start_at, end_at))
@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+
+class Ledger:
+  """
+  An append-only, column-oriented record buffer.  Each column is a preallocated, typed NumPy array that doubles in
+  capacity when it fills up, so appending a row is amortized O(1) no matter how long the ledger gets.
+  """
+  INITIAL_CAPACITY: int = 64
+
+  def __init__(self, columns: dict[str, str], capacity: int = INITIAL_CAPACITY):
+    self.dtypes: dict[str, str] = dict(columns)
+    self.capacity: int = max(1, capacity)
+    self.length: int = 0
+    self.arrays: dict[str, np.ndarray] = {
+      name: np.empty(self.capacity, dtype=dtype) for name, dtype in self.dtypes.items()}
+
+  def __len__(self) -> int:
+    return self.length
+
+  def append(self, *values):
+    if len(values) != len(self.arrays):
+      raise ValueError(f"Expected {len(self.arrays)} values, got {len(values)}")
+
+    if self.length == self.capacity:
+      self.__grow(self.capacity * 2)
+
+    for array, value in zip(self.arrays.values(), values):
+      array[self.length] = value
+
+    self.length += 1
+
+  # Appends many rows at once from a dict of column name -> sequence of values
+  def extend(self, columns: dict):
+    if set(columns.keys()) != set(self.arrays.keys()):
+      raise ValueError(f"Expected columns {list(self.arrays.keys())}, got {list(columns.keys())}")
+
+    rows = len(next(iter(columns.values()))) if len(columns) > 0 else 0
+    if self.length + rows > self.capacity:
+      capacity = self.capacity
+      while capacity < self.length + rows:
+        capacity *= 2
+      self.__grow(capacity)
+
+    for name, array in self.arrays.items():
+      array[self.length:self.length + rows] = columns[name]
+
+    self.length += rows
+
+  def column(self, name: str) -> np.ndarray:
+    return self.arrays[name][:self.length]
+
+  def last(self, name: str):
+    return self.arrays[name][self.length - 1]
+
+  def clear(self):
+    self.length = 0
+
+  def to_frame(self) -> pd.DataFrame:
+    return pd.DataFrame({name: array[:self.length].copy() for name, array in self.arrays.items()})
+
+  def __grow(self, capacity: int):
+    for name, array in self.arrays.items():
+      grown = np.empty(capacity, dtype=array.dtype)
+      grown[:self.length] = array[:self.length]
+      self.arrays[name] = grown
+
+    self.capacity = capacity
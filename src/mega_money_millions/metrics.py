@@ -0,0 +1,103 @@
+import numpy as np
+
+from .money import to_float
+
+
+class RunningMetrics:
+  """
+  A portfolio's performance metrics, kept up to date as each trade is recorded so that reading any of them is O(1)
+  (eg: from `on_tick`, to size trades by how the strategy has been doing).  Sells with a gain >= 0 are wins and the
+  rest are losses, like `Portfolio#wins()` and `Portfolio#losses()`.  Streaks are the per-ticker streaks recorded on
+  each sell; `win_streak` and `loss_streak` count the portfolio's latest run of consecutive winning or losing sells.
+
+  Equity is cash plus holdings, each ticker valued at the price it last traded at, so the drawdown is measured from
+  trade to trade.  In fixed-point mode gains and cash are passed in as units (see money.py), and the sums of gains are
+  kept in units so they don't drift.
+  """
+
+  def __init__(self, initial_cash: float, fixed_point: bool = False):
+    self.initial_cash: float = initial_cash
+    self.fixed_point: bool = fixed_point
+    self.reset()
+
+  def reset(self):
+    self.wins: int = 0
+    self.losses: int = 0
+    self.win_gains = 0
+    self.loss_gains = 0
+    self.win_streaks: int = 0
+    self.loss_streaks: int = 0
+    self.max_win_streak: int | float = np.nan
+    self.max_loss_streak: int | float = np.nan
+    self.win_streak: int = 0
+    self.loss_streak: int = 0
+    # The value of each ticker held, at its last traded price, and their total
+    self.values: dict[str, float] = {}
+    self.holdings: float = 0.0
+    self.equity: float = self.initial_cash
+    self.peak_equity: float = self.initial_cash
+    # A fraction of peak_equity
+    self.drawdown: float = 0.0
+    self.max_drawdown_fraction: float = 0.0
+
+  # quantity is what's held of ticker after the trade
+  def record(self, ticker: str, price: float, quantity, gain, streak: int, cash, sell: bool):
+    if sell:
+      if gain >= 0:
+        self.wins += 1
+        self.win_gains += gain
+        self.win_streaks += streak
+        self.max_win_streak = streak if self.wins == 1 else max(self.max_win_streak, streak)
+        self.win_streak, self.loss_streak = self.win_streak + 1, 0
+      else:
+        self.losses += 1
+        self.loss_gains += gain
+        self.loss_streaks += streak
+        self.max_loss_streak = streak if self.losses == 1 else max(self.max_loss_streak, streak)
+        self.win_streak, self.loss_streak = 0, self.loss_streak + 1
+
+    if self.fixed_point:
+      quantity, cash = to_float(quantity), to_float(cash)
+
+    # A running total rather than summing every ticker on every trade.  It's reset whenever nothing is held, so
+    # rounding errors can't build up over a whole backtest.
+    value = quantity * price
+    self.holdings += value - self.values.pop(ticker, 0.0)
+    if value != 0:
+      self.values[ticker] = value
+    elif len(self.values) == 0:
+      self.holdings = 0.0
+
+    self.equity = cash + self.holdings
+    self.peak_equity = max(self.peak_equity, self.equity)
+    self.drawdown = (self.peak_equity - self.equity) / self.peak_equity if self.peak_equity > 0 else 0.0
+    self.max_drawdown_fraction = max(self.max_drawdown_fraction, self.drawdown)
+
+  def sells(self) -> int:
+    return self.wins + self.losses
+
+  def avg_win(self) -> float:
+    return self.__average(self.win_gains, self.wins)
+
+  def avg_loss(self) -> float:
+    return self.__average(self.loss_gains, self.losses)
+
+  def avg_return(self) -> float:
+    return self.__average(self.win_gains + self.loss_gains, self.sells())
+
+  def avg_win_streak(self) -> float:
+    return self.win_streaks / self.wins if self.wins > 0 else np.nan
+
+  def avg_loss_streak(self) -> float:
+    return self.loss_streaks / self.losses if self.losses > 0 else np.nan
+
+  # A percentage of the peak equity
+  def max_drawdown(self) -> float:
+    return round(self.max_drawdown_fraction * 100, 4)
+
+  # NaN when there's nothing to average, like the mean of an empty Series
+  def __average(self, total, count: int) -> float:
+    if count == 0:
+      return np.nan
+
+    return to_float(total / count) if self.fixed_point else total / count
@@ -0,0 +1,100 @@
+import math
+import numpy as np
+
+
+# Amounts of money and quantities are rounded or truncated to 4 decimal places (Portfolio.ROUND_TO).  In fixed-point
+# mode they're held as integer units of 0.0001 instead of floats, so adding them up is exact.  Everything here takes a
+# scalar or a NumPy array.
+DECIMAL_PLACES: int = 4
+SCALE: int = 10 ** DECIMAL_PLACES
+
+
+def __is_scalar(number) -> bool:
+  return isinstance(number, (int, float)) or np.ndim(number) == 0
+
+
+def truncate_decimal(number, decimal_places=4):
+  multiplier = 10 ** decimal_places
+
+  if __is_scalar(number):
+    return int(number * multiplier) / multiplier
+
+  return np.trunc(np.asarray(number, dtype='float64') * multiplier) / multiplier
+
+
+# round(), but also for arrays.  An array rounds exactly like round() of each element as a Python float, which goes by
+# its exact decimal value.  np.round instead scales by 10 ** decimal_places and rounds half to even, which can only
+# differ when the scaled amount is a tie, so those few fall back to round().  (round() of a NumPy float rounds like
+# np.round, so a NumPy float scalar can differ from the array result on a tie, as it always has.)
+def round_decimal(number, decimal_places=4):
+  if __is_scalar(number):
+    return round(number, decimal_places)
+
+  values = np.asarray(number, dtype='float64')
+  scaled = values * 10 ** decimal_places
+  rounded = np.rint(scaled) / 10 ** decimal_places
+
+  ties = np.flatnonzero(np.abs(scaled - np.rint(scaled)) == 0.5)
+  rounded[ties] = [round(value, decimal_places) for value in values[ties].tolist()]
+  return rounded
+
+
+# The units of an amount that's already a multiple of 0.0001, eg: a value from round_decimal or a quantity like 0.3
+# (which is really 0.299999999999999988...)
+def to_units(amount):
+  if __is_scalar(amount):
+    return int(round(amount * SCALE))
+
+  return np.rint(np.asarray(amount, dtype='float64') * SCALE).astype('int64')
+
+
+# Exactly the float round_decimal and truncate_decimal return for the same units
+def to_float(units):
+  if __is_scalar(units):
+    return units / SCALE
+
+  return np.asarray(units, dtype='int64') / SCALE
+
+
+# The units of truncate_decimal(amount, 4)
+def truncate_units(amount):
+  if __is_scalar(amount):
+    return int(amount * SCALE)
+
+  return np.trunc(np.asarray(amount, dtype='float64') * SCALE).astype('int64')
+
+
+# The units of an amount truncated to 0.0001 (eg: a quantity of 0.00019 is 1 unit, never more than was asked for),
+# except that an amount that's already a multiple of 0.0001 keeps its value even when scaling it falls just short of
+# a whole number of units (0.57 * 10000 is 5699.999999999999, which truncate_units makes 5699)
+def whole_units(amount):
+  units = to_units(amount)
+
+  if __is_scalar(amount):
+    scaled = amount * SCALE
+    return units if math.isclose(scaled, units, rel_tol=1e-12) else int(scaled)
+
+  scaled = np.asarray(amount, dtype='float64') * SCALE
+  return np.where(np.isclose(scaled, units, rtol=1e-12, atol=0), units, np.trunc(scaled)).astype('int64')
+
+
+# The units of round_decimal(amount, 4), without round()'s slow decimal conversion.  round() of a NumPy float rounds
+# the scaled amount, just like this.  round() of a Python float goes by its exact decimal value, which can only differ
+# when the scaled amount is a tie, so those few fall back to it.  Arrays round like Python floats, as in round_decimal.
+def round_units(amount):
+  if __is_scalar(amount):
+    scaled = amount * SCALE
+    units = round(scaled)
+
+    if abs(scaled - units) == 0.5 and not isinstance(amount, np.floating):
+      return to_units(round(amount, DECIMAL_PLACES))
+
+    return int(units)
+
+  values = np.asarray(amount, dtype='float64')
+  scaled = values * SCALE
+  units = np.rint(scaled).astype('int64')
+
+  ties = np.flatnonzero(np.abs(scaled - np.rint(scaled)) == 0.5)
+  units[ties] = [to_units(round(value, DECIMAL_PLACES)) for value in values[ties].tolist()]
+  return units
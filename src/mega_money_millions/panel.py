@@ -0,0 +1,112 @@
+import numpy as np
+import pandas as pd
+
+from .dateutils import positions_between, positions_at
+from .priceutils import widen
+
+
+class PricePanel:
+  """
+  Multi-asset prices held as one contiguous time x ticker x field float64 array, with lookup tables from time, ticker
+  and field to their positions.  A field across every time and ticker (`field('close')`), a ticker's history
+  (`ticker('BTC')`) or every ticker at one time (`at(i)`) are all strided views into that array, not copies.
+
+  Boolean fields are stored as 1.0/0.0, float32 fields are widened with `priceutils.widen` and a ticker missing at a
+  given time is all NaN.  `from_long` and `to_long` convert to and from the long-form (`time`, `ticker`) multi-indexed
+  DataFrames built by `priceutils.combine_prices`, restoring the original rows and dtypes.
+  """
+
+  def __init__(self, values: np.ndarray, times, tickers: list[str], fields: list[str], present: np.ndarray = None,
+               dtypes: dict = None):
+    if values.ndim != 3 or values.shape != (len(times), len(tickers), len(fields)):
+      raise ValueError(f"values must have shape {(len(times), len(tickers), len(fields))}, got {values.shape}")
+
+    self.times: pd.DatetimeIndex = pd.DatetimeIndex(times, name='time')
+    self.tickers: list[str] = list(tickers)
+    self.fields: list[str] = list(fields)
+    self.ticker_positions: dict[str, int] = {ticker: i for i, ticker in enumerate(self.tickers)}
+    self.field_positions: dict[str, int] = {field: i for i, field in enumerate(self.fields)}
+    self.present: np.ndarray = present if present is not None else ~np.isnan(values).all(axis=2)
+    self.dtypes: dict = dtypes or {field: np.dtype('float64') for field in self.fields}
+    # Has room for more fields than are in use, so add_field doesn't reallocate every time
+    self.__values: np.ndarray = np.ascontiguousarray(values, dtype='float64')
+
+  @classmethod
+  def from_long(cls, prices: pd.DataFrame) -> 'PricePanel':
+    time_codes, times = pd.factorize(prices.index.get_level_values('time'), sort=True)
+    ticker_codes, tickers = pd.factorize(prices.index.get_level_values('ticker'), sort=True)
+
+    values = np.full((len(times), len(tickers), len(prices.columns)), np.nan)
+    for i, column in enumerate(prices.columns):
+      if prices[column].dtype == 'float32':
+        # From priceutils.compact_prices: widen to the decimal values rather than casting
+        values[time_codes, ticker_codes, i] = widen(prices[column].to_numpy())
+      else:
+        values[time_codes, ticker_codes, i] = prices[column].to_numpy(dtype='float64', na_value=np.nan)
+
+    present = np.zeros((len(times), len(tickers)), dtype=bool)
+    present[time_codes, ticker_codes] = True
+
+    return cls(values, times, tickers, prices.columns, present, dict(prices.dtypes.items()))
+
+  def to_long(self) -> pd.DataFrame:
+    # Row-major order of the present mask is time, then ticker: the same order combine_prices sorts into
+    time_positions, ticker_positions = np.nonzero(self.present)
+    index = pd.MultiIndex.from_arrays([self.times[time_positions], pd.Index(self.tickers)[ticker_positions]],
+                                      names=['time', 'ticker'])
+    rows = self.values[time_positions, ticker_positions]
+
+    return pd.DataFrame({field: PricePanel.__restore(rows[:, i], self.dtypes[field])
+                         for i, field in enumerate(self.fields)}, index=index)
+
+  @staticmethod
+  def __restore(values: np.ndarray, dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+      restored = pd.array(values == 1.0, dtype=dtype)
+      if isinstance(restored, pd.arrays.BooleanArray):
+        restored[np.isnan(values)] = pd.NA
+      return restored
+
+    return values.astype(dtype)
+
+  @property
+  def values(self) -> np.ndarray:
+    return self.__values[:, :, :len(self.fields)]
+
+  def __len__(self) -> int:
+    return len(self.times)
+
+  def field(self, name: str) -> np.ndarray:
+    return self.__values[:, :, self.field_positions[name]]
+
+  def ticker(self, name: str) -> np.ndarray:
+    return self.values[:, self.ticker_positions[name], :]
+
+  def at(self, i: int) -> np.ndarray:
+    return self.values[i]
+
+  def add_field(self, name: str, values: np.ndarray, dtype='float64'):
+    if name not in self.field_positions:
+      if len(self.fields) == self.__values.shape[2]:
+        grown = np.full(self.__values.shape[:2] + (max(1, len(self.fields) * 2),), np.nan)
+        grown[:, :, :len(self.fields)] = self.values
+        self.__values = grown
+
+      self.field_positions[name] = len(self.fields)
+      self.fields.append(name)
+
+    self.__values[:, :, self.field_positions[name]] = values
+    self.dtypes[name] = np.dtype(dtype)
+
+  # These match backtester.TickIndex, so run_backtest can iterate a PricePanel directly
+
+  def between(self, start_at, end_at) -> range:
+    return positions_between(self.times, start_at, end_at)
+
+  def at_schedule(self, schedule: np.ndarray) -> np.ndarray:
+    return positions_at(self.times, schedule)
+
+  # The prices of every ticker present at tick i, indexed by ticker like prices.loc[date] on the long form
+  def prices_at(self, i: int) -> pd.DataFrame:
+    present = self.present[i]
+    return pd.DataFrame(self.values[i][present], index=pd.Index(self.tickers)[present], columns=self.fields)
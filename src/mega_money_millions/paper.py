@@ -0,0 +1,151 @@
+import asyncio
+import time
+import numpy as np
+import pandas as pd
+
+from .backtester import TickIndex
+from .exchange import Coinbase
+from .indicators.streaming import StreamingCrossover
+from .portfolio import Portfolio
+
+
+class ReplaySource:
+  """
+  Replays multi-asset prices (multi-indexed on `time` and `ticker`) as a stream of bars: iterating it asynchronously
+  yields `(time, prices_for_date)` in time order, waiting `interval` seconds between bars.  `prices` is either one frame
+  or an iterable of time-ordered chunks (eg: `PriceStore.iter_chunks()`), so replaying a file-backed store never loads
+  the whole history.
+  """
+
+  def __init__(self, prices, interval: float = 0.0):
+    self.chunks = [prices] if isinstance(prices, pd.DataFrame) else prices
+    self.interval: float = interval
+
+  @classmethod
+  def from_store(cls, store, tickers: list[str] = None, start_at=None, end_at=None, interval: float = 0.0):
+    return cls(store.iter_chunks(tickers, start_at, end_at), interval)
+
+  async def __aiter__(self):
+    for chunk in self.chunks:
+      ticks = TickIndex(chunk)
+
+      for i in range(len(ticks)):
+        # Sleeping (even for 0 seconds) yields to the event loop between bars, like a live feed would
+        await asyncio.sleep(self.interval)
+        yield ticks.times[i], ticks.prices_at(i)
+
+
+class QueueSource:
+  """
+  A live bar stream: whatever feeds it calls `put(date, prices_for_date)` as bars arrive and `close()` when done.
+  """
+
+  def __init__(self, maxsize: int = 0):
+    self.queue: asyncio.Queue = asyncio.Queue(maxsize)
+
+  async def put(self, date, prices_for_date: pd.DataFrame):
+    await self.queue.put((date, prices_for_date))
+
+  async def close(self):
+    await self.queue.put(None)
+
+  async def __aiter__(self):
+    while (bar := await self.queue.get()) is not None:
+      yield bar
+
+
+class PaperTrader:
+  """
+  Runs an `on_tick(date, portfolio, prices_for_date)` strategy written for `run_backtest` against a stream of bars
+  (eg: a `ReplaySource` or `QueueSource`), trading a `Portfolio` as the bars arrive.
+
+  `indicators` is a function returning a fresh list of streaming indicators (see `indicators.streaming`), called once
+  per ticker.  On each bar they're updated in order and their values added as fields of `prices_for_date`, so a
+  crossover can follow the SMAs it compares.  `prices_for_date` is float64 throughout, like `PricePanel.prices_at`, with
+  booleans as 1.0/0.0.  The time from receiving each bar to `on_tick` returning is recorded in `latencies`.
+  """
+
+  def __init__(self, on_tick, initial_cash, *, indicators=None, exchange=None):
+    self.on_tick = on_tick
+    self.portfolio: Portfolio = Portfolio(exchange or Coinbase(), initial_cash)
+    self.indicator_factory = indicators or list
+    # The indicators of each ticker, as (update, inputs) pairs
+    self.indicators: dict[str, list] = {}
+    self.latencies: list[float] = []
+    self.__fields: pd.Index | None = None
+    self.__positions: dict[str, int] = {}
+
+  # Bars before start_at only warm up the indicators; the stream stops after end_at
+  async def run(self, source, start_at=None, end_at=None) -> Portfolio:
+    start_at = pd.Timestamp(start_at) if start_at is not None else None
+    end_at = pd.Timestamp(end_at) if end_at is not None else None
+
+    async for date, prices_for_date in source:
+      received_at = time.perf_counter()
+
+      if end_at is not None and date > end_at:
+        break
+
+      prices_for_date = self.update(prices_for_date)
+
+      if start_at is None or date >= start_at:
+        self.on_tick(date, self.portfolio, prices_for_date)
+        self.latencies.append(time.perf_counter() - received_at)
+
+    return self.portfolio
+
+  # Updates each ticker's indicators with one bar of raw prices, returning the bar with the indicators' fields added
+  def update(self, prices_for_date: pd.DataFrame) -> pd.DataFrame:
+    if self.__fields is None:
+      self.__fields = prices_for_date.columns.append(pd.Index(PaperTrader.__indicator_fields(self.indicator_factory())))
+      self.__positions = {field: i for i, field in enumerate(self.__fields)}
+
+    # Plain lists are much quicker than NumPy for a few values at a time.  Each indicator's fields are appended to the
+    # row in order, so they land in the same positions as in __fields.
+    rows = prices_for_date.to_numpy(dtype='float64', na_value=np.nan).tolist()
+    close = self.__positions['close']
+
+    for row, ticker in zip(rows, prices_for_date.index):
+      updates = self.indicators.get(ticker)
+      if updates is None:
+        updates = self.indicators[ticker] = self.__updates(self.indicator_factory())
+
+      for update, inputs in updates:
+        if inputs is None:
+          row.append(update(row[close]))
+        else:
+          row.extend(update(row[inputs[0]], row[inputs[1]]))
+
+    return pd.DataFrame(np.array(rows, dtype='float64'), index=prices_for_date.index, columns=self.__fields)
+
+  # Each indicator's update method and the positions of the fields it reads (None for the close)
+  def __updates(self, indicators: list) -> list:
+    return [(indicator.update, tuple(self.__positions[field] for field in indicator.on_stats))
+            if isinstance(indicator, StreamingCrossover) else (indicator.update, None) for indicator in indicators]
+
+  # Bar-to-decision latency in milliseconds
+  def latency_report(self) -> dict:
+    latencies = np.array(self.latencies) * 1000
+
+    return {
+      'bars': len(latencies),
+      'mean_ms': float(latencies.mean()) if len(latencies) > 0 else 0.0,
+      'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) > 0 else 0.0,
+      'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) > 0 else 0.0,
+      'max_ms': float(latencies.max()) if len(latencies) > 0 else 0.0,
+    }
+
+  @staticmethod
+  def __indicator_fields(indicators: list) -> list[str]:
+    fields = []
+    for indicator in indicators:
+      fields.extend(indicator.to_stats if isinstance(indicator, StreamingCrossover) else [indicator.name])
+    return fields
+
+
+# Runs a PaperTrader to completion, eg: for replaying a ReplaySource outside of an event loop
+def run_paper_trading(source, initial_cash, *, on_tick, indicators=None, exchange=None, start_at=None,
+                      end_at=None) -> PaperTrader:
+  trader = PaperTrader(on_tick, initial_cash, indicators=indicators, exchange=exchange)
+  asyncio.run(trader.run(source, start_at, end_at))
+  return trader
@@ -2,7 +2,12 @@ from collections import defaultdict
 import pandas as pd
 import numpy as np
 
-from mega_money_millions.exchange import truncate_decimal, Exchange
+from mega_money_millions.exchange import Exchange
+from mega_money_millions.ledger import Ledger
+from mega_money_millions.metrics import RunningMetrics
+from mega_money_millions.money import round_units, to_float, to_units, truncate_decimal, truncate_units, whole_units
+from mega_money_millions.positions import LotRelief, Position, PositionBook
+from mega_money_millions.priceutils import widen
 
 
 class InsufficientFunds(Exception):
@@ -36,88 +41,322 @@ class Portfolio:
       'gain', # Will be 0 for buys
       'streak', # Will be 0 for buys
       'cash']
-
-  def __init__(self, exchange: Exchange, initial_cash: float):
+  TRANSACTIONS_DTYPES: list[str] = [
+      'object',
+      'object',
+      'float64',
+      'float64',
+      'float64',
+      'float64',
+      'float64',
+      'float64',
+      'int64',
+      'float64']
+  # Holdings under this count as flat, eg: the 0.0001 that selling 100% of a position can leave after rounding
+  FLAT_QUANTITY: float = 0.0002
+  # The columns held as integer units of 0.0001 in fixed-point mode
+  FIXED_POINT_COLUMNS: list[str] = ['quantity', 'cost', 'fee', 'cash_delta', 'gain', 'cash']
+
+  # With fixed_point=True, cash, costs, fees, gains and quantities are kept as integer units of 0.0001 (see money.py)
+  # rather than floats, so adding them up never drifts.  They're rounded exactly as they would be as floats, and only
+  # converted to floats when read (eg: cash() or transactions).  Quantities are truncated to 4 decimal places.
+  def __init__(self, exchange: Exchange, initial_cash: float, lot_relief: LotRelief = LotRelief.FIFO,
+               fixed_point: bool = False):
     self.initial_cash: float = initial_cash
-    self.exchange: str = exchange
+    self.fixed_point: bool = fixed_point
+    # Exchanges that keep trading history (eg: TieredCoinbase) give each portfolio its own
+    self.exchange: Exchange = exchange.new_account()
     # cost does NOT include fee
-    self.transactions: pd.DataFrame = pd.DataFrame(columns=Portfolio.TRANSACTIONS_COLUMNS)
+    self.ledger: Ledger = Ledger(dict(zip(Portfolio.TRANSACTIONS_COLUMNS, Portfolio.__dtypes(fixed_point))))
+    self.positions: PositionBook = PositionBook(lot_relief)
+    # Kept up to date on every trade, so the metric methods below don't scan the ledger
+    self.metrics: RunningMetrics = RunningMetrics(initial_cash, fixed_point)
+    # Equity marked to market after each tick, when run_backtest(record_equity=True) recorded it
+    self.equity_curve: pd.Series | None = None
+    self.__transactions: pd.DataFrame | None = None
+
+  @staticmethod
+  def __dtypes(fixed_point: bool) -> list[str]:
+    return ['int64' if fixed_point and column in Portfolio.FIXED_POINT_COLUMNS else dtype
+            for column, dtype in zip(Portfolio.TRANSACTIONS_COLUMNS, Portfolio.TRANSACTIONS_DTYPES)]
+
+  # Rebuilds a Portfolio from a previously recorded transactions DataFrame (eg: one that was cached or saved to disk)
+  @classmethod
+  def from_transactions(cls, exchange: Exchange, initial_cash: float, transactions: pd.DataFrame,
+                        lot_relief: LotRelief = LotRelief.FIFO, fixed_point: bool = False) -> 'Portfolio':
+    portfolio = cls(exchange, initial_cash, lot_relief, fixed_point)
+    portfolio.ledger.extend({column: to_units(transactions[column].to_numpy(dtype='float64'))
+                             if fixed_point and column in Portfolio.FIXED_POINT_COLUMNS
+                             else transactions[column].to_numpy(dtype=dtype)
+                             for column, dtype in zip(Portfolio.TRANSACTIONS_COLUMNS, Portfolio.TRANSACTIONS_DTYPES)})
+
+    for transaction in zip(*(portfolio.ledger.column(column) for column in Portfolio.TRANSACTIONS_COLUMNS)):
+      portfolio.__apply(*transaction)
+
+    return portfolio
+
+  # Built from the ledger on first access and cached until the next trade
+  @property
+  def transactions(self) -> pd.DataFrame:
+    if self.__transactions is None:
+      self.__transactions = self.ledger.to_frame()
+
+      if self.fixed_point:
+        for column in Portfolio.FIXED_POINT_COLUMNS:
+          self.__transactions[column] = to_float(self.__transactions[column].to_numpy())
+
+    return self.__transactions
+
+  def __record(self, *values):
+    self.ledger.append(*values)
+    self.__transactions = None
+
+  # Updates the position, the metrics and the exchange with a transaction once it's been recorded
+  def __apply(self, date, ticker: str, price: float, quantity, _cost, fee, _cash_delta, gain, streak: int, cash):
+    position = self.positions[ticker]
+
+    if quantity > 0:
+      position.buy(price, quantity, to_float(fee) if self.fixed_point else fee)
+    else:
+      position.sell(-quantity, gain, streak)
+
+    self.metrics.record(ticker, price, position.quantity, gain, streak, cash, quantity < 0)
+
+    self.exchange.record_trade(ticker, date, price, to_float(quantity) if self.fixed_point else quantity)
 
   def buy(self, ticker: str, date: str, price: float, quantity: float = None, percentage_of_cash: float = None):
     if quantity is None and percentage_of_cash is None or quantity is not None and percentage_of_cash is not None:
       raise ValueError("Must specify either quantity or percentage_of_cash")
 
-    cash = self.cash()
+    price = widen(price)
 
-    if percentage_of_cash is not None:
-      quantity = self.exchange.max_quantity(ticker, price, truncate_decimal(cash * percentage_of_cash / 100.00, 4))
+    if self.fixed_point:
+      cash = self.__cash_units()
 
-    cost = round(price * quantity, Portfolio.ROUND_TO)
-    fee = self.exchange.fee_for_buy(ticker, date, price, quantity)
-    cash_delta = -(cost + fee)
+      if percentage_of_cash is not None:
+        quantity = self.exchange.max_quantity_units(ticker, price,
+                                                    truncate_units(to_float(cash) * percentage_of_cash / 100.00), date)
+      else:
+        quantity = whole_units(quantity)
 
-    if -cash_delta > cash or cash_delta >= 0:
-      raise InsufficientFunds(cash, ticker, price, quantity, cost, fee)
+      fee = self.exchange.fee_units_for_buy(ticker, date, price, quantity)
+      transaction = self.__buy_units_transaction(ticker, date, price, quantity, fee, cash)
+    else:
+      cash = self.cash()
 
-    # This is a little confusing - cash_delta should be negative.  But it makes sense for consistency's sake.
-    cash = round(cash + cash_delta, Portfolio.ROUND_TO)
+      if percentage_of_cash is not None:
+        quantity = self.exchange.max_quantity(ticker, price, truncate_decimal(cash * percentage_of_cash / 100.00, 4),
+                                              date)
 
-    # TODO: is there a better value than 0 for gain for buys?
-    self.transactions.loc[len(self.transactions)] = [date, ticker, price, quantity, cost, fee, cash_delta, 0.0, 0, cash]
+      fee = self.exchange.fee_for_buy(ticker, date, price, quantity)
+      transaction = self.__buy_transaction(ticker, date, price, quantity, fee, cash)
+
+    self.__record(*transaction)
+    self.__apply(*transaction)
 
   def sell(self, ticker: str, date: str, price: float, quantity: float = None, percentage_of_shares: float = None):
     if quantity is None and percentage_of_shares is None or quantity is not None and percentage_of_shares is not None:
       raise ValueError("Must specify either quantity or percentage_of_shares")
 
+    price = widen(price)
+    position = self.positions[ticker]
+
+    if self.fixed_point:
+      if quantity is None:
+        quantity = min(truncate_units(to_float(position.quantity) * (float(percentage_of_shares) / 100)),
+                       position.quantity)
+      else:
+        quantity = whole_units(quantity)
+
+      fee = self.exchange.fee_units_for_sell(ticker, date, price, quantity)
+      transaction = self.__sell_units_transaction(position, date, price, quantity, fee, self.__cash_units())
+    else:
+      if quantity is None:
+        # truncate_decimal's float multiply can round up past owned (eg: 1.7251999999999998 -> 1.7252)
+        quantity = min(truncate_decimal(position.quantity * (float(percentage_of_shares) / 100), 4), position.quantity)
+
+      fee = self.exchange.fee_for_sell(ticker, date, price, quantity)
+      transaction = self.__sell_transaction(position, date, price, quantity, fee, self.cash())
+
+    self.__record(*transaction)
+    self.__apply(*transaction)
+
+  # Executes many orders on one date in a single pass.  orders maps each ticker to a quantity, positive to buy and
+  # negative to sell, and prices maps each ticker to its price.  All of the sells are executed before any of the buys,
+  # so their proceeds can pay for the buys.  The fees of each side are computed in one call to the exchange, so they're
+  # all at its fee rate as of the start of date.  Nothing is recorded unless every order can be filled.
+  def execute(self, date: str, orders: dict[str, float], prices):
+    if self.fixed_point:
+      orders = {ticker: whole_units(quantity) for ticker, quantity in orders.items()}
+      cash = self.__cash_units()
+      fee_for_sell, fee_for_buy = self.exchange.fee_units_for_sell, self.exchange.fee_units_for_buy
+      sell_transaction, buy_transaction = self.__sell_units_transaction, self.__buy_units_transaction
+    else:
+      cash = self.cash()
+      fee_for_sell, fee_for_buy = self.exchange.fee_for_sell, self.exchange.fee_for_buy
+      sell_transaction, buy_transaction = self.__sell_transaction, self.__buy_transaction
+
+    sells = [(ticker, widen(prices[ticker]), -quantity) for ticker, quantity in orders.items() if quantity < 0]
+    buys = [(ticker, widen(prices[ticker]), quantity) for ticker, quantity in orders.items() if quantity > 0]
+    sell_fees, buy_fees = self.__fees(fee_for_sell, date, sells), self.__fees(fee_for_buy, date, buys)
+    transactions = []
+
+    for (ticker, price, quantity), fee in zip(sells, sell_fees):
+      transactions.append(sell_transaction(self.positions[ticker], date, price, quantity, fee, cash))
+      cash = transactions[-1][-1]
+
+    for (ticker, price, quantity), fee in zip(buys, buy_fees):
+      transactions.append(buy_transaction(ticker, date, price, quantity, fee, cash))
+      cash = transactions[-1][-1]
+
+    if len(transactions) == 0:
+      return
+
+    self.ledger.extend(dict(zip(Portfolio.TRANSACTIONS_COLUMNS, zip(*transactions))))
+    self.__transactions = None
+
+    for transaction in transactions:
+      self.__apply(*transaction)
+
+  # The fees of orders (ticker, price, quantity) as floats, from one call to fee_function with arrays
+  @staticmethod
+  def __fees(fee_function, date: str, orders: list[tuple]) -> list[float]:
+    if len(orders) == 0:
+      return []
+
+    tickers, prices, quantities = zip(*orders)
+    return np.asarray(fee_function(np.array(tickers), date, np.array(prices), np.array(quantities))).tolist()
+
+  # Trades on date towards holding target_weights (ticker -> fraction of the portfolio's value, summing to at most 1) at
+  # prices.  Tickers that are held but not in target_weights are sold off.  The buys are sized to fit the cash left
+  # after the sells, fees included.  Returns the orders executed, as passed to execute.
+  def rebalance(self, date: str, target_weights: dict[str, float], prices) -> dict[str, float]:
+    if any(weight < 0 for weight in target_weights.values()) or sum(target_weights.values()) > 1 + 1e-9:
+      raise ValueError("target_weights must be non-negative and sum to at most 1")
+
+    held = {position.ticker: self.quantity_owned(position.ticker) for position in self.positions
+            if position.quantity > 0}
+    equity = self.cash() + sum(quantity * widen(prices[ticker]) for ticker, quantity in held.items())
+    orders, budgets = {}, {}
+
+    for ticker in list(held.keys()) + [ticker for ticker in target_weights if ticker not in held]:
+      price = widen(prices[ticker])
+      target_value = equity * target_weights.get(ticker, 0.0)
+      owned = held.get(ticker, 0.0)
+
+      if target_value == 0:
+        if owned > 0:
+          orders[ticker] = -owned
+      elif owned * price > target_value:
+        quantity = min(truncate_decimal(owned - target_value / price, 4), owned)
+        if quantity > 0:
+          orders[ticker] = -quantity
+      else:
+        budgets[ticker] = target_value - owned * price
+
+    # The cash left once the sells are executed
     cash = self.cash()
+    sells = [(ticker, widen(prices[ticker]), -quantity) for ticker, quantity in orders.items()]
+    for (_, price, quantity), fee in zip(sells, self.__fees(self.exchange.fee_for_sell, date, sells)):
+      cash = round(cash + round(price * quantity, Portfolio.ROUND_TO) - fee, Portfolio.ROUND_TO)
+
+    # The cost and fee of each buy are rounded to ROUND_TO places, so each can come to a little more than its budget
+    available = cash - 2 * 10 ** -Portfolio.ROUND_TO * len(budgets)
+    scale = min(1.0, available / sum(budgets.values())) if len(budgets) > 0 and available > 0 else 0.0
+
+    if len(budgets) > 0:
+      tickers = list(budgets.keys())
+      buy_prices = np.array([widen(prices[ticker]) for ticker in tickers])
+      quantities = self.exchange.max_quantity(np.array(tickers), buy_prices,
+                                              truncate_decimal(np.array(list(budgets.values())) * scale, 4), date)
+      orders.update({ticker: quantity for ticker, quantity in zip(tickers, np.asarray(quantities).tolist())
+                     if quantity > 0})
+
+    self.execute(date, orders, prices)
+    return orders
+
+  def __buy_transaction(self, ticker: str, date: str, price: float, quantity: float, fee: float, cash: float) -> tuple:
+    cost = round(price * quantity, Portfolio.ROUND_TO)
+    cash_delta = -(cost + fee)
 
-    owned = self.quantity_owned(ticker)
+    if -cash_delta > cash or cash_delta >= 0:
+      raise InsufficientFunds(cash, ticker, price, quantity, cost, fee)
 
-    if quantity is None:
-      quantity = truncate_decimal(owned * (float(percentage_of_shares) / 100), 4)
+    # This is a little confusing - cash_delta should be negative.  But it makes sense for consistency's sake.
+    cash = round(cash + cash_delta, Portfolio.ROUND_TO)
 
-    fee = self.exchange.fee_for_sell(ticker, date, price, quantity)
+    # TODO: is there a better value than 0 for gain for buys?
+    return date, ticker, price, quantity, cost, fee, cash_delta, 0.0, 0, cash
 
-    if owned < quantity:
-      raise InsufficientShares(owned, ticker, price, quantity, fee)
+  def __sell_transaction(self, position: Position, date: str, price: float, quantity: float, fee: float,
+                         cash: float) -> tuple:
+    if position.quantity < quantity:
+      raise InsufficientShares(position.quantity, position.ticker, price, quantity, fee)
 
     cost = round(price * quantity, Portfolio.ROUND_TO)
     cash_delta = cost - fee
 
     cash = round(cash + cash_delta, Portfolio.ROUND_TO)
 
-    avg_purchase_price = self.avg_purchase_price(ticker, include_fees=True)
+    avg_purchase_price = position.avg_purchase_price(include_fees=True)
 
     gain = round(cash_delta - (avg_purchase_price * quantity), Portfolio.ROUND_TO)
-    sells = self.sells(ticker)
-
-    if len(sells) > 0:
-      previous_sell = sells.iloc[-1]
-      div_safe_gain = gain if gain != 0 else 1 # To prevent divide by zero errors
-      # If the gains signs differ, we went from a loss to a win or vice versa
-      if previous_sell is None or previous_sell['gain'] / div_safe_gain < 0:
-        streak = 1
-      else:
-        streak = previous_sell['streak'] + 1
-    else:
-      streak = 1
+    streak = position.next_streak(gain)
+
+    return date, position.ticker, price, -quantity, cost, fee, cash_delta, gain, streak, cash
+
+  # The same as __buy_transaction and __sell_transaction, in units.  Adding units up is exact, so cash and cash_delta
+  # don't need rounding.
+  def __buy_units_transaction(self, ticker: str, date: str, price: float, quantity: int, fee: int, cash: int) -> tuple:
+    cost = round_units(price * to_float(quantity))
+    cash_delta = -(cost + fee)
+
+    if -cash_delta > cash or cash_delta >= 0:
+      raise InsufficientFunds(to_float(cash), ticker, price, to_float(quantity), to_float(cost), to_float(fee))
+
+    return date, ticker, price, quantity, cost, fee, cash_delta, 0, 0, cash + cash_delta
 
-    self.transactions.loc[len(self.transactions)] = [date, ticker, price, -quantity,
-                                                     cost, fee, cash_delta, gain, streak, cash]
+  def __sell_units_transaction(self, position: Position, date: str, price: float, quantity: int, fee: int,
+                               cash: int) -> tuple:
+    if position.quantity < quantity:
+      raise InsufficientShares(to_float(position.quantity), position.ticker, price, to_float(quantity), to_float(fee))
+
+    cost = round_units(price * to_float(quantity))
+    cash_delta = cost - fee
+
+    avg_purchase_price = position.avg_purchase_price(include_fees=True)
+
+    # The float cash_delta, so the gain is rounded from the same value as it would be in floats
+    gain = round_units(to_float(cost) - to_float(fee) - avg_purchase_price * to_float(quantity))
+    streak = position.next_streak(gain)
+
+    return date, position.ticker, price, -quantity, cost, fee, cash_delta, gain, streak, cash + cash_delta
 
   def quantity_owned(self, ticker: str) -> float:
-    transactions = self.transactions.loc[self.transactions['ticker'] == ticker]
+    quantity = self.positions.quantity(ticker)
 
-    return transactions['quantity'].sum()
+    return to_float(quantity) if self.fixed_point else quantity
 
   def cash(self) -> float:
-    if len(self.transactions) > 0:
-      return self.transactions.iloc[-1]['cash']
+    if len(self.ledger) > 0:
+      cash = self.ledger.last('cash')
+      return to_float(int(cash)) if self.fixed_point else float(cash)
 
     return self.initial_cash
 
+  def __cash_units(self) -> int:
+    if len(self.ledger) > 0:
+      return int(self.ledger.last('cash'))
+
+    return to_units(self.initial_cash)
+
   def reset(self):
-    self.transactions = pd.DataFrame(columns=Portfolio.TRANSACTIONS_COLUMNS)
+    self.ledger.clear()
+    self.positions.clear()
+    self.metrics.reset()
+    self.equity_curve = None
+    self.exchange = self.exchange.new_account()
+    self.__transactions = None
 
   def buys(self, ticker: str | None = None) -> pd.DataFrame:
     buys = self.transactions.loc[self.transactions['quantity'] > 0]
@@ -135,34 +374,9 @@ class Portfolio:
     else:
       return sells.loc[self.transactions['ticker'] == ticker]
 
+  # The average purchase price of the shares still owned, based on whichever lots are left after lot relief
   def avg_purchase_price(self, ticker: str, include_fees=False) -> float:
-    quantity = self.quantity_owned(ticker)
-    # Position sells before buys, cumsum quantity, then select rows from cumsum_quantity >=0 to <= quantity.  This gives
-    # us a share inventory.
-    previous_sells = self.sells(ticker=ticker).copy()
-    previous_buys = self.buys(ticker=ticker).copy()
-
-    # Rewrite the indices so the sells come before the buys
-    previous_sells_count = len(previous_sells)
-    previous_sells.index = [i for i in range(previous_sells_count)]
-    previous_buys.index = [i for i in range(previous_sells_count, previous_sells_count + len(previous_buys))]
-    sells_then_buys = previous_sells.combine_first(previous_buys)
-    sells_then_buys['qcs'] = sells_then_buys['quantity'].cumsum()
-    inventory = sells_then_buys.loc[(sells_then_buys['qcs'] > 0) & (sells_then_buys['qcs'] <= quantity)]
-
-    if len(inventory) == 0:
-      return 0
-
-    prices = inventory['price']
-    if include_fees:
-      prices += inventory['fee']
-    quantities = inventory['quantity'].copy()
-
-    # The last row may have more than we need
-    if inventory.iloc[-1]['qcs'] > quantity:
-      quantities.iloc[-1] = inventory.iloc[-1]['qcs'] - quantity
-
-    return (prices * quantities).sum() / quantities.sum()
+    return self.positions.avg_purchase_price(ticker, include_fees)
 
   # https://trendspider.com/learning-center/basic-backtesting-metrics/
   """
@@ -215,42 +429,128 @@ class Portfolio:
 
     return sells.loc[sells['gain'] < 0]
 
+  # The metrics below are read from self.metrics in O(1), so they're cheap to call from on_tick
+
   def avg_win_streak(self) -> float:
-    return self.wins()['streak'].mean()
+    return self.metrics.avg_win_streak()
 
   def max_win_streak(self) -> int:
-    return self.wins()['streak'].max()
+    return self.metrics.max_win_streak
 
   def avg_loss_streak(self):
-    return self.losses()['streak'].mean()
+    return self.metrics.avg_loss_streak()
 
   def max_loss_streak(self):
-    return self.losses()['streak'].max()
+    return self.metrics.max_loss_streak
 
-  # TODO
-  # def max_drawdown(self):
-  #   pass
+  # A percentage, see report()
+  def max_drawdown(self, equity: pd.Series | None = None) -> float:
+    equity = equity if equity is not None else self.equity_curve
+    return self.metrics.max_drawdown() if equity is None else self.report(equity)['max_drawdown']
 
   def avg_win(self):
-    return self.wins()['gain'].mean()
+    return self.metrics.avg_win()
 
   def avg_loss(self):
-    return self.losses()['gain'].mean()
+    return self.metrics.avg_loss()
 
   def avg_return(self):
-    return self.sells()['gain'].mean()
+    return self.metrics.avg_return()
 
   def reward_to_risk_ratio(self):
-    return self.avg_win() / self.avg_loss()
-
-  # TODO
-  # def avg_length(self):
-  #   pass
-
-  # TODO
-  # def trades_per_day(self):
-  #   self.positions.groupby('time')
-
-  # TODO
-  # def trades_per_month(self):
-  #   pass
+    return self.avg_win() / self.avg_loss() if self.avg_loss() != 0 else np.nan
+
+  def avg_length(self, period=None):
+    return self.report(period=period)['avg_length']
+
+  def trades_per_day(self, equity: pd.Series | None = None) -> float:
+    return self.report(equity)['trades_per_day']
+
+  def trades_per_month(self, equity: pd.Series | None = None) -> float:
+    return self.report(equity)['trades_per_month']
+
+  # Every metric above as a dict.  The win/loss metrics and (without an equity curve) max_drawdown come from
+  # self.metrics; the rest take one pass over the ledger's arrays, rather than filtering the transactions once per
+  # metric, so it's cheap enough to run on every result of a sweep.  positions is the number of sells, and win_rate and
+  # loss_rate are percentages of them.
+  #
+  # Given an equity curve (a Series indexed by time), or if one was recorded (equity_curve), max_drawdown is measured on
+  # that instead.  avg_length is the mean time from opening a position in a ticker to closing it out again (round_trips
+  # counts those), in multiples of period if one is given (eg: '1D' for daily candles).  trades_per_day and
+  # trades_per_month are over the span of the equity curve, or from the first trade to the last.
+  def report(self, equity: pd.Series | None = None, period=None) -> dict:
+    equity = equity if equity is not None else self.equity_curve
+    times = pd.DatetimeIndex(pd.to_datetime(self.ledger.column('time')))
+    codes = pd.factorize(self.ledger.column('ticker'))[0]
+    quantities = self.ledger.column('quantity')
+    quantities = to_float(quantities) if self.fixed_point else quantities
+
+    round_trips = Portfolio.__round_trips(codes, Portfolio.__holdings(codes, quantities))
+    lengths = times[round_trips[1]] - times[round_trips[0]]
+    avg_length = lengths.mean() if len(lengths) > 0 else pd.NaT
+
+    if equity is None:
+      max_drawdown = self.metrics.max_drawdown()
+      span = times[-1] - times[0] if len(times) > 0 else pd.Timedelta(0)
+    else:
+      equity_values = equity.to_numpy(dtype='float64')
+      peaks = np.maximum.accumulate(equity_values)
+      max_drawdown = round(float(((peaks - equity_values) / peaks).max()) * 100, Portfolio.ROUND_TO) \
+        if len(equity_values) > 0 else 0.0
+      span = equity.index[-1] - equity.index[0] if len(equity) > 0 else pd.Timedelta(0)
+
+    metrics = self.metrics
+    sells = metrics.sells()
+    days = span / pd.Timedelta(days=1)
+
+    return {
+      'net_performance': self.net_performance(),
+      'positions': sells,
+      'round_trips': len(lengths),
+      'wins': metrics.wins,
+      'losses': metrics.losses,
+      'win_rate': round(metrics.wins / sells * 100, Portfolio.ROUND_TO) if sells > 0 else np.nan,
+      'loss_rate': round(metrics.losses / sells * 100, Portfolio.ROUND_TO) if sells > 0 else np.nan,
+      'avg_win_streak': self.avg_win_streak(),
+      'max_win_streak': self.max_win_streak(),
+      'avg_loss_streak': self.avg_loss_streak(),
+      'max_loss_streak': self.max_loss_streak(),
+      'max_drawdown': max_drawdown,
+      'avg_win': self.avg_win(),
+      'avg_loss': self.avg_loss(),
+      'avg_return': self.avg_return(),
+      'reward_to_risk_ratio': self.reward_to_risk_ratio(),
+      'avg_length': avg_length / pd.Timedelta(period) if period is not None and avg_length is not pd.NaT
+                    else avg_length,
+      'trades_per_day': len(times) / days if days > 0 else np.nan,
+      'trades_per_month': len(times) / (days / (365.25 / 12)) if days > 0 else np.nan,
+    }
+
+  # The quantity of each transaction's ticker held before and after it: a running sum within each ticker's transactions,
+  # so it's O(transactions) however many tickers there are
+  @staticmethod
+  def __holdings(codes: np.ndarray, quantities: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    after = pd.Series(quantities, dtype='float64').groupby(codes, sort=False).cumsum()
+    before = after.groupby(codes, sort=False).shift(fill_value=0.0)
+    return before.to_numpy(), after.to_numpy()
+
+  # The rows that open a position (a ticker's holdings going from nothing to something) and the rows that close them
+  # again, paired up.  Positions still open at the end have no closing row and are left out.
+  @staticmethod
+  def __round_trips(codes: np.ndarray, holdings: tuple[np.ndarray, np.ndarray]) -> tuple[np.ndarray, np.ndarray]:
+    held_before, held_after = (np.abs(quantities) >= Portfolio.FLAT_QUANTITY for quantities in holdings)
+
+    opens, closes = np.flatnonzero(~held_before & held_after), np.flatnonzero(held_before & ~held_after)
+
+    # A ticker's opens and closes alternate, so its nth open pairs with its nth close
+    def __keys(positions):
+      positions = positions[np.argsort(codes[positions], kind='stable')]
+      position_codes = codes[positions]
+      ranks = np.arange(len(positions)) - np.searchsorted(position_codes, position_codes, side='left')
+      return positions, position_codes * len(codes) + ranks
+
+    opens, open_keys = __keys(opens)
+    closes, close_keys = __keys(closes)
+    _, open_indices, close_indices = np.intersect1d(open_keys, close_keys, assume_unique=True, return_indices=True)
+
+    return opens[open_indices], closes[close_indices]
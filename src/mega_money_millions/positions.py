@@ -0,0 +1,130 @@
+from collections import deque
+from enum import Enum
+
+
+class LotRelief(Enum):
+  FIFO = 'fifo' # Sell the oldest lots first
+  LIFO = 'lifo' # Sell the newest lots first
+  HIFO = 'hifo' # Sell the most expensive lots first
+
+
+class Lot:
+  __slots__ = ('price', 'fee_price', 'quantity')
+
+  def __init__(self, price: float, fee_price: float, quantity: float):
+    self.price: float = price
+    # The lot's price plus the full fee paid to buy it, which is what avg_purchase_price(include_fees=True) has always
+    # averaged over
+    self.fee_price: float = fee_price
+    self.quantity: float = quantity
+
+
+class Position:
+  """
+  The open lots, running quantity and running cost basis for one ticker, plus the gain and streak of its last sell.
+  Everything is updated as trades happen so that reading any of it is O(1).
+  """
+  __slots__ = ('ticker', 'lot_relief', 'lots', 'quantity', 'cost', 'fee_cost', 'last_gain', 'streak')
+
+  def __init__(self, ticker: str, lot_relief: LotRelief = LotRelief.FIFO):
+    self.ticker: str = ticker
+    self.lot_relief: LotRelief = lot_relief
+    self.lots: deque[Lot] = deque()
+    self.quantity: float = 0.0
+    self.cost: float = 0.0
+    self.fee_cost: float = 0.0
+    self.last_gain: float | None = None
+    self.streak: int = 0
+
+  def buy(self, price: float, quantity: float, fee: float):
+    lot = Lot(price, price + fee, quantity)
+
+    if self.lot_relief == LotRelief.HIFO:
+      # Keep lots sorted by price so the most expensive is always on the right
+      i = len(self.lots)
+      while i > 0 and self.lots[i - 1].price > price:
+        i -= 1
+      self.lots.insert(i, lot)
+    else:
+      self.lots.append(lot)
+
+    self.quantity += quantity
+    self.cost += price * quantity
+    self.fee_cost += lot.fee_price * quantity
+
+  def sell(self, quantity: float, gain: float, streak: int):
+    self.quantity -= quantity
+    self.last_gain = gain
+    self.streak = streak
+
+    remaining = quantity
+    while remaining > 0 and len(self.lots) > 0:
+      lot = self.lots[0] if self.lot_relief == LotRelief.FIFO else self.lots[-1]
+      relieved = min(lot.quantity, remaining)
+
+      if relieved == lot.quantity:
+        if self.lot_relief == LotRelief.FIFO:
+          self.lots.popleft()
+        else:
+          self.lots.pop()
+      else:
+        lot.quantity -= relieved
+
+      self.cost -= lot.price * relieved
+      self.fee_cost -= lot.fee_price * relieved
+      remaining -= relieved
+
+    # Don't let rounding error accumulate across positions that have been closed out
+    if len(self.lots) == 0:
+      self.cost = 0.0
+      self.fee_cost = 0.0
+
+  def avg_purchase_price(self, include_fees=False) -> float:
+    if len(self.lots) == 0 or self.quantity <= 0:
+      return 0
+
+    return (self.fee_cost if include_fees else self.cost) / self.quantity
+
+  def next_streak(self, gain: float) -> int:
+    if self.last_gain is None:
+      return 1
+
+    div_safe_gain = gain if gain != 0 else 1 # To prevent divide by zero errors
+    # If the gains signs differ, we went from a loss to a win or vice versa
+    if self.last_gain / div_safe_gain < 0:
+      return 1
+
+    return self.streak + 1
+
+
+class PositionBook:
+  def __init__(self, lot_relief: LotRelief = LotRelief.FIFO):
+    self.lot_relief: LotRelief = lot_relief
+    self.positions: dict[str, Position] = {}
+
+  def __getitem__(self, ticker: str) -> Position:
+    position = self.positions.get(ticker)
+
+    if position is None:
+      position = self.positions[ticker] = Position(ticker, self.lot_relief)
+
+    return position
+
+  def __contains__(self, ticker: str) -> bool:
+    return ticker in self.positions
+
+  def __iter__(self):
+    return iter(self.positions.values())
+
+  def quantity(self, ticker: str) -> float:
+    position = self.positions.get(ticker)
+
+    return position.quantity if position is not None else 0.0
+
+  def avg_purchase_price(self, ticker: str, include_fees=False) -> float:
+    position = self.positions.get(ticker)
+
+    return position.avg_purchase_price(include_fees) if position is not None else 0
+
+  def clear(self):
+    self.positions.clear()
@@ -1,3 +1,4 @@
+import numpy as np
 import pandas as pd
 from functools import reduce
 
@@ -14,45 +15,133 @@ def __is_valid_multi_ticker_df(prices):
 
   return ['time', 'ticker'] == [*map(lambda x: x.name, prices.index.levels)]
 
-def __combine_single_with_single(prices1, prices2):
-  return prices1.set_index([prices1.index, 'ticker']).combine_first(prices2.set_index([prices2.index, 'ticker']))
-
-def __combine_single_with_multi(single_prices, multi_prices):
-  return multi_prices.combine_first(single_prices.set_index([single_prices.index, 'ticker']))
-
-def __combine_multi_with_multi(prices1, prices2):
-  return prices1.combine_first(prices2)
-
 __VALIDATION_ERROR_MESSAGE = """
 prices must either be a single-security dataframe with a 'ticker' column or a multi-security dataframe with a MultiIndex
 of ('time', 'ticker')
 """
 
-def ensure_correct_dtypes(combined_prices):
-  new_prices = combined_prices.copy()
-  for column in ['close', 'open', 'high', 'low', 'volume']:
-    new_prices[column] = new_prices[column].astype('float')
+__PRICE_COLUMNS = ['close', 'open', 'high', 'low', 'volume']
+
+# compact=True stores prices as float32, 'complete' as plain bool when it has no missing values and a single-asset
+# 'ticker' column as a categorical (a multi-asset index already stores tickers as integer codes).  float32 holds at
+# least 6 significant digits, so prices with at most 6 significant digits always survive exactly; see widen.
+def ensure_correct_dtypes(combined_prices, copy=True, compact=False):
+  new_prices = combined_prices.copy() if copy else combined_prices
+  for column in __PRICE_COLUMNS:
+    if compact:
+      new_prices[column] = new_prices[column].astype('float32')
+    else:
+      new_prices[column] = widen(new_prices[column]).astype('float')
+
+  if compact and not new_prices['complete'].isna().any():
+    new_prices['complete'] = new_prices['complete'].astype('bool')
+  else:
+    new_prices['complete'] = new_prices['complete'].astype('boolean')
 
-  new_prices['complete'] = new_prices['complete'].astype('boolean')
+  if compact and 'ticker' in new_prices:
+    new_prices['ticker'] = new_prices['ticker'].astype('category')
 
   return new_prices
 
-def combine_prices(prices1, prices2):
-  prices1_is_single, prices_1_is_multi = __is_valid_single_ticker_df(prices1), __is_valid_multi_ticker_df(prices1)
-  prices2_is_single, prices_2_is_multi = __is_valid_single_ticker_df(prices2), __is_valid_multi_ticker_df(prices2)
+def compact_prices(prices):
+  return ensure_correct_dtypes(prices, compact=True)
+
+# Bytes used by each column (and the index) of before and after, eg: memory_report(prices, compact_prices(prices))
+def memory_report(before, after) -> dict:
+  before_usage, after_usage = before.memory_usage(deep=True), after.memory_usage(deep=True)
+
+  return {
+    'before': int(before_usage.sum()),
+    'after': int(after_usage.sum()),
+    'ratio': before_usage.sum() / after_usage.sum(),
+    'columns': {column: (int(before_usage.get(column, 0)), int(after_usage.get(column, 0)))
+                for column in before_usage.index.union(after_usage.index, sort=False)},
+  }
+
+# Widens float32 prices (from compact_prices) to the float64 closest to their shortest decimal representation, eg:
+# float32 6545.12 becomes 6545.12 rather than 6545.1201171875, so cash arithmetic matches the float64 prices exactly.
+# float32 keeps at least 6 significant digits, so decimals with up to 6 always come back exactly, and most with 7 do
+# (eg: 42123.45).  Anything else is returned as is.
+def widen(prices):
+  if isinstance(prices, np.floating) and prices.dtype.itemsize < 8:
+    return float(__shortest_decimals(np.array([prices]))[0])
+
+  if isinstance(prices, np.ndarray) and prices.dtype.kind == 'f' and prices.dtype.itemsize < 8:
+    return __shortest_decimals(prices)
+
+  if isinstance(prices, pd.Series) and prices.dtype.kind == 'f' and prices.dtype.itemsize < 8:
+    return pd.Series(__shortest_decimals(prices.to_numpy()), index=prices.index, name=prices.name)
+
+  return prices
+
+# Numerically what float(str(value)) does for each value, without formatting and parsing strings: values are rounded to
+# the fewest significant digits (from the least the dtype always keeps) that convert back to the same value.  Exact from
+# 1e-13 to 1e15; outside that the powers of ten aren't exact floats, so a result can be a float64 ulp off.
+def __shortest_decimals(values: np.ndarray) -> np.ndarray:
+  widened = values.astype('float64')
+  pending = np.flatnonzero(np.isfinite(widened) & (widened != 0))
+
+  digits = np.finfo(values.dtype).precision
+  while len(pending) > 0:
+    candidates = __round_significant(widened[pending], digits)
+    exact = candidates.astype(values.dtype) == values[pending]
+    widened[pending[exact]] = candidates[exact]
+    pending = pending[~exact]
+    digits += 1
+
+  return widened
+
+# Rounds each (finite, non-zero) value to digits significant digits.  Scales by a power of ten so the rounding happens
+# on integers, as multiplying or dividing an integer by an exact power of ten gives the float64 closest to the decimal.
+def __round_significant(values: np.ndarray, digits: int) -> np.ndarray:
+  # Decimal places to keep: negative ones scale down instead (eg: rounding volumes in the billions)
+  places = digits - 1 - np.floor(np.log10(np.abs(values))).astype('int64')
+  up, down = 10.0 ** np.maximum(places, 0), 10.0 ** np.maximum(-places, 0)
+
+  return np.rint(values * up / down) / up * down
+
+# Combines any number of single- and multi-asset price DataFrames into one DataFrame multi-indexed on time and ticker.
+# Where frames overlap, the first non-null value wins, with the same precedence as combining the frames pairwise from
+# the left with combine_first: of the first two frames, a multi-asset frame wins over a single-asset one (otherwise the
+# first wins), and every later frame only fills in gaps, in the order given.  Everything is concatenated once, so this
+# is linear in the total number of rows rather than quadratic in the number of frames.
+def combine_many(frames, compact=False):
+  indexed, multi = [], []
+
+  for prices in frames:
+    multi.append(__is_valid_multi_ticker_df(prices))
+    if multi[-1]:
+      indexed.append(prices)
+    elif __is_valid_single_ticker_df(prices):
+      if isinstance(prices['ticker'].dtype, pd.CategoricalDtype):
+        # A categorical column would make a CategoricalIndex level, which isn't a valid multi-asset index
+        prices = prices.assign(ticker=prices['ticker'].astype('object'))
+      indexed.append(prices.set_index([prices.index, 'ticker']))
+    else:
+      raise ValueError(__VALIDATION_ERROR_MESSAGE)
 
-  if (not prices1_is_single and not prices_1_is_multi) or (not prices2_is_single and not prices_2_is_multi):
+  if len(indexed) == 0:
     raise ValueError(__VALIDATION_ERROR_MESSAGE)
 
-  if prices1_is_single:
-    if prices2_is_single:
-      combined = __combine_single_with_single(prices1, prices2)
-    else:
-      combined = __combine_single_with_multi(prices1, prices2)
-  else:
-    if prices2_is_single:
-      combined = __combine_single_with_multi(prices2, prices1)
-    else:
-      combined = __combine_multi_with_multi(prices1, prices2)
+  if len(indexed) > 1 and not multi[0] and multi[1]:
+    indexed[0], indexed[1] = indexed[1], indexed[0]
+
+  if not compact:
+    # Concatenating would cast compact frames' float32 prices to float64 as is, rather than widening them
+    indexed = [ensure_correct_dtypes(prices) if any(dtype == 'float32' for dtype in prices.dtypes) else prices
+               for prices in indexed]
+
+  columns = reduce(lambda union, prices: union.union(prices.columns), indexed[1:], indexed[0].columns)
+  combined = pd.concat(indexed, sort=False)
+
+  if not combined.index.is_unique:
+    combined = combined.groupby(level=['time', 'ticker'], sort=False).first()
+
+  combined = combined.sort_index()
+  if not combined.columns.equals(columns):
+    combined = combined[columns]
+
+  return ensure_correct_dtypes(combined, copy=False, compact=compact)
 
-  return ensure_correct_dtypes(combined)
+def combine_prices(*frames, compact=False):
+  return combine_many(frames, compact)
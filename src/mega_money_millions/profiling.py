@@ -0,0 +1,178 @@
+import cProfile
+import pstats
+import time
+import tracemalloc
+from collections import defaultdict
+import numpy as np
+
+
+class Profiler:
+  """
+  Opt-in instrumentation for `run_backtest(..., profiler=Profiler())`.  Records the wall time of each phase of each
+  tick: `slicing` (getting `prices_for_date`), `strategy` (the whole `on_tick` call), `execution` (`Portfolio#buy`,
+  `sell`, `execute` and `rebalance`), `fees` (the exchange's fee and quantity calculations), `ledger` (appending
+  transactions) and `equity` (recording the equity curve).  Phases nest: `strategy` includes `execution`, which
+  includes `fees` and `ledger`.  Calls are counted per method.
+
+  `instrument(portfolio)` wraps those methods on the portfolio, its exchange and its ledger instances (so a portfolio
+  can also be profiled outside of `run_backtest`) until `restore()` puts the originals back; `run_backtest` restores
+  them at the end of each run, as an exchange can be shared between runs.  Nothing is wrapped or checked unless a
+  profiler is used, so there's no overhead otherwise.  With `allocations=True`, tracemalloc measures the memory
+  allocated on each tick (which slows the run down considerably), and with `cprofile=True` the run is also profiled
+  with cProfile (see `stats()` and `dump_stats()`).  A profiler accumulates over every run it's used for.
+  """
+  PHASES: tuple[str, ...] = ('slicing', 'strategy', 'execution', 'fees', 'ledger', 'equity')
+  EXECUTION_METHODS: tuple[str, ...] = ('buy', 'sell', 'execute', 'rebalance')
+  FEE_METHODS: tuple[str, ...] = ('max_quantity', 'fee_for_buy', 'fee_for_sell', 'max_quantity_units',
+                                  'fee_units_for_buy', 'fee_units_for_sell')
+  LEDGER_METHODS: tuple[str, ...] = ('append', 'extend')
+  # Histogram bins by decade, from 0.1 microseconds to 10 seconds
+  HISTOGRAM_EDGES_US: tuple[float, ...] = (0.1, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+  def __init__(self, allocations: bool = False, cprofile: bool = False):
+    self.allocations: bool = allocations
+    self.durations: dict[str, list[float]] = {phase: [] for phase in Profiler.PHASES}
+    self.calls: defaultdict[str, int] = defaultdict(int)
+    self.ticks: int = 0
+    self.elapsed: float = 0.0
+    # Net and peak bytes allocated per tick
+    self.allocated: list[int] = []
+    self.peak_allocated: list[int] = []
+    self.profile: cProfile.Profile | None = cProfile.Profile() if cprofile else None
+    self.__depths: dict[str, int] = {phase: 0 for phase in Profiler.PHASES}
+    self.__started_at: float = 0.0
+    self.__started_tracing: bool = False
+    self.__tick_memory: int = 0
+    # (instance, name, whether the instance had its own attribute, its value) for each method wrapped
+    self.__wrapped: list[tuple] = []
+
+  def instrument(self, portfolio):
+    for name in Profiler.EXECUTION_METHODS:
+      self.__wrap(portfolio, name, 'execution', name)
+    for name in Profiler.FEE_METHODS:
+      self.__wrap(portfolio.exchange, name, 'fees', name)
+    for name in Profiler.LEDGER_METHODS:
+      self.__wrap(portfolio.ledger, name, 'ledger', f"ledger.{name}")
+
+    return portfolio
+
+  # Undoes every instrument() call, latest first
+  def restore(self):
+    for instance, name, had_attribute, value in reversed(self.__wrapped):
+      if had_attribute:
+        setattr(instance, name, value)
+      else:
+        delattr(instance, name)
+
+    self.__wrapped = []
+
+  def __wrap(self, instance, name: str, phase: str, label: str):
+    self.__wrapped.append((instance, name, name in vars(instance), vars(instance).get(name)))
+    setattr(instance, name, self.timed(phase, label, getattr(instance, name)))
+
+  # Wraps function to count its calls and time it as phase.  Only the outermost call of a phase is timed (eg: execute
+  # called from rebalance), so time isn't counted twice.
+  def timed(self, phase: str, name: str, function):
+    durations, calls, depths = self.durations[phase], self.calls, self.__depths
+
+    def __timed(*args, **kwargs):
+      calls[name] += 1
+      if depths[phase] > 0:
+        return function(*args, **kwargs)
+
+      depths[phase] += 1
+      started_at = time.perf_counter()
+      try:
+        return function(*args, **kwargs)
+      finally:
+        durations.append(time.perf_counter() - started_at)
+        depths[phase] -= 1
+
+    return __timed
+
+  def start(self):
+    if self.allocations and not tracemalloc.is_tracing():
+      tracemalloc.start()
+      self.__started_tracing = True
+    if self.profile is not None:
+      self.profile.enable()
+
+    self.__started_at = time.perf_counter()
+
+  def stop(self):
+    self.elapsed += time.perf_counter() - self.__started_at
+
+    if self.profile is not None:
+      self.profile.disable()
+    if self.__started_tracing:
+      tracemalloc.stop()
+      self.__started_tracing = False
+
+  def tick_started(self):
+    if self.allocations:
+      tracemalloc.reset_peak()
+      self.__tick_memory = tracemalloc.get_traced_memory()[0]
+
+  # The times of a tick's phases, from time.perf_counter(): started, sliced, on_tick returned and equity recorded
+  def tick_finished(self, started_at: float, sliced_at: float, ticked_at: float, recorded_at: float | None = None):
+    self.ticks += 1
+    self.durations['slicing'].append(sliced_at - started_at)
+    self.durations['strategy'].append(ticked_at - sliced_at)
+    if recorded_at is not None:
+      self.durations['equity'].append(recorded_at - ticked_at)
+
+    if self.allocations:
+      current, peak = tracemalloc.get_traced_memory()
+      self.allocated.append(current - self.__tick_memory)
+      self.peak_allocated.append(peak - self.__tick_memory)
+
+  def report(self) -> dict:
+    report = {
+      'ticks': self.ticks,
+      'elapsed_s': self.elapsed,
+      'phases': {phase: Profiler.__phase_report(np.array(durations), self.elapsed)
+                 for phase, durations in self.durations.items() if len(durations) > 0},
+      'calls': dict(self.calls),
+    }
+
+    if self.allocations:
+      allocated, peak_allocated = np.array(self.allocated), np.array(self.peak_allocated)
+      report['allocations'] = {
+        'mean_bytes': float(allocated.mean()) if len(allocated) > 0 else 0.0,
+        'max_bytes': int(allocated.max()) if len(allocated) > 0 else 0,
+        'mean_peak_bytes': float(peak_allocated.mean()) if len(peak_allocated) > 0 else 0.0,
+        'max_peak_bytes': int(peak_allocated.max()) if len(peak_allocated) > 0 else 0,
+      }
+
+    return report
+
+  # eg: profiler.stats().print_stats(20)
+  def stats(self, sort: str = 'cumulative') -> pstats.Stats:
+    if self.profile is None:
+      raise ValueError("Profiler(cprofile=True) is needed for stats")
+
+    return pstats.Stats(self.profile).sort_stats(sort)
+
+  # Readable with pstats.Stats(path) or tools like snakeviz
+  def dump_stats(self, path: str):
+    if self.profile is None:
+      raise ValueError("Profiler(cprofile=True) is needed for dump_stats")
+
+    self.profile.dump_stats(path)
+
+  @staticmethod
+  def __phase_report(durations: np.ndarray, elapsed: float) -> dict:
+    durations_us = durations * 1_000_000
+    edges = np.array(Profiler.HISTOGRAM_EDGES_US)
+    counts, _ = np.histogram(np.clip(durations_us, edges[0], edges[-1]), bins=edges)
+
+    return {
+      'calls': len(durations),
+      'total_s': float(durations.sum()),
+      'share': float(durations.sum() / elapsed) if elapsed > 0 else 0.0,
+      'mean_us': float(durations_us.mean()),
+      'p50_us': float(np.percentile(durations_us, 50)),
+      'p99_us': float(np.percentile(durations_us, 99)),
+      'max_us': float(durations_us.max()),
+      'histogram': {'edges_us': list(Profiler.HISTOGRAM_EDGES_US), 'counts': counts.tolist()},
+    }
@@ -0,0 +1,199 @@
+import json
+import os
+import shutil
+import numpy as np
+import pandas as pd
+
+
+class PriceStore:
+  """
+  A local, columnar store of prices partitioned by ticker and month.  Each partition is a directory
+  (`root/<ticker>/<YYYY-MM>/`) holding one raw NumPy file per column plus the times, so `load` only opens the partitions
+  in the requested range and only the requested columns, and memory-maps them so only the rows in range are read.
+
+  `load` returns a multi-asset DataFrame (multi-indexed on `time` and `ticker`) in the dtypes it was written with, ready
+  for `combine_prices` or `run_backtest`.
+  """
+  TIME_FILE: str = 'time.npy'
+  META_FILE: str = 'meta.json'
+
+  def __init__(self, root: str):
+    self.root: str = root
+    os.makedirs(root, exist_ok=True)
+
+  def tickers(self) -> list[str]:
+    with os.scandir(self.root) as entries:
+      return sorted(entry.name for entry in entries if entry.is_dir())
+
+  def partitions(self, ticker: str) -> list[str]:
+    directory = os.path.join(self.root, ticker)
+    if not os.path.isdir(directory):
+      return []
+
+    with os.scandir(directory) as entries:
+      return sorted(entry.name for entry in entries if entry.is_dir() and '.' not in entry.name)
+
+  # Writes single-asset prices (with a 'ticker' column) or multi-asset prices.  Rows for times already in the store
+  # replace the stored ones.
+  def write(self, prices: pd.DataFrame):
+    if isinstance(prices.index, pd.MultiIndex) and 'ticker' in prices.index.names:
+      for ticker, ticker_prices in prices.groupby(level='ticker', sort=False):
+        self.__write_ticker(ticker, ticker_prices.droplevel('ticker'))
+    elif 'ticker' in prices:
+      for ticker, ticker_prices in prices.groupby('ticker', sort=False):
+        self.__write_ticker(ticker, ticker_prices.drop(columns='ticker'))
+    else:
+      raise ValueError("prices must either have a 'ticker' column or a MultiIndex of ('time', 'ticker')")
+
+  def load(self, tickers: list[str] = None, start_at=None, end_at=None, columns: list[str] = None) -> pd.DataFrame:
+    tickers = tickers or self.tickers()
+    if len(tickers) == 0:
+      raise ValueError(f"No prices stored in {self.root}")
+
+    start = PriceStore.__utc_nanoseconds(start_at) if start_at is not None else None
+    end = PriceStore.__utc_nanoseconds(end_at) if end_at is not None else None
+    frames = {}
+
+    for ticker in tickers:
+      partitions = self.partitions(ticker)
+      if len(partitions) == 0:
+        raise KeyError(f"No prices stored for {ticker}")
+
+      # When nothing is in range, the first partition is still read (to no rows) for its columns
+      in_range = self.__partitions_between(ticker, start, end) or partitions[:1]
+      frames[ticker] = pd.concat([PriceStore.__read_partition(os.path.join(self.root, ticker, partition), start, end,
+                                                              columns)
+                                  for partition in in_range])
+
+    return pd.concat(frames, names=['ticker', 'time']).swaplevel().sort_index()
+
+  # Yields the prices between start_at and end_at one month at a time, each chunk formatted like load's, eg: to feed
+  # run_streaming_backtest without the whole history in memory
+  def iter_chunks(self, tickers: list[str] = None, start_at=None, end_at=None, columns: list[str] = None):
+    tickers = tickers or self.tickers()
+    start = PriceStore.__utc_nanoseconds(start_at) if start_at is not None else None
+    end = PriceStore.__utc_nanoseconds(end_at) if end_at is not None else None
+    months = sorted(set(month for ticker in tickers for month in self.__partitions_between(ticker, start, end)))
+
+    for month in months:
+      paths = {ticker: os.path.join(self.root, ticker, month) for ticker in tickers}
+      frames = {ticker: PriceStore.__read_partition(path, start, end, columns)
+                for ticker, path in paths.items() if os.path.isdir(path)}
+
+      yield pd.concat(frames, names=['ticker', 'time']).swaplevel().sort_index()
+
+  def last_timestamp(self, ticker: str) -> pd.Timestamp | None:
+    partitions = self.partitions(ticker)
+    if len(partitions) == 0:
+      return None
+
+    path = os.path.join(self.root, ticker, partitions[-1])
+    times = np.load(os.path.join(path, PriceStore.TIME_FILE), mmap_mode='r')
+    return PriceStore.__index(times[-1:], PriceStore.__meta(path)['tz'])[0]
+
+  # Partitions are named by month, so comparing the names prunes everything outside of [start, end]
+  def __partitions_between(self, ticker: str, start: int | None, end: int | None) -> list[str]:
+    return [partition for partition in self.partitions(ticker)
+            if (start is None or partition >= PriceStore.__month(start))
+            and (end is None or partition <= PriceStore.__month(end))]
+
+  def __write_ticker(self, ticker: str, prices: pd.DataFrame):
+    if len(ticker) == 0 or os.sep in ticker or ticker.startswith('.'):
+      raise ValueError(f"Invalid ticker {ticker!r}")
+
+    prices = prices.sort_index()
+    months = PriceStore.__nanoseconds(prices.index).view('datetime64[ns]').astype('datetime64[M]')
+    _, starts = np.unique(months, return_index=True)
+
+    for start, end in zip(starts, list(starts[1:]) + [len(prices)]):
+      path = os.path.join(self.root, ticker, str(months[start]))
+      partition = prices.iloc[start:end]
+
+      if os.path.isdir(path):
+        partition = pd.concat([PriceStore.__read_partition(path), partition])
+        partition = partition.loc[~partition.index.duplicated(keep='last')].sort_index()
+
+      PriceStore.__write_partition(path, partition)
+
+  # Writes to a temporary directory and swaps it in, so readers never see a partially written partition
+  @staticmethod
+  def __write_partition(path: str, prices: pd.DataFrame):
+    temporary_path, old_path = path + '.tmp', path + '.old'
+    shutil.rmtree(temporary_path, ignore_errors=True)
+    os.makedirs(temporary_path)
+
+    np.save(os.path.join(temporary_path, PriceStore.TIME_FILE), PriceStore.__nanoseconds(prices.index))
+    meta = {'tz': str(prices.index.tz) if prices.index.tz is not None else None, 'columns': {}}
+
+    for column in prices.columns:
+      values = prices[column]
+      meta['columns'][column] = str(values.dtype)
+
+      if isinstance(values.dtype, pd.api.extensions.ExtensionDtype):
+        if not hasattr(values.dtype, 'numpy_dtype'):
+          raise ValueError(f"Cannot store column {column} with dtype {values.dtype}")
+
+        # Nullable dtypes (eg: 'boolean') are stored as their values plus a mask of the missing ones
+        np.save(os.path.join(temporary_path, f'{column}.mask.npy'), values.isna().to_numpy())
+        values = values.to_numpy(dtype=values.dtype.numpy_dtype, na_value=values.dtype.numpy_dtype.type(0))
+      elif values.dtype == 'object':
+        raise ValueError(f"Cannot store column {column} with dtype {values.dtype}")
+
+      np.save(os.path.join(temporary_path, f'{column}.npy'), np.asarray(values))
+
+    with open(os.path.join(temporary_path, PriceStore.META_FILE), 'w', encoding='utf-8') as file:
+      json.dump(meta, file)
+
+    if os.path.isdir(path):
+      os.replace(path, old_path)
+      os.replace(temporary_path, path)
+      shutil.rmtree(old_path)
+    else:
+      os.replace(temporary_path, path)
+
+  @staticmethod
+  def __read_partition(path: str, start: int = None, end: int = None, columns: list[str] = None) -> pd.DataFrame:
+    meta = PriceStore.__meta(path)
+    times = np.load(os.path.join(path, PriceStore.TIME_FILE), mmap_mode='r')
+    first = np.searchsorted(times, start, side='left') if start is not None else 0
+    last = np.searchsorted(times, end, side='right') if end is not None else len(times)
+
+    data = {}
+    for column in columns or meta['columns'].keys():
+      dtype = pd.api.types.pandas_dtype(meta['columns'][column])
+      values = np.array(np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')[first:last])
+
+      if isinstance(dtype, pd.api.extensions.ExtensionDtype):
+        values = pd.array(values, dtype=dtype)
+        values[np.load(os.path.join(path, f'{column}.mask.npy'), mmap_mode='r')[first:last]] = pd.NA
+
+      data[column] = values
+
+    return pd.DataFrame(data, index=PriceStore.__index(times[first:last], meta['tz']))
+
+  @staticmethod
+  def __utc_nanoseconds(timestamp) -> int:
+    timestamp = pd.Timestamp(timestamp)
+    if timestamp.tzinfo is not None:
+      timestamp = timestamp.tz_convert('UTC').tz_localize(None)
+    return timestamp.as_unit('ns').value
+
+  @staticmethod
+  def __month(nanoseconds: int) -> str:
+    return str(np.datetime64(nanoseconds, 'ns').astype('datetime64[M]'))
+
+  @staticmethod
+  def __meta(path: str) -> dict:
+    with open(os.path.join(path, PriceStore.META_FILE), encoding='utf-8') as file:
+      return json.load(file)
+
+  @staticmethod
+  def __nanoseconds(index: pd.DatetimeIndex) -> np.ndarray:
+    if index.tz is not None:
+      index = index.tz_convert('UTC').tz_localize(None)
+    return index.as_unit('ns').asi8
+
+  @staticmethod
+  def __index(nanoseconds: np.ndarray, tz: str | None) -> pd.DatetimeIndex:
+    index = pd.DatetimeIndex(np.array(nanoseconds).view('datetime64[ns]'), name='time')
+    return index.tz_localize('UTC').tz_convert(tz) if tz is not None else index
@@ -0,0 +1,146 @@
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from .backtester import run_backtest, TickIndex
+from .dateutils import now
+
+
+class SharedPrices:
+  """
+  Copies a multi-asset `prices` frame (multi-indexed on `time` and `ticker`) into one shared memory block so worker
+  processes can attach to it instead of each unpickling their own copy of the DataFrame.  Every column is stored as
+  float64 (booleans as 1.0/0.0, with missing values as NaN) in its original order.  float64 columns are attached without
+  copying; the others are cheap to rebuild with their original dtypes (eg: nullable `boolean`, with its missing values,
+  or float32 from compact mode), so workers see the same frame as the caller.
+  """
+
+  def __init__(self, prices: pd.DataFrame):
+    if not prices.index.is_monotonic_increasing:
+      prices = prices.sort_index()
+
+    time_codes, times = pd.factorize(prices.index.get_level_values('time'), sort=True)
+    ticker_codes, tickers = pd.factorize(prices.index.get_level_values('ticker'), sort=True)
+
+    rows = len(prices)
+    self.spec: dict = {
+      'rows': rows,
+      'columns': list(prices.columns),
+      # The columns that aren't float64, with their dtypes
+      'dtypes': {column: dtype for column, dtype in prices.dtypes.items() if dtype != np.dtype('float64')},
+      'times': times.asi8.copy(),
+      'tickers': list(tickers),
+    }
+
+    arrays = {
+      'time_codes': ('int64', (rows,)),
+      'ticker_codes': ('int64', (rows,)),
+      'values': ('float64', (rows, len(prices.columns))),
+    }
+    layout, size = {}, 0
+    for name, (dtype, shape) in arrays.items():
+      layout[name] = (dtype, shape, size)
+      size += max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+
+    self.shm: shared_memory.SharedMemory = shared_memory.SharedMemory(create=True, size=size)
+    self.spec['name'] = self.shm.name
+    self.spec['layout'] = layout
+
+    views = SharedPrices.views(self.shm, layout)
+    views['time_codes'][:] = time_codes
+    views['ticker_codes'][:] = ticker_codes
+    for i, column in enumerate(prices.columns):
+      views['values'][:, i] = prices[column].to_numpy(dtype='float64', na_value=np.nan)
+
+  @staticmethod
+  def views(shm: shared_memory.SharedMemory, layout: dict) -> dict[str, np.ndarray]:
+    return {name: np.ndarray(shape, dtype=dtype, buffer=shm.buf, offset=offset)
+            for name, (dtype, shape, offset) in layout.items()}
+
+  # Rebuilds the prices frame on top of the shared memory block described by spec.  The returned SharedMemory must
+  # stay open for as long as the frame is in use.
+  @staticmethod
+  def attach(spec: dict) -> tuple[shared_memory.SharedMemory, pd.DataFrame]:
+    shm = shared_memory.SharedMemory(name=spec['name'])
+    views = SharedPrices.views(shm, spec['layout'])
+    index = pd.MultiIndex(
+      levels=[pd.DatetimeIndex(spec['times'].view('datetime64[ns]'), name='time'), pd.Index(spec['tickers'])],
+      codes=[views['time_codes'], views['ticker_codes']],
+      names=['time', 'ticker'])
+
+    # Assigning to the existing columns keeps their positions, and the float64 columns stay views of the block
+    prices = pd.DataFrame(views['values'], index=index, columns=spec['columns'], copy=False)
+    for column, dtype in spec['dtypes'].items():
+      prices[column] = SharedPrices.__restore(views['values'][:, spec['columns'].index(column)], dtype)
+
+    return shm, prices
+
+  @staticmethod
+  def __restore(values: np.ndarray, dtype):
+    if pd.api.types.is_bool_dtype(dtype):
+      missing = np.isnan(values)
+      if isinstance(dtype, pd.BooleanDtype):
+        return pd.arrays.BooleanArray(values == 1.0, missing)
+      return values == 1.0
+
+    return values.astype(dtype)
+
+  def close(self):
+    self.shm.close()
+    self.shm.unlink()
+
+
+def parameter_combinations(parameter_grid: dict[str, list] | list[dict]) -> list[dict]:
+  if isinstance(parameter_grid, dict):
+    names = list(parameter_grid.keys())
+    return [dict(zip(names, values)) for values in itertools.product(*parameter_grid.values())]
+
+  return list(parameter_grid)
+
+
+def summarize(portfolio) -> dict:
+  return {**portfolio.report(), 'transactions': portfolio.transactions}
+
+
+__worker = {}
+
+
+def __attach_worker(spec: dict):
+  shm, prices = SharedPrices.attach(spec)
+  __worker['shm'] = shm
+  __worker['ticks'] = TickIndex(prices)
+
+
+def __run_one(strategy_factory, params: dict, backtest_args: tuple, backtest_kwargs: dict) -> dict:
+  on_tick = strategy_factory(**params)
+  portfolio = run_backtest(__worker['ticks'], *backtest_args, on_tick=on_tick, **backtest_kwargs)
+
+  return {'params': params, **summarize(portfolio)}
+
+
+# Runs one backtest per combination of parameters in parameter_grid (a dict of parameter name -> list of values, or
+# a list of parameter dicts) and fans them out over a pool of worker processes.  strategy_factory(**params) must
+# return an on_tick for run_backtest and, like everything else passed to the workers, must be picklable (eg: a
+# module-level function).  Returns one summary dict per combination, in order.
+def run_sweep(prices, parameter_grid, strategy_factory, initial_cash, start_at, end_at=now(), *, frequency=None,
+              exchange=None, processes=None) -> list[dict]:
+  combinations = parameter_combinations(parameter_grid)
+  backtest_args = (initial_cash, start_at, end_at)
+  backtest_kwargs = {'frequency': frequency, 'exchange': exchange}
+
+  if processes == 1:
+    ticks = TickIndex(prices)
+    return [{'params': params, **summarize(run_backtest(ticks, *backtest_args, on_tick=strategy_factory(**params),
+                                                        **backtest_kwargs))}
+            for params in combinations]
+
+  shared = SharedPrices(prices)
+  try:
+    with ProcessPoolExecutor(max_workers=processes, initializer=__attach_worker, initargs=(shared.spec,)) as pool:
+      futures = [pool.submit(__run_one, strategy_factory, params, backtest_args, backtest_kwargs)
+                 for params in combinations]
+      return [future.result() for future in futures]
+  finally:
+    shared.close()
@@ -49,3 +49,14 @@ BTC_SMA45_CROSSDOWNS = list(map(
      '2023-01-22',
      '2023-07-09',
      '2023-10-25')))
+
+
+# Moves all cash into BTC when the SMA45 crosses up over the SMA90 and sells it all when it crosses back down, for
+# prices with add_crossover(prices, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown') applied
+def sma_crossover(date, portfolio, prices_for_date):
+  btc = prices_for_date.loc['BTC']
+
+  if btc['SMACrossUp'] and portfolio.cash() > 0:
+    portfolio.buy('BTC', date, btc['close'], percentage_of_cash=100)
+  elif btc['SMACrossDown'] and portfolio.quantity_owned('BTC') > 0:
+    portfolio.sell('BTC', date, btc['close'], percentage_of_shares=100)
@@ -0,0 +1,85 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import pandas as pd
+
+
+class CandleServer(ThreadingHTTPServer):
+  """
+  A local stand-in for a Coinbase Exchange style candles endpoint, so ingestion can be tested offline.  It replays
+  `prices` (a dict of ticker to single-asset prices, like the pickles in tests/) over HTTP/1.1 with keep-alive, and
+  counts the requests and connections it sees.  `fail_next` makes the next requests answer 429 Too Many Requests.
+  """
+  daemon_threads = True
+
+  def __init__(self, prices: dict[str, pd.DataFrame], max_candles: int = 300):
+    super().__init__(('127.0.0.1', 0), CandleRequestHandler)
+    self.prices: dict[str, pd.DataFrame] = prices
+    self.max_candles: int = max_candles
+    self.requests: list[str] = []
+    self.connections: int = 0
+    self.fail_next: int = 0
+    self.lock: threading.Lock = threading.Lock()
+    self.thread: threading.Thread = threading.Thread(target=self.serve_forever, daemon=True)
+
+  @property
+  def url(self) -> str:
+    return f'http://127.0.0.1:{self.server_address[1]}'
+
+  def __enter__(self):
+    self.thread.start()
+    return self
+
+  def __exit__(self, *args):
+    self.shutdown()
+    self.server_close()
+
+  def candles(self, product: str, granularity: int, start_at, end_at) -> tuple[int, list]:
+    ticker = product.split('-')[0]
+    if ticker not in self.prices or granularity != 86400:
+      return 404, {'message': 'NotFound'}
+
+    prices = self.prices[ticker].loc[pd.Timestamp(start_at):pd.Timestamp(end_at)]
+    if len(prices) > self.max_candles:
+      return 400, {'message': 'granularity too small for the requested time range'}
+
+    # Newest first, as [time, low, high, open, close, volume]
+    return 200, [[int(time.timestamp()), row.low, row.high, row.open, row.close, row.volume]
+                 for time, row in prices.iloc[::-1].iterrows()]
+
+
+class CandleRequestHandler(BaseHTTPRequestHandler):
+  protocol_version = 'HTTP/1.1'
+
+  def setup(self):
+    super().setup()
+    with self.server.lock:
+      self.server.connections += 1
+
+  def do_GET(self): # pylint: disable=invalid-name
+    url = urlsplit(self.path)
+    query = {name: values[0] for name, values in parse_qs(url.query).items()}
+    parts = url.path.strip('/').split('/')
+
+    with self.server.lock:
+      self.server.requests.append(self.path)
+      failing = self.server.fail_next > 0
+      self.server.fail_next -= 1 if failing else 0
+
+    if failing:
+      status, body = 429, {'message': 'Slow down'}
+    elif len(parts) == 3 and parts[0] == 'products' and parts[2] == 'candles':
+      status, body = self.server.candles(parts[1], int(query['granularity']), query['start'], query['end'])
+    else:
+      status, body = 404, {'message': 'NotFound'}
+
+    encoded = json.dumps(body).encode()
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(encoded)))
+    self.end_headers()
+    self.wfile.write(encoded)
+
+  def log_message(self, format, *args): # pylint: disable=redefined-builtin
+    pass
@@ -1,9 +1,14 @@
+import tempfile
 import unittest
-from mega_money_millions.backtester import run_backtest
-from mega_money_millions.dateutils import days_ago, start_of_day_utc, parse_date
+import numpy as np
+from mega_money_millions.backtester import run_backtest, run_streaming_backtest, run_vectorized_backtest, \
+  signal_fills, TickContext, TickIndex
+from mega_money_millions.dateutils import days_ago, start_of_day_utc, parse_date, all_mondays_since
 from mega_money_millions.indicators.singleasset import add_crossover, add_sma
+from mega_money_millions.panel import PricePanel
 from mega_money_millions.priceutils import combine_prices
-from tests import load_btc_pickle, load_eth_pickle, BTC_SMA45_CROSSUPS, BTC_SMA45_CROSSDOWNS
+from mega_money_millions.store import PriceStore
+from tests import load_btc_pickle, load_eth_pickle, sma_crossover, BTC_SMA45_CROSSUPS, BTC_SMA45_CROSSDOWNS
 
 
 class TestBacktester(unittest.TestCase):
@@ -24,15 +29,7 @@ class TestBacktester(unittest.TestCase):
   def test_run_backtest(self):
     end_at = start_of_day_utc(parse_date('2024-01-06'))
 
-    def __on_tick(date, portfolio, prices_for_date):
-      btc = prices_for_date.loc['BTC']
-
-      if btc['SMACrossUp'] and portfolio.cash() > 0:
-        portfolio.buy('BTC', date, btc['close'], percentage_of_cash=100)
-      elif btc['SMACrossDown'] and portfolio.quantity_owned('BTC') > 0:
-        portfolio.sell('BTC', date, btc['close'], percentage_of_shares=100)
-
-    portfolio = run_backtest(self.prices, 10000, days_ago(365 * 5, end_at), end_at, on_tick=__on_tick)
+    portfolio = run_backtest(self.prices, 10000, days_ago(365 * 5, end_at), end_at, on_tick=sma_crossover)
 
     self.assertEqual(20803.7814, portfolio.cash())
 
@@ -44,3 +41,217 @@ class TestBacktester(unittest.TestCase):
 
     self.assertEqual(crossups, buy_dates)
     self.assertEqual(crossdowns, sell_dates)
+
+  def test_run_backtest_on_compact_prices(self):
+    end_at = start_of_day_utc(parse_date('2024-01-06'))
+    prices = combine_prices(load_btc_pickle(), load_eth_pickle(), compact=True)
+    add_sma(prices, 45)
+    add_sma(prices, 90)
+    add_crossover(prices, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+
+    # float32 closes are widened back to their decimal values when trading, so cash comes out exactly the same
+    portfolio = run_backtest(prices, 10000, days_ago(365 * 5, end_at), end_at, on_tick=sma_crossover)
+    self.assertEqual(20803.7814, portfolio.cash())
+
+  def test_run_backtest_fixed_point(self):
+    end_at = start_of_day_utc(parse_date('2024-01-06'))
+
+    floats = run_backtest(self.prices, 10000, days_ago(365 * 5, end_at), end_at, on_tick=sma_crossover)
+    portfolio = run_backtest(self.prices, 10000, days_ago(365 * 5, end_at), end_at, on_tick=sma_crossover,
+                             fixed_point=True)
+
+    self.assertEqual(20803.7814, portfolio.cash())
+    self.assertTrue(floats.transactions.drop(columns='cash_delta').equals(
+      portfolio.transactions.drop(columns='cash_delta')))
+
+  def test_run_backtest_with_context(self):
+    end_at = start_of_day_utc(parse_date('2024-01-06'))
+    start_at = days_ago(365 * 5, end_at)
+
+    def __on_tick(date, portfolio, ctx):
+      if ctx.SMACrossUp['BTC'] and portfolio.cash() > 0:
+        portfolio.buy('BTC', date, ctx.close['BTC'], percentage_of_cash=100)
+      elif ctx.field('SMACrossDown')['BTC'] and portfolio.quantity_owned('BTC') > 0:
+        portfolio.sell('BTC', date, ctx.close['BTC'], percentage_of_shares=100)
+
+    portfolio = run_backtest(self.prices, 10000, start_at, end_at, on_tick=__on_tick, context=True)
+
+    self.assertEqual(20803.7814, portfolio.cash())
+    self.assertEqual(BTC_SMA45_CROSSUPS[-1], portfolio.buys('BTC')['time'].iloc[-1])
+
+    with self.assertRaises(ValueError):
+      run_backtest(TickIndex(self.prices), 10000, start_at, end_at, on_tick=__on_tick, context=True)
+
+  def test_run_backtest_records_equity(self):
+    end_at = start_of_day_utc(parse_date('2024-01-06'))
+    start_at = days_ago(365 * 5, end_at)
+
+    def __on_tick(date, portfolio, prices_for_date):
+      for ticker in ['BTC', 'ETH']:
+        prices = prices_for_date.loc[ticker]
+
+        if prices['SMACrossUp'] and portfolio.cash() > 0:
+          portfolio.buy(ticker, date, prices['close'], percentage_of_cash=50)
+        elif prices['SMACrossDown'] and portfolio.quantity_owned(ticker) > 0:
+          portfolio.sell(ticker, date, prices['close'], percentage_of_shares=100)
+
+    self.assertIsNone(run_backtest(self.prices, 10000, start_at, end_at, on_tick=__on_tick).equity_curve)
+
+    portfolio = run_backtest(self.prices, 10000, start_at, end_at, on_tick=__on_tick, record_equity=True)
+    equity = portfolio.equity_curve
+    ticks = TickIndex(self.prices)
+
+    self.assertEqual(list(ticks.times[ticks.between(start_at, end_at)]), list(equity.index))
+
+    # Cash plus each holding at that day's close
+    date = parse_date('2021-04-01')
+    transactions = portfolio.transactions.loc[portfolio.transactions['time'] <= date]
+    held = transactions.groupby('ticker')['quantity'].sum()
+    self.assertAlmostEqual(transactions['cash'].iloc[-1] + sum(
+      quantity * self.prices.loc[(date, ticker), 'close'] for ticker, quantity in held.items()), equity[date], places=6)
+
+    peaks = equity.cummax()
+    self.assertEqual(round(((peaks - equity) / peaks).max() * 100, 4), portfolio.max_drawdown())
+    # Marked every tick, the drawdown is deeper than from trade to trade
+    self.assertGreater(portfolio.max_drawdown(), portfolio.metrics.max_drawdown())
+
+    decimated = run_backtest(self.prices, 10000, start_at, end_at, on_tick=__on_tick, record_equity=True,
+                             equity_every=7).equity_curve
+    self.assertTrue(decimated.iloc[:-1].equals(equity.iloc[::7]))
+    self.assertEqual(equity.index[-1], decimated.index[-1])
+
+    def __on_tick_with_context(date, portfolio, ctx):
+      __on_tick(date, portfolio, ctx.prices_for_date())
+
+    with_context = run_backtest(self.prices, 10000, start_at, end_at, on_tick=__on_tick_with_context, context=True,
+                                record_equity=True)
+    self.assertTrue(with_context.equity_curve.equals(equity))
+
+  def test_recorded_equity_skips_missing_closes(self):
+    end_at = start_of_day_utc(parse_date('2024-01-06'))
+    start_at = days_ago(365 * 5, end_at)
+    equity = run_backtest(self.prices, 10000, start_at, end_at, on_tick=sma_crossover, record_equity=True).equity_curve
+
+    # Only BTC is ever held, so an ETH close that's missing doesn't change the equity at all
+    prices = self.prices.copy()
+    prices.loc[(parse_date('2021-04-01'), 'ETH'), 'close'] = np.nan
+
+    for missing in (prices, PricePanel.from_long(prices)):
+      portfolio = run_backtest(missing, 10000, start_at, end_at, on_tick=sma_crossover, record_equity=True)
+
+      self.assertTrue(portfolio.equity_curve.equals(equity))
+      self.assertFalse(np.isnan(portfolio.max_drawdown()))
+      self.assertFalse(np.isnan(portfolio.report()['max_drawdown']))
+
+  def test_tick_context(self):
+    date = parse_date('2024-01-02')
+    panel = PricePanel.from_long(self.prices.drop(index=(date, 'ETH')))
+    ctx = TickContext(panel)
+    ctx.i = panel.times.get_loc(date)
+
+    self.assertEqual(date, ctx.time)
+    self.assertEqual(['BTC'], ctx.tickers)
+    self.assertEqual(self.prices.loc[(date, 'BTC'), 'SMA45'], ctx.SMA45['BTC'])
+    self.assertTrue(ctx.prices_for_date().equals(panel.prices_at(ctx.i)))
+
+    # A missing ticker reads as NaN, or False for booleans
+    self.assertFalse(ctx.present('ETH'))
+    self.assertTrue(np.isnan(ctx.close['ETH']))
+    self.assertIs(False, bool(ctx.SMACrossUp['ETH']))
+
+    with self.assertRaises(AttributeError):
+      ctx.SMA200 # pylint: disable=pointless-statement
+
+  def test_tick_index(self):
+    ticks = TickIndex(self.prices)
+
+    self.assertEqual(len(self.prices.index.get_level_values('time').unique()), len(ticks))
+
+    tick_range = ticks.between(parse_date('2024-01-01'), parse_date('2024-01-03'))
+    self.assertEqual(3, len(tick_range))
+
+    prices_at = ticks.prices_at(tick_range[0])
+    self.assertTrue(prices_at.equals(self.prices.loc[parse_date('2024-01-01')]))
+
+  def test_run_backtest_skips_times_missing_from_prices(self):
+    start_at, end_at = parse_date('2023-12-25'), parse_date('2024-01-02')
+    missing = parse_date('2023-12-28')
+    prices = self.prices.drop(index=missing, level='time')
+    dates = []
+
+    def __on_tick(date, _portfolio, prices_for_date):
+      dates.append(date)
+      self.assertEqual(['BTC', 'ETH'], prices_for_date.index.tolist())
+
+    run_backtest(prices, 10000, start_at, end_at, on_tick=__on_tick)
+
+    self.assertEqual(8, len(dates))
+    self.assertNotIn(missing, dates)
+    self.assertEqual([start_at, end_at], [dates[0], dates[-1]])
+
+  def test_run_backtest_with_frequency(self):
+    start_at, end_at = parse_date('2023-11-01'), parse_date('2024-01-06')
+    dates = []
+
+    run_backtest(self.prices, 10000, start_at, end_at, frequency='W-MON',
+                 on_tick=lambda date, _portfolio, _prices_for_date: dates.append(date))
+
+    self.assertEqual(list(all_mondays_since(start_at, end_at)), dates)
+
+  def test_run_streaming_backtest(self):
+    end_at = start_of_day_utc(parse_date('2024-01-06'))
+    start_at = days_ago(365 * 5, end_at)
+
+    def __prepare(prices):
+      add_sma(prices, 45)
+      add_sma(prices, 90)
+      add_crossover(prices, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+
+    with tempfile.TemporaryDirectory() as directory:
+      store = PriceStore(directory)
+      store.write(load_btc_pickle())
+      store.write(load_eth_pickle())
+
+      expected = run_backtest(self.prices, 10000, start_at, end_at, on_tick=sma_crossover)
+      portfolio = run_streaming_backtest(store.iter_chunks(), 10000, start_at, end_at, on_tick=sma_crossover,
+                                         lookback=90, prepare=__prepare)
+
+      self.assertEqual(20803.7814, portfolio.cash())
+      self.assertTrue(expected.transactions.equals(portfolio.transactions))
+
+      dates, streamed_dates = [], []
+      start_at = parse_date('2023-11-01')
+      run_backtest(self.prices, 10000, start_at, end_at, frequency='W-MON',
+                   on_tick=lambda date, _portfolio, _prices_for_date: dates.append(date))
+      run_streaming_backtest(store.iter_chunks(start_at=start_at), 10000, start_at, end_at, frequency='W-MON',
+                             on_tick=lambda date, _portfolio, _prices_for_date: streamed_dates.append(date))
+
+      self.assertEqual(dates, streamed_dates)
+
+  def test_run_vectorized_backtest(self):
+    end_at = start_of_day_utc(parse_date('2024-01-06'))
+    start_at = days_ago(365 * 5, end_at)
+
+    expected = run_backtest(self.prices, 10000, start_at, end_at, on_tick=sma_crossover)
+    portfolio = run_vectorized_backtest(self.prices, 'SMACrossUp', 'SMACrossDown', 10000, start_at, end_at,
+                                        ticker='BTC')
+
+    self.assertEqual(20803.7814, portfolio.cash())
+    self.assertTrue(expected.transactions.equals(portfolio.transactions))
+
+    single_asset = run_vectorized_backtest(self.btc_prices, self.btc_prices['SMACrossUp'],
+                                           self.btc_prices['SMACrossDown'], 10000, start_at, end_at)
+
+    self.assertTrue(expected.transactions.equals(single_asset.transactions))
+
+    with self.assertRaises(ValueError):
+      run_vectorized_backtest(self.prices, 'SMACrossUp', 'SMACrossDown', 10000, start_at, end_at)
+
+  def test_signal_fills(self):
+    entries = np.array([False, False, True, True, False, True, False, True, False])
+    exits = np.array([True, False, False, False, True, True, True, False, False])
+
+    buys, sells = signal_fills(entries, exits)
+
+    self.assertEqual([2, 7], buys.tolist())
+    self.assertEqual([4], sells.tolist())
@@ -0,0 +1,131 @@
+import functools
+import tempfile
+import unittest
+from unittest import mock
+from mega_money_millions.cache import BacktestCache, backtest_fingerprint, cached_run_backtest, prices_fingerprint
+from mega_money_millions.dateutils import parse_date
+from mega_money_millions.exchange import FreeExchange
+from mega_money_millions.indicators.singleasset import add_crossover, add_sma
+from mega_money_millions.priceutils import combine_prices
+from tests import load_btc_pickle, load_eth_pickle, sma_crossover
+
+
+def sma_crossover_half(date, portfolio, prices_for_date):
+  btc = prices_for_date.loc['BTC']
+
+  if btc['SMACrossUp'] and portfolio.cash() > 0:
+    portfolio.buy('BTC', date, btc['close'], percentage_of_cash=50)
+  elif btc['SMACrossDown'] and portfolio.quantity_owned('BTC') > 0:
+    portfolio.sell('BTC', date, btc['close'], percentage_of_shares=100)
+
+
+def percentage_to_buy():
+  return 100
+
+
+def sma_crossover_with_helper(date, portfolio, prices_for_date, percentage_of_shares=100):
+  btc = prices_for_date.loc['BTC']
+
+  if btc['SMACrossUp'] and portfolio.cash() > 0:
+    portfolio.buy('BTC', date, btc['close'], percentage_of_cash=percentage_to_buy())
+  elif btc['SMACrossDown'] and portfolio.quantity_owned('BTC') > 0:
+    portfolio.sell('BTC', date, btc['close'], percentage_of_shares=percentage_of_shares)
+
+
+class SmaCrossover:
+  def __init__(self, percentage_of_cash):
+    self.percentage_of_cash = percentage_of_cash
+
+  def __call__(self, date, portfolio, prices_for_date):
+    btc = prices_for_date.loc['BTC']
+
+    if btc['SMACrossUp'] and portfolio.cash() > 0:
+      portfolio.buy('BTC', date, btc['close'], percentage_of_cash=self.percentage_of_cash)
+
+
+class TestCache(unittest.TestCase):
+  def setUp(self):
+    btc_prices, eth_prices = load_btc_pickle(), load_eth_pickle()
+
+    for prices in (btc_prices, eth_prices):
+      add_sma(prices, 45)
+      add_sma(prices, 90)
+      add_crossover(prices, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+
+    self.prices = combine_prices(btc_prices, eth_prices)
+    self.start_at, self.end_at = parse_date('2019-01-06'), parse_date('2024-01-06')
+    self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+    self.cache = BacktestCache(self.directory.name)
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def run_cached(self, on_tick=sma_crossover, initial_cash=10000, **kwargs):
+    return cached_run_backtest(self.cache, self.prices, initial_cash, self.start_at, self.end_at, on_tick=on_tick,
+                               **kwargs)
+
+  def test_cache_hit(self):
+    portfolio = self.run_cached()
+
+    self.assertEqual(20803.7814, portfolio.cash())
+    self.assertEqual(1, len(self.cache.entries()))
+
+    with mock.patch('mega_money_millions.cache.run_backtest') as run_backtest:
+      cached = self.run_cached()
+      run_backtest.assert_not_called()
+
+    self.assertEqual(20803.7814, cached.cash())
+    self.assertTrue(portfolio.transactions.equals(cached.transactions))
+    self.assertEqual(portfolio.quantity_owned('BTC'), cached.quantity_owned('BTC'))
+
+  def test_cache_misses_when_inputs_change(self):
+    self.run_cached()
+    self.run_cached(initial_cash=20000)
+    self.run_cached(exchange=FreeExchange())
+    self.run_cached(on_tick=sma_crossover_half)
+    self.run_cached(params={'fast': 45})
+
+    self.assertEqual(5, len(self.cache.entries()))
+
+    prices_key = prices_fingerprint(self.prices, self.start_at, self.end_at)
+    self.run_cached(prices_key=prices_key)
+
+    self.assertEqual(5, len(self.cache.entries()))
+
+  def test_eviction(self):
+    self.run_cached()
+    entry_size = self.cache.size()
+
+    self.cache.max_bytes = entry_size * 2
+    self.run_cached(initial_cash=20000)
+    self.run_cached() # Makes the first entry the most recently used
+    self.run_cached(initial_cash=30000)
+
+    self.assertEqual(2, len(self.cache.entries()))
+
+    with mock.patch('mega_money_millions.cache.run_backtest') as run_backtest:
+      self.run_cached()
+      run_backtest.assert_not_called()
+
+  def test_fingerprint_covers_helpers_and_callables(self):
+    def __fingerprint(on_tick):
+      return backtest_fingerprint('prices', 10000, self.start_at, self.end_at, FreeExchange(), on_tick)
+
+    key = __fingerprint(sma_crossover_with_helper)
+
+    # Editing a module-level helper that on_tick calls changes the key
+    with mock.patch(f'{__name__}.percentage_to_buy', lambda: 50):
+      self.assertNotEqual(key, __fingerprint(sma_crossover_with_helper))
+    self.assertEqual(key, __fingerprint(sma_crossover_with_helper))
+
+    partial = functools.partial(sma_crossover_with_helper, percentage_of_shares=50)
+    self.assertNotEqual(key, __fingerprint(partial))
+    self.assertNotEqual(__fingerprint(partial),
+                        __fingerprint(functools.partial(sma_crossover_with_helper, percentage_of_shares=25)))
+
+    self.assertEqual(__fingerprint(SmaCrossover(50)), __fingerprint(SmaCrossover(50)))
+    self.assertNotEqual(__fingerprint(SmaCrossover(50)), __fingerprint(SmaCrossover(100)))
+    self.assertNotEqual(__fingerprint(SmaCrossover(50).__call__), __fingerprint(SmaCrossover(100).__call__))
+
+    with self.assertRaises(TypeError):
+      __fingerprint(print)
@@ -0,0 +1,27 @@
+import unittest
+import numpy as np
+from mega_money_millions.dateutils import tick_schedule, all_mondays_since, parse_date
+
+
+class TestDateutils(unittest.TestCase):
+  def test_tick_schedule_with_fixed_frequency(self):
+    start_at = parse_date('2024-01-03 05:30', '%Y-%m-%d %H:%M')
+    end_at = parse_date('2024-01-04')
+
+    self.assertEqual(
+      list(np.array(['2024-01-03T08:00', '2024-01-03T12:00', '2024-01-03T16:00', '2024-01-03T20:00',
+                     '2024-01-04T00:00'], dtype='datetime64[ns]')),
+      list(tick_schedule(start_at, end_at, '4h')))
+
+    self.assertEqual(24 * 60 + 1, len(tick_schedule(parse_date('2024-01-03'), end_at, '1min')))
+    self.assertEqual(0, len(tick_schedule(end_at, start_at, '1h')))
+
+    with self.assertRaises(ValueError):
+      tick_schedule(start_at, end_at, '0h')
+
+  def test_tick_schedule_with_weekly_frequency(self):
+    start_at, end_at = parse_date('2023-11-01'), parse_date('2024-01-20')
+
+    self.assertEqual(
+      [np.datetime64(date, 'ns') for date in all_mondays_since(start_at, end_at)],
+      list(tick_schedule(start_at, end_at, 'W-MON')))
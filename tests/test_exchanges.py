@@ -1,5 +1,8 @@
 import unittest
-from mega_money_millions.exchange import Coinbase
+import numpy as np
+from mega_money_millions.exchange import Coinbase, FreeExchange, TieredCoinbase
+from mega_money_millions.money import to_float, to_units, truncate_decimal
+from mega_money_millions.portfolio import Portfolio
 
 
 class TestCoinbase(unittest.TestCase):
@@ -15,3 +18,103 @@ class TestCoinbase(unittest.TestCase):
 
   def test_fee_for_sell(self):
     pass
+
+  def test_fees_for_arrays(self):
+    rng = np.random.default_rng(0)
+    prices = np.round(rng.uniform(0.01, 50000, 10000), 2)
+    quantities = np.round(rng.uniform(0, 10, 10000), 4)
+    cash = np.round(rng.uniform(0, 100000, 10000), 4)
+
+    # Exactly the scalar results for Python floats, element by element
+    for method, args in ((self.exchange.fee_for_buy, ('BTC', None, prices, quantities)),
+                         (self.exchange.fee_for_sell, ('BTC', None, prices, quantities)),
+                         (self.exchange.max_quantity, ('BTC', prices, cash))):
+      expected = [method(*(arg[i].item() if isinstance(arg, np.ndarray) else arg for arg in args))
+                  for i in range(10000)]
+      self.assertEqual(expected, method(*args).tolist())
+
+    # Ties after scaling, where rounding the scaled float would give 0.1504 and so on
+    prices, quantities = np.array([100.3, 100.5, 100.55, 100.65]), np.array([0.25, 0.25, 1.5, 0.5])
+    fees = [self.exchange.fee_for_buy('BTC', None, price, quantity)
+            for price, quantity in zip(prices.tolist(), quantities.tolist())]
+
+    self.assertEqual([0.1505, 0.1507, 0.9049, 0.3019], fees)
+    self.assertEqual(fees, self.exchange.fee_for_buy('BTC', None, prices, quantities).tolist())
+    self.assertEqual(to_units(fees).tolist(),
+                     self.exchange.fee_units_for_buy('BTC', None, prices, to_units(quantities)).tolist())
+
+  def test_units(self):
+    rng = np.random.default_rng(0)
+    prices = np.round(rng.uniform(0.01, 50000, 1000), 2)
+    quantities = to_units(np.round(rng.uniform(0, 10, 1000), 4))
+
+    for price, quantity in zip(prices, quantities.tolist()):
+      self.assertEqual(to_units(self.exchange.fee_for_buy('BTC', None, price, to_float(quantity))),
+                       self.exchange.fee_units_for_buy('BTC', None, price, quantity))
+      self.assertEqual(to_units(self.exchange.fee_for_sell('BTC', None, price, to_float(quantity))),
+                       self.exchange.fee_units_for_sell('BTC', None, price, quantity))
+      self.assertEqual(to_units(self.exchange.max_quantity('BTC', price, to_float(quantity) * 1000)),
+                       self.exchange.max_quantity_units('BTC', price, quantity * 1000))
+
+    self.assertEqual(9940, self.exchange.max_quantity_units('BTC', 10000, 100000000))
+    self.assertEqual(0, FreeExchange().fee_units_for_buy('BTC', None, 10000, 10000))
+    self.assertEqual(12345, FreeExchange().max_quantity_units('BTC', 3, 37036))
+
+
+class TestTieredCoinbase(unittest.TestCase):
+  def setUp(self):
+    self.exchange = TieredCoinbase()
+
+  def test_fee_rate(self):
+    self.assertEqual(0.0060, self.exchange.fee_rate('2023-01-01'))
+
+    self.exchange.record_trade('BTC', '2023-01-01', 20000, 0.4)
+    self.assertEqual(8000, self.exchange.volume())
+    self.assertEqual(0.0060, self.exchange.fee_rate('2023-01-01'))
+
+    self.exchange.record_trade('BTC', '2023-01-02', 20000, -0.1)
+    self.assertEqual(0.0040, self.exchange.fee_rate('2023-01-02'))
+    self.assertEqual(40.0, self.exchange.fee_for_buy('BTC', '2023-01-02', 10000, 1))
+    self.assertEqual(0.9960, self.exchange.max_quantity('BTC', 10000, 10000, '2023-01-02'))
+
+    self.exchange.record_trade('ETH', '2023-01-20', 1000, 95)
+    self.assertEqual(0.0020, self.exchange.fee_rate('2023-01-20'))
+
+    # The trades from 30 or more days ago no longer count
+    self.assertEqual(0.0020, self.exchange.fee_rate('2023-01-30'))
+    self.assertEqual(0.0025, self.exchange.fee_rate('2023-01-31'))
+    self.assertEqual(97000, self.exchange.volume())
+    self.assertEqual(0.0060, self.exchange.fee_rate('2023-02-19'))
+    self.assertEqual(0, self.exchange.volume())
+
+  def test_portfolio(self):
+    portfolio = Portfolio(self.exchange, 100000)
+    portfolio.buy('BTC', '2023-01-01', 20000, quantity=2)
+    portfolio.sell('BTC', '2023-01-02', 20000, quantity=2)
+
+    self.assertEqual([240.0, 160.0], portfolio.transactions['fee'].tolist())
+    # Each portfolio trades on its own account
+    self.assertEqual(0, self.exchange.volume())
+    self.assertEqual(80000, portfolio.exchange.volume())
+    self.assertEqual(80000, Portfolio.from_transactions(self.exchange, 100000,
+                                                        portfolio.transactions).exchange.volume())
+
+
+# An exchange written against the max_quantity without a date
+class UndatedExchange(Coinbase):
+  def max_quantity(self, ticker, price, cash):
+    return truncate_decimal(cash / (price * (1 + self.FEE)), 4)
+
+
+class TestUndatedExchange(unittest.TestCase):
+  def test_portfolio(self):
+    self.assertEqual(0.9940, UndatedExchange().max_quantity('BTC', 10000, 10000, '2023-01-01'))
+
+    for fixed_point in (False, True):
+      portfolio = Portfolio(UndatedExchange(), 10000, fixed_point=fixed_point)
+      portfolio.buy('BTC', '2023-01-01', 10000, percentage_of_cash=100)
+      self.assertEqual(0.9940, portfolio.quantity_owned('BTC'))
+
+      portfolio = Portfolio(UndatedExchange(), 10000, fixed_point=fixed_point)
+      portfolio.rebalance('2023-01-01', {'BTC': 1.0}, {'BTC': 10000})
+      self.assertEqual(0.9940, portfolio.quantity_owned('BTC'))
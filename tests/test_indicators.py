@@ -1,7 +1,11 @@
 import unittest
+import numpy as np
 import pandas as pd
 from mega_money_millions.indicators.singleasset import add_sma, add_roc, add_crossover
-from tests import BTC_PICKLE_PATH, BTC_SMA45_CROSSUPS, BTC_SMA45_CROSSDOWNS
+from mega_money_millions.indicators.multiasset import add_filter
+from mega_money_millions.indicators.streaming import StreamingSMA, StreamingROC, StreamingCrossover
+from mega_money_millions.priceutils import combine_prices
+from tests import BTC_PICKLE_PATH, ETH_PICKLE_PATH, BTC_SMA45_CROSSUPS, BTC_SMA45_CROSSDOWNS
 
 
 class TestIndicators(unittest.TestCase):
@@ -30,8 +34,33 @@ class TestIndicators(unittest.TestCase):
       ('2024-01-06', 6.391478125901625)):
       self.assertEqual(expected, self.btc_prices.loc[date]['ROC20'])
 
+  def test_multi_asset_indicators(self):
+    eth_prices = pd.read_pickle(ETH_PICKLE_PATH)
+    prices = combine_prices(self.btc_prices, eth_prices)
+
+    for single_asset_prices in (self.btc_prices, eth_prices, prices):
+      add_sma(single_asset_prices, 45)
+      add_sma(single_asset_prices, 90)
+      add_roc(single_asset_prices, 20)
+      add_crossover(single_asset_prices, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+
+    for ticker, single_asset_prices in (('BTC', self.btc_prices), ('ETH', eth_prices)):
+      ticker_prices = prices.xs(ticker, level='ticker')
+
+      for column in ('SMA45', 'SMA90', 'ROC20', 'SMACrossUp', 'SMACrossDown'):
+        self.assertTrue(np.array_equal(single_asset_prices[column].to_numpy(), ticker_prices[column].to_numpy(),
+                                       equal_nan=True), f'{ticker} {column}')
+
   def test_add_filter(self):
-    pass
+    prices = combine_prices(self.btc_prices, pd.read_pickle(ETH_PICKLE_PATH))
+    add_sma(prices, 45)
+    add_filter(prices, 'close', 'AboveSMA45', 'SMA45')
+
+    self.assertEqual('bool', prices['AboveSMA45'].dtype)
+    self.assertTrue((prices['AboveSMA45'] == (prices['close'] >= prices['SMA45'])).all())
+    # No SMA45 until there are 45 bars
+    self.assertFalse(prices['AboveSMA45'].xs('BTC', level='ticker').iloc[:44].any())
+    self.assertEqual([True, False], prices.loc[pd.Timestamp('2024-01-03'), 'AboveSMA45'].tolist())
 
   def test_add_ranking(self):
     pass
@@ -47,3 +76,54 @@ class TestIndicators(unittest.TestCase):
 
     self.assertEqual(BTC_SMA45_CROSSUPS, crossups)
     self.assertEqual(BTC_SMA45_CROSSDOWNS, crossdowns)
+
+  def test_streaming_sma_and_roc(self):
+    add_sma(self.btc_prices, 45)
+    add_roc(self.btc_prices, 20)
+
+    sma, roc = StreamingSMA(45), StreamingROC(20)
+    closes = self.btc_prices['close'].tolist()
+
+    self.assertEqual('SMA45', sma.name)
+    self.assertEqual('ROC20', roc.name)
+    self.assertTrue(np.array_equal(self.btc_prices['SMA45'].to_numpy(), [sma.update(close) for close in closes],
+                                   equal_nan=True))
+    self.assertTrue(np.array_equal(self.btc_prices['ROC20'].to_numpy(), [roc.update(close) for close in closes],
+                                   equal_nan=True))
+
+  def test_streaming_roc_with_zero_closes(self):
+    closes = [0.0, 5.0, 0.0, -2.0, -0.0, 0.0, np.nan, 0.0, 3.0, 0.0]
+    prices = add_roc(pd.DataFrame({'close': closes}), 1)
+
+    roc = StreamingROC(1)
+    self.assertTrue(np.array_equal(prices['ROC1'].to_numpy(), [roc.update(close) for close in closes], equal_nan=True))
+
+  def test_streaming_sma_with_missing_and_repeated_values(self):
+    closes = np.random.default_rng(0).normal(0, 1000, 500)
+    closes[::17] = np.nan
+    closes[100:150] = 3.3
+    prices = add_sma(pd.DataFrame({'close': closes}), 10)
+
+    sma = StreamingSMA(10)
+
+    self.assertTrue(np.array_equal(prices['SMA10'].to_numpy(), [sma.update(close) for close in closes],
+                                   equal_nan=True))
+
+  def test_streaming_crossover(self):
+    add_sma(self.btc_prices, 45)
+    add_sma(self.btc_prices, 90)
+    add_crossover(self.btc_prices, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+
+    sma45, sma90 = StreamingSMA(45), StreamingSMA(90)
+    crossover = StreamingCrossover('SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+    crossups, crossdowns = [], []
+
+    for date, close in self.btc_prices['close'].items():
+      crossup, crossdown = crossover.update(sma45.update(close), sma90.update(close))
+      if crossup:
+        crossups.append(date)
+      if crossdown:
+        crossdowns.append(date)
+
+    self.assertEqual(BTC_SMA45_CROSSUPS, crossups)
+    self.assertEqual(BTC_SMA45_CROSSDOWNS, crossdowns)
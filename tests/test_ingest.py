@@ -0,0 +1,93 @@
+import asyncio
+import tempfile
+import time
+import unittest
+from unittest import mock
+import pandas as pd
+from mega_money_millions.dateutils import parse_date
+from mega_money_millions.ingest import CandleFetcher, FetchError, TokenBucket, ingest
+from mega_money_millions.store import PriceStore
+from tests import load_btc_pickle, load_eth_pickle
+from tests.candle_server import CandleServer
+
+
+class TestIngest(unittest.TestCase):
+  def setUp(self):
+    self.btc_prices, self.eth_prices = load_btc_pickle(), load_eth_pickle()
+    self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+    self.store = PriceStore(self.directory.name)
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_ingest(self):
+    start_at, end_at = parse_date('2022-01-01'), parse_date('2023-12-31')
+
+    with CandleServer({'BTC': self.btc_prices, 'ETH': self.eth_prices}) as server:
+      counts = ingest(self.store, ['BTC', 'ETH'], start_at, end_at, base_url=server.url, concurrency=2,
+                      requests_per_second=1000)
+
+      self.assertEqual({'BTC': 730, 'ETH': 730}, counts)
+      # 730 days is 3 pages of 300 candles per ticker, all over the same two kept-alive connections
+      self.assertEqual(6, len(server.requests))
+      self.assertLessEqual(server.connections, 2)
+
+      prices = self.store.load(['BTC'])
+      self.assertTrue(prices.droplevel('ticker').equals(self.btc_prices.loc[start_at:end_at].drop(columns='ticker')))
+
+      # Only the bars after the last stored one are fetched
+      counts = ingest(self.store, ['BTC', 'ETH'], start_at, parse_date('2024-01-10'), base_url=server.url,
+                      requests_per_second=1000)
+
+      self.assertEqual({'BTC': 10, 'ETH': 10}, counts)
+      self.assertIn('start=2024-01-01T00%3A00%3A00', server.requests[-1])
+      self.assertEqual(parse_date('2024-01-10'), self.store.last_timestamp('ETH'))
+
+  def test_ingest_refetches_incomplete_bar(self):
+    date = parse_date('2024-01-05')
+    # Half way through the day, the candle so far
+    forming = self.btc_prices.loc[:date].copy()
+    forming.loc[date, ['close', 'high', 'volume']] = [43500.0, 44000.0, 1234.5]
+
+    with CandleServer({'BTC': forming}) as server:
+      with mock.patch.object(CandleFetcher, '_CandleFetcher__utc_now', return_value=date + pd.Timedelta(hours=12)):
+        ingest(self.store, ['BTC'], parse_date('2024-01-01'), base_url=server.url, requests_per_second=1000)
+
+      stored = self.store.load(['BTC']).droplevel('ticker')
+      self.assertEqual((43500.0, False), (stored.loc[date, 'close'], stored.loc[date, 'complete']))
+
+      # By the next run the candle has finished and more have come in
+      server.prices['BTC'] = self.btc_prices.loc[:parse_date('2024-01-07')]
+      with mock.patch.object(CandleFetcher, '_CandleFetcher__utc_now', return_value=parse_date('2024-01-08')):
+        counts = ingest(self.store, ['BTC'], parse_date('2024-01-01'), base_url=server.url, requests_per_second=1000)
+
+      self.assertEqual({'BTC': 3}, counts)
+      self.assertIn('start=2024-01-05T00%3A00%3A00', server.requests[-1])
+
+      stored = self.store.load(['BTC']).droplevel('ticker')
+      expected = self.btc_prices.loc[parse_date('2024-01-01'):parse_date('2024-01-07')].drop(columns='ticker')
+      self.assertTrue(stored.equals(expected))
+
+  def test_ingest_retries_and_errors(self):
+    with CandleServer({'BTC': self.btc_prices}) as server:
+      server.fail_next = 2
+      counts = ingest(self.store, ['BTC'], parse_date('2023-12-01'), parse_date('2023-12-31'), base_url=server.url,
+                      requests_per_second=1000)
+
+      self.assertEqual({'BTC': 31}, counts)
+      self.assertEqual(3, len(server.requests))
+
+      with self.assertRaises(FetchError):
+        ingest(self.store, ['XRP'], parse_date('2023-12-01'), parse_date('2023-12-31'), base_url=server.url)
+
+  def test_token_bucket(self):
+    async def __acquire_all():
+      bucket = TokenBucket(rate=50, burst=2)
+      for _ in range(7):
+        await bucket.acquire()
+
+    started_at = time.monotonic()
+    asyncio.run(__acquire_all())
+
+    # The first two are the burst, the other five wait for a token each
+    self.assertGreaterEqual(time.monotonic() - started_at, 5 / 50)
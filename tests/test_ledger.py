@@ -0,0 +1,48 @@
+import unittest
+from mega_money_millions.ledger import Ledger
+
+
+class TestLedger(unittest.TestCase):
+  def setUp(self):
+    self.ledger = Ledger({'ticker': 'object', 'quantity': 'float64', 'streak': 'int64'}, capacity=2)
+
+  def test_append_grows_capacity(self):
+    for i in range(5):
+      self.ledger.append('BTC', i * 0.5, i)
+
+    self.assertEqual(5, len(self.ledger))
+    self.assertEqual(8, self.ledger.capacity)
+    self.assertEqual([0.0, 0.5, 1.0, 1.5, 2.0], self.ledger.column('quantity').tolist())
+    self.assertEqual(4, self.ledger.last('streak'))
+
+    with self.assertRaises(ValueError):
+      self.ledger.append('BTC', 1.0)
+
+  def test_to_frame(self):
+    self.ledger.append('BTC', 0.125, 0)
+    self.ledger.append('ETH', -0.5, 1)
+
+    frame = self.ledger.to_frame()
+
+    self.assertEqual(['ticker', 'quantity', 'streak'], frame.columns.tolist())
+    self.assertEqual(['object', 'float64', 'int64'], [str(dtype) for dtype in frame.dtypes])
+    self.assertEqual([['BTC', 0.125, 0], ['ETH', -0.5, 1]], frame.values.tolist())
+
+    # The frame is a snapshot; later appends don't leak into it
+    self.ledger.clear()
+    self.ledger.append('XRP', 1.0, 0)
+
+    self.assertEqual(['BTC', 'ETH'], frame['ticker'].tolist())
+    self.assertEqual(1, len(self.ledger))
+
+  def test_extend(self):
+    self.ledger.append('BTC', 0.125, 0)
+    self.ledger.extend({'ticker': ['ETH', 'XRP', 'BTC'], 'quantity': [1.0, 2.0, 3.0], 'streak': [1, 2, 3]})
+
+    self.assertEqual(4, len(self.ledger))
+    self.assertEqual(4, self.ledger.capacity)
+    self.assertEqual(['BTC', 'ETH', 'XRP', 'BTC'], self.ledger.column('ticker').tolist())
+    self.assertEqual([0, 1, 2, 3], self.ledger.column('streak').tolist())
+
+    with self.assertRaises(ValueError):
+      self.ledger.extend({'ticker': ['ETH']})
@@ -0,0 +1,60 @@
+import unittest
+import numpy as np
+from mega_money_millions.metrics import RunningMetrics
+
+
+class TestRunningMetrics(unittest.TestCase):
+  def test_empty(self):
+    metrics = RunningMetrics(10000)
+
+    self.assertEqual((0, 0, 0), (metrics.sells(), metrics.win_streak, metrics.loss_streak))
+    self.assertTrue(np.isnan(metrics.avg_win()))
+    self.assertTrue(np.isnan(metrics.max_loss_streak))
+    self.assertEqual(0.0, metrics.max_drawdown())
+
+  def test_record(self):
+    metrics = RunningMetrics(1000)
+
+    metrics.record('BTC', 100, 5, 0, 0, 500, sell=False)
+    metrics.record('BTC', 120, 0, 100, 1, 1100, sell=True)
+    metrics.record('ETH', 10, 50, 0, 0, 600, sell=False)
+    metrics.record('ETH', 8, 25, -50, 1, 800, sell=True)
+    metrics.record('ETH', 6, 0, -100, 2, 950, sell=True)
+
+    self.assertEqual((1, 2), (metrics.wins, metrics.losses))
+    self.assertEqual((0, 2), (metrics.win_streak, metrics.loss_streak))
+    self.assertEqual((1, 2), (metrics.max_win_streak, metrics.max_loss_streak))
+    self.assertEqual(1.5, metrics.avg_loss_streak())
+    self.assertEqual((100, -75), (metrics.avg_win(), metrics.avg_loss()))
+    self.assertAlmostEqual(-50 / 3, metrics.avg_return())
+    # Equity peaks at 1100 after the BTC sell and falls to 950
+    self.assertEqual(950, metrics.equity)
+    self.assertEqual(13.6364, metrics.max_drawdown())
+
+    metrics.reset()
+    self.assertEqual((0, 1000, 0.0), (metrics.sells(), metrics.peak_equity, metrics.max_drawdown()))
+
+  def test_holdings(self):
+    metrics = RunningMetrics(1000)
+    rng = np.random.default_rng(0)
+
+    for _ in range(1000):
+      ticker = rng.choice(['BTC', 'ETH', 'SOL'])
+      metrics.record(ticker, rng.uniform(1, 100), rng.integers(1, 10), 0, 0, 500, sell=False)
+      self.assertAlmostEqual(500 + sum(metrics.values.values()), metrics.equity, places=9)
+
+    # Back to exactly cash once nothing is held
+    for ticker in ['BTC', 'ETH', 'SOL']:
+      metrics.record(ticker, 0.1, 0, 0, 0, 1000.1, sell=True)
+    self.assertEqual(({}, 0.0, 1000.1), (metrics.values, metrics.holdings, metrics.equity))
+
+  def test_fixed_point(self):
+    metrics = RunningMetrics(1000, fixed_point=True)
+
+    for _ in range(3):
+      metrics.record('BTC', 100, 0, 1, 1, 10_000_000, sell=True)
+
+    # Gains are summed as units: 0.0001 three times
+    self.assertEqual(3, metrics.win_gains)
+    self.assertEqual(0.0001, metrics.avg_win())
+    self.assertEqual(1000, metrics.equity)
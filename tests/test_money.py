@@ -0,0 +1,62 @@
+import unittest
+import numpy as np
+from mega_money_millions.money import round_decimal, round_units, to_float, to_units, truncate_decimal, \
+  truncate_units, whole_units
+
+
+class TestDecimals(unittest.TestCase):
+  def test_round_decimal(self):
+    rng = np.random.default_rng(0)
+    # Values halfway between two 4 decimal values are where rounding methods differ
+    values = np.concatenate([rng.uniform(-10000, 10000, 100000),
+                             np.round(rng.uniform(-10000, 10000, 100000), 4) + 0.00005])
+
+    # Arrays round like their elements as Python floats
+    self.assertEqual([round_decimal(value, 4) for value in values.tolist()], round_decimal(values, 4).tolist())
+    self.assertEqual(4233.2645, round_decimal(np.array([4233.26455]), 4)[0])
+    self.assertEqual(4233.2646, round_decimal(np.float64(4233.26455), 4))
+    self.assertEqual(4233.2645, round_decimal(4233.26455, 4))
+
+  def test_truncate_decimal(self):
+    values = np.random.default_rng(0).uniform(-10000, 10000, 100000)
+
+    self.assertEqual([truncate_decimal(value, 4) for value in values.tolist()], truncate_decimal(values, 4).tolist())
+    self.assertEqual([1.2345, -1.2345], truncate_decimal(np.array([1.23459, -1.23459]), 4).tolist())
+
+  def test_units(self):
+    self.assertEqual(3000, to_units(0.3))
+    self.assertEqual(-12345, to_units(-1.2345))
+    self.assertEqual(0.3, to_float(3000))
+    self.assertEqual([3000, -12345], to_units(np.array([0.3, -1.2345])).tolist())
+    self.assertEqual([0.3, -1.2345], to_float(np.array([3000, -12345])).tolist())
+
+  def test_round_units(self):
+    rng = np.random.default_rng(0)
+    values = np.concatenate([rng.uniform(-10000, 10000, 100000),
+                             np.round(rng.uniform(-10000, 10000, 100000), 4) + 0.00005])
+
+    # The units of exactly what round_decimal returns, for NumPy and Python floats alike
+    self.assertEqual([to_units(round_decimal(value, 4)) for value in values], [round_units(value) for value in values])
+    self.assertEqual([to_units(round_decimal(value, 4)) for value in values.tolist()],
+                     [round_units(value) for value in values.tolist()])
+    self.assertEqual(to_units(round_decimal(values, 4)).tolist(), round_units(values).tolist())
+    self.assertEqual([round_units(value) for value in values.tolist()], round_units(values).tolist())
+    self.assertEqual(42332645, round_units(4233.26455))
+    self.assertEqual(42332646, round_units(np.float64(4233.26455)))
+
+  def test_truncate_units(self):
+    values = np.random.default_rng(0).uniform(-10000, 10000, 100000)
+
+    self.assertEqual([to_units(truncate_decimal(value, 4)) for value in values.tolist()],
+                     [truncate_units(value) for value in values.tolist()])
+    self.assertEqual(to_units(truncate_decimal(values, 4)).tolist(), truncate_units(values).tolist())
+
+  def test_whole_units(self):
+    exact = np.round(np.random.default_rng(0).uniform(-10000, 10000, 100000), 4)
+
+    # Multiples of 0.0001 keep their value, where truncating the scaled float sometimes loses a unit
+    self.assertEqual(to_units(exact).tolist(), [whole_units(value) for value in exact.tolist()])
+    self.assertEqual(to_units(exact).tolist(), whole_units(exact).tolist())
+    self.assertEqual((5699, 5700), (truncate_units(0.57), whole_units(0.57)))
+    self.assertEqual([1, 1, -1], [whole_units(0.00015), whole_units(0.00019), whole_units(-0.00019)])
+    self.assertEqual([1, 1, -1], whole_units(np.array([0.00015, 0.00019, -0.00019])).tolist())
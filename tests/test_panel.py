@@ -0,0 +1,77 @@
+import unittest
+import numpy as np
+from mega_money_millions.backtester import run_backtest
+from mega_money_millions.dateutils import days_ago, start_of_day_utc, parse_date
+from mega_money_millions.indicators.multiasset import add_filter, add_ranking
+from mega_money_millions.indicators.singleasset import add_crossover, add_roc, add_sma
+from mega_money_millions.panel import PricePanel
+from mega_money_millions.priceutils import combine_prices
+from tests import load_btc_pickle, load_eth_pickle, sma_crossover
+
+
+class TestPricePanel(unittest.TestCase):
+  def setUp(self):
+    self.prices = combine_prices(load_btc_pickle(), load_eth_pickle())
+    self.panel = PricePanel.from_long(self.prices)
+
+  def test_round_trip(self):
+    self.assertEqual((len(self.prices.index.get_level_values('time').unique()), 2, len(self.prices.columns)),
+                     self.panel.values.shape)
+    self.assertEqual(['BTC', 'ETH'], self.panel.tickers)
+    self.assertTrue(self.panel.to_long().equals(self.prices))
+
+    # A ticker missing at a time is marked absent and left out again on the way back
+    prices = self.prices.drop(index=(parse_date('2024-01-02'), 'ETH'))
+    panel = PricePanel.from_long(prices)
+    i = panel.times.get_loc(parse_date('2024-01-02'))
+
+    self.assertFalse(panel.present[i, panel.ticker_positions['ETH']])
+    self.assertTrue(np.isnan(panel.ticker('ETH')[i]).all())
+    self.assertEqual(['BTC'], panel.prices_at(i).index.tolist())
+    self.assertTrue(panel.to_long().equals(prices))
+
+  def test_views(self):
+    close = self.panel.field('close')
+
+    self.assertTrue(np.shares_memory(close, self.panel.values))
+    self.assertTrue(np.shares_memory(self.panel.ticker('BTC'), self.panel.values))
+    self.assertTrue(np.shares_memory(self.panel.at(0), self.panel.values))
+
+    btc = self.prices.xs('BTC', level='ticker')['close']
+    self.assertEqual(btc.tolist(), close[-len(btc):, self.panel.ticker_positions['BTC']].tolist())
+
+  def test_indicators_match_long_form(self):
+    for prices in (self.prices, self.panel):
+      add_sma(prices, 45)
+      add_sma(prices, 90)
+      add_roc(prices, 20)
+      add_crossover(prices, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+      add_ranking(prices, 'ROC20', 'ROCRank', threshold=1)
+      add_filter(prices, 'close', 'AboveSMA45')
+
+    self.assertEqual(self.prices.columns.tolist(), self.panel.fields)
+    self.assertTrue(self.panel.to_long().equals(self.prices))
+
+  def test_indicators_skip_missing_bars(self):
+    # Missing bars are skipped, as the long form has no rows for them, rather than leaving NaN windows behind
+    dates = [parse_date('2023-06-01'), parse_date('2023-06-02'), parse_date('2023-09-15')]
+    prices = self.prices.drop(index=[(date, 'ETH') for date in dates])
+    panel = PricePanel.from_long(prices)
+
+    for indicators in (prices, panel):
+      add_sma(indicators, 45)
+      add_roc(indicators, 20)
+      add_crossover(indicators, 'close', 'SMA45', 'SMACrossUp', 'SMACrossDown')
+
+    self.assertTrue(panel.to_long().equals(prices))
+    self.assertFalse(np.isnan(panel.ticker('ETH')[-1]).any())
+
+  def test_run_backtest(self):
+    add_sma(self.panel, 45)
+    add_sma(self.panel, 90)
+    add_crossover(self.panel, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+    end_at = start_of_day_utc(parse_date('2024-01-06'))
+
+    portfolio = run_backtest(self.panel, 10000, days_ago(365 * 5, end_at), end_at, on_tick=sma_crossover)
+
+    self.assertEqual(20803.7814, portfolio.cash())
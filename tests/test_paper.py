@@ -0,0 +1,73 @@
+import asyncio
+import tempfile
+import unittest
+from mega_money_millions.backtester import run_backtest
+from mega_money_millions.dateutils import days_ago, start_of_day_utc, parse_date
+from mega_money_millions.indicators.singleasset import add_crossover, add_sma
+from mega_money_millions.indicators.streaming import StreamingCrossover, StreamingSMA
+from mega_money_millions.paper import PaperTrader, QueueSource, ReplaySource, run_paper_trading
+from mega_money_millions.priceutils import combine_prices
+from mega_money_millions.store import PriceStore
+from tests import load_btc_pickle, load_eth_pickle, sma_crossover
+
+
+def sma_crossover_indicators():
+  return [StreamingSMA(45), StreamingSMA(90), StreamingCrossover('SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')]
+
+
+class TestPaperTrading(unittest.TestCase):
+  def setUp(self):
+    self.prices = combine_prices(load_btc_pickle(), load_eth_pickle())
+    self.end_at = start_of_day_utc(parse_date('2024-01-06'))
+    self.start_at = days_ago(365 * 5, self.end_at)
+
+  def test_replay_matches_backtest(self):
+    backtest_prices = self.prices.copy()
+    add_sma(backtest_prices, 45)
+    add_sma(backtest_prices, 90)
+    add_crossover(backtest_prices, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+    expected = run_backtest(backtest_prices, 10000, self.start_at, self.end_at, on_tick=sma_crossover)
+
+    # Bars before start_at warm up the indicators without calling on_tick
+    trader = run_paper_trading(ReplaySource(self.prices), 10000, on_tick=sma_crossover,
+                               indicators=sma_crossover_indicators, start_at=self.start_at, end_at=self.end_at)
+
+    self.assertEqual(20803.7814, trader.portfolio.cash())
+    self.assertTrue(expected.transactions.equals(trader.portfolio.transactions))
+
+    report = trader.latency_report()
+    self.assertEqual(len(backtest_prices.loc[self.start_at:self.end_at]) // 2, report['bars'])
+    self.assertLessEqual(report['p50_ms'], report['max_ms'])
+
+  def test_replay_from_store(self):
+    dates = []
+
+    with tempfile.TemporaryDirectory() as directory:
+      store = PriceStore(directory)
+      store.write(self.prices)
+
+      source = ReplaySource.from_store(store, ['BTC'], parse_date('2023-12-25'), parse_date('2024-01-02'))
+      run_paper_trading(source, 10000, on_tick=lambda date, _portfolio, prices_for_date: dates.append(
+        (date, prices_for_date.index.tolist())))
+
+    self.assertEqual(9, len(dates))
+    self.assertEqual((parse_date('2023-12-25'), ['BTC']), dates[0])
+
+  def test_queue_source(self):
+    trader = PaperTrader(sma_crossover, 10000, indicators=sma_crossover_indicators)
+    source = QueueSource()
+    bars = [(date, self.prices.loc[date]) for date in self.prices.index.get_level_values('time').unique()[:100]]
+
+    async def __feed():
+      for date, prices_for_date in bars:
+        await source.put(date, prices_for_date)
+      await source.close()
+
+    async def __run():
+      _, portfolio = await asyncio.gather(__feed(), trader.run(source))
+      return portfolio
+
+    asyncio.run(__run())
+
+    self.assertEqual(100, len(trader.latencies))
+    self.assertEqual(['BTC', 'ETH'], sorted(trader.indicators.keys()))
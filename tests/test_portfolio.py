@@ -1,7 +1,9 @@
 import unittest
 import numpy as np
+import pandas as pd
 from mega_money_millions.portfolio import Portfolio, InsufficientFunds, InsufficientShares
 from mega_money_millions.exchange import FreeExchange, Coinbase
+from mega_money_millions.positions import LotRelief
 
 
 class TestPortfolio(unittest.TestCase):
@@ -239,3 +241,224 @@ class TestPortfolio(unittest.TestCase):
     self.assertEqual([
       (3, ['2023-12-26', 'BTC', 35000, -0.125, 4375.0, 26.25, 4348.75, -655.0, 1, 49880])],
       list(zip(losses.index, losses.values.tolist())))
+
+  def test_transactions_are_cached_until_the_next_trade(self):
+    self.portfolio.buy('BTC', '2023-12-23', 40000, 0.125)
+
+    transactions = self.portfolio.transactions
+    self.assertIs(transactions, self.portfolio.transactions)
+
+    self.portfolio.sell('BTC', '2023-12-24', 40000, 0.125)
+
+    self.assertEqual(1, len(transactions))
+    self.assertEqual(2, len(self.portfolio.transactions))
+
+  def test_avg_purchase_price_with_lifo_lot_relief(self):
+    portfolio = Portfolio(FreeExchange(), 10000, lot_relief=LotRelief.LIFO)
+    portfolio.buy('BTC', '2023-12-23', 30000, 0.125)
+    portfolio.buy('BTC', '2023-12-24', 35000, 0.125)
+    portfolio.sell('BTC', '2023-12-25', 40000, 0.125)
+
+    self.assertEqual(0.125, portfolio.quantity_owned('BTC'))
+    self.assertEqual(30000, portfolio.avg_purchase_price('BTC'))
+
+  def test_from_transactions(self):
+    self.coinbase_portfolio.buy('BTC', '2023-12-23', 35000, 0.1125)
+    self.coinbase_portfolio.buy('BTC', '2023-12-24', 40000, 0.1125)
+    self.coinbase_portfolio.sell('BTC', '2023-12-25', 41000, 0.1125)
+
+    portfolio = Portfolio.from_transactions(Coinbase(), 10000, self.coinbase_portfolio.transactions)
+
+    self.assertTrue(self.coinbase_portfolio.transactions.equals(portfolio.transactions))
+    self.assertEqual(self.coinbase_portfolio.cash(), portfolio.cash())
+    self.assertEqual(0.1125, portfolio.quantity_owned('BTC'))
+    self.assertEqual(40027, portfolio.avg_purchase_price('BTC', include_fees=True))
+
+    portfolio.sell('BTC', '2023-12-27', 42000, 0.1125)
+    self.coinbase_portfolio.sell('BTC', '2023-12-27', 42000, 0.1125)
+
+    self.assertEqual(self.coinbase_portfolio.transactions.values.tolist(), portfolio.transactions.values.tolist())
+
+  def test_execute(self):
+    self.coinbase_portfolio.buy('BTC', '2023-12-23', 40000, 0.125)
+    expected = Portfolio.from_transactions(Coinbase(), 10000, self.coinbase_portfolio.transactions)
+
+    expected.sell('BTC', '2023-12-24', 41000, 0.125)
+    expected.buy('ETH', '2023-12-24', 2000, 2)
+    expected.buy('SOL', '2023-12-24', 100, 10)
+
+    # Sells go first, so the BTC proceeds pay for the ETH and SOL
+    self.coinbase_portfolio.execute('2023-12-24', {'ETH': 2, 'BTC': -0.125, 'SOL': 10},
+                                    {'BTC': 41000, 'ETH': 2000, 'SOL': 100})
+
+    self.assertTrue(expected.transactions.equals(self.coinbase_portfolio.transactions))
+    self.assertEqual(2, self.coinbase_portfolio.quantity_owned('ETH'))
+    self.assertEqual(0, self.coinbase_portfolio.quantity_owned('BTC'))
+
+    # Nothing is recorded when any order can't be filled
+    with self.assertRaises(InsufficientFunds):
+      self.coinbase_portfolio.execute('2023-12-25', {'ETH': -2, 'SOL': 1000}, {'ETH': 2000, 'SOL': 100})
+
+    with self.assertRaises(InsufficientShares):
+      self.coinbase_portfolio.execute('2023-12-25', {'ETH': -3}, {'ETH': 2000})
+
+    self.assertEqual(4, len(self.coinbase_portfolio.transactions))
+    self.assertEqual(2, self.coinbase_portfolio.quantity_owned('ETH'))
+
+  def test_execute_matches_buy_and_sell(self):
+    # Prices and quantities whose fees are ties once scaled, where rounding the scaled float would be a unit off
+    prices = {'W': 100.3, 'X': 100.5, 'Y': 100.55, 'Z': 100.65}
+    quantities = {'W': 0.25, 'X': 0.25, 'Y': 1.5, 'Z': 0.5}
+
+    for fixed_point in (False, True):
+      sequential = Portfolio(Coinbase(), 10000, fixed_point=fixed_point)
+      batch = Portfolio(Coinbase(), 10000, fixed_point=fixed_point)
+
+      for ticker, quantity in quantities.items():
+        sequential.buy(ticker, '2023-12-23', prices[ticker], quantity)
+      batch.execute('2023-12-23', quantities, prices)
+
+      self.assertEqual(0.1505, sequential.transactions['fee'].iloc[0])
+      self.assertEqual(9974.7745, sequential.transactions['cash'].iloc[0])
+
+      for ticker, quantity in quantities.items():
+        sequential.sell(ticker, '2023-12-24', prices[ticker], quantity)
+      batch.execute('2023-12-24', {ticker: -quantity for ticker, quantity in quantities.items()}, prices)
+
+      self.assertTrue(sequential.transactions.equals(batch.transactions))
+      self.assertEqual(sequential.cash(), batch.cash())
+
+  def test_rebalance(self):
+    prices = {'BTC': 40000, 'ETH': 2000, 'SOL': 100}
+
+    orders = self.portfolio.rebalance('2023-12-23', {'BTC': 0.5, 'ETH': 0.25}, prices)
+
+    self.assertEqual({'BTC': 0.125, 'ETH': 1.25}, orders)
+    self.assertEqual(2500, self.portfolio.cash())
+
+    # ETH isn't in the targets anymore so it's sold off, and BTC is trimmed to pay for SOL
+    orders = self.portfolio.rebalance('2023-12-24', {'BTC': 0.25, 'SOL': 0.5}, {**prices, 'BTC': 48000})
+
+    self.assertEqual({'BTC': -0.0677, 'ETH': -1.25, 'SOL': 55.0}, orders)
+    self.assertEqual(0, self.portfolio.quantity_owned('ETH'))
+    self.assertEqual(2749.6, self.portfolio.cash())
+
+    with self.assertRaises(ValueError):
+      self.portfolio.rebalance('2023-12-25', {'BTC': 0.75, 'SOL': 0.5}, prices)
+
+    # With fees, the buys are sized so they fit in the cash
+    self.coinbase_portfolio.rebalance('2023-12-23', {'BTC': 0.5, 'ETH': 0.5}, prices)
+
+    self.assertGreaterEqual(self.coinbase_portfolio.cash(), 0)
+    self.assertEqual(0.1242, self.coinbase_portfolio.quantity_owned('BTC'))
+
+  def test_fixed_point(self):
+    portfolio = Portfolio(Coinbase(), 10000, fixed_point=True)
+
+    for trade in (self.coinbase_portfolio, portfolio):
+      trade.buy('BTC', '2023-12-23', 35000, 0.1125)
+      trade.buy('ETH', '2023-12-23', 2000.55, percentage_of_cash=30)
+      trade.sell('BTC', '2023-12-24', 41000.01, percentage_of_shares=50)
+      trade.execute('2023-12-25', {'BTC': -0.0563, 'ETH': 0.1}, {'BTC': 42000, 'ETH': 2100.37})
+
+    self.assertEqual('int64', portfolio.ledger.column('cash').dtype)
+    self.assertEqual(self.coinbase_portfolio.cash(), portfolio.cash())
+    self.assertEqual(self.coinbase_portfolio.quantity_owned('ETH'), portfolio.quantity_owned('ETH'))
+    # The same as the float ledger, besides cash_delta, which isn't rounded there
+    self.assertTrue(self.coinbase_portfolio.transactions.drop(columns='cash_delta').equals(
+      portfolio.transactions.drop(columns='cash_delta')))
+    self.assertEqual(self.coinbase_portfolio.transactions['cash_delta'].round(4).tolist(),
+                     portfolio.transactions['cash_delta'].tolist())
+
+    rebuilt = Portfolio.from_transactions(Coinbase(), 10000, portfolio.transactions, fixed_point=True)
+    self.assertTrue(rebuilt.transactions.equals(portfolio.transactions))
+    self.assertEqual(portfolio.quantity_owned('ETH'), rebuilt.quantity_owned('ETH'))
+
+  def test_fixed_point_quantities_dont_drift(self):
+    portfolio = Portfolio(FreeExchange(), 10000, fixed_point=True)
+
+    for trade in (self.portfolio, portfolio):
+      for _ in range(3):
+        trade.buy('BTC', '2023-12-23', 100, 0.1)
+      trade.sell('BTC', '2023-12-24', 100, percentage_of_shares=100)
+
+    # 0.1 + 0.1 + 0.1 is 0.30000000000000004 as floats, so selling 0.3 leaves a sliver behind
+    self.assertGreater(self.portfolio.quantity_owned('BTC'), 0)
+    self.assertEqual(0, portfolio.quantity_owned('BTC'))
+    self.assertEqual(10000, portfolio.cash())
+
+  def test_fixed_point_quantities_are_truncated(self):
+    portfolio = Portfolio(FreeExchange(), 10000, fixed_point=True)
+
+    # Rounding to 4 decimal places would buy 0.0002 here, more than was asked for
+    portfolio.buy('BTC', '2023-12-23', 100, 0.00015)
+    portfolio.buy('BTC', '2023-12-23', 100, 0.00019)
+    self.assertEqual(0.0002, portfolio.quantity_owned('BTC'))
+
+    portfolio.sell('BTC', '2023-12-24', 100, 0.00019)
+    portfolio.execute('2023-12-25', {'BTC': -0.00015, 'ETH': 0.57}, {'BTC': 100, 'ETH': 10})
+    self.assertEqual(0, portfolio.quantity_owned('BTC'))
+    self.assertEqual(0.57, portfolio.quantity_owned('ETH'))
+    self.assertEqual(9994.3, portfolio.cash())
+
+  def test_report(self):
+    portfolio = Portfolio(Coinbase(), 50000)
+
+    portfolio.buy('BTC', '2023-12-23', 40000, 0.125)
+    portfolio.buy('ETH', '2023-12-23', 2000, 1)
+    portfolio.sell('BTC', '2023-12-24', 45000, 0.125)
+    portfolio.buy('BTC', '2023-12-25', 40000, 0.125)
+    portfolio.sell('BTC', '2023-12-26', 35000, 0.125)
+    portfolio.sell('ETH', '2023-12-27', 1500, 1)
+
+    report = portfolio.report()
+
+    for metric in ['net_performance', 'avg_win_streak', 'max_win_streak', 'avg_loss_streak', 'max_loss_streak',
+                   'avg_win', 'avg_loss', 'avg_return', 'reward_to_risk_ratio']:
+      self.assertEqual(getattr(portfolio, metric)(), report[metric], metric)
+
+    self.assertEqual((3, 1, 2, 3), (report['positions'], report['wins'], report['losses'], report['round_trips']))
+    # From the peak of 50549.25 after the first BTC sell down to 49359 at the end
+    self.assertEqual(2.3546, report['max_drawdown'])
+    # BTC is held for 1 day twice and ETH for 4
+    self.assertEqual(pd.Timedelta(days=2), report['avg_length'])
+    self.assertEqual(2.0, portfolio.avg_length('1D'))
+    # 6 trades over 4 days
+    self.assertEqual(1.5, report['trades_per_day'])
+    self.assertEqual(1.5 * 365.25 / 12, report['trades_per_month'])
+
+    equity = pd.Series([100.0, 120.0, 90.0, 110.0], index=pd.date_range('2023-12-23', periods=4))
+    self.assertEqual(25.0, portfolio.max_drawdown(equity))
+    self.assertEqual(2.0, portfolio.trades_per_day(equity))
+
+  def test_report_without_trades(self):
+    report = self.portfolio.report()
+
+    self.assertEqual((0, 0, 0.0), (report['positions'], report['round_trips'], report['max_drawdown']))
+    self.assertIs(pd.NaT, report['avg_length'])
+    self.assertTrue(np.isnan(report['trades_per_day']))
+
+  def test_running_metrics(self):
+    portfolio = Portfolio(Coinbase(), 50000)
+
+    portfolio.buy('BTC', '2023-12-23', 40000, 0.125)
+    portfolio.sell('BTC', '2023-12-24', 45000, 0.125)
+    portfolio.buy('BTC', '2023-12-25', 40000, 0.125)
+    portfolio.sell('BTC', '2023-12-26', 35000, 0.125)
+    portfolio.buy('ETH', '2023-12-26', 2000, 1)
+    portfolio.sell('ETH', '2023-12-27', 1500, 0.5)
+
+    wins, losses = portfolio.wins(), portfolio.losses()
+
+    self.assertAlmostEqual(wins['gain'].mean(), portfolio.avg_win())
+    self.assertAlmostEqual(losses['gain'].mean(), portfolio.avg_loss())
+    self.assertAlmostEqual(portfolio.sells()['gain'].mean(), portfolio.avg_return())
+    self.assertEqual(losses['streak'].max(), portfolio.max_loss_streak())
+    self.assertEqual(losses['streak'].mean(), portfolio.avg_loss_streak())
+    self.assertEqual(2, portfolio.metrics.loss_streak)
+
+    rebuilt = Portfolio.from_transactions(Coinbase(), 50000, portfolio.transactions)
+    self.assertEqual(portfolio.report(), rebuilt.report())
+
+    portfolio.reset()
+    self.assertEqual((0, 0.0), (portfolio.metrics.sells(), portfolio.max_drawdown()))
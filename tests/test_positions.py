@@ -0,0 +1,71 @@
+import unittest
+from mega_money_millions.positions import LotRelief, Position, PositionBook
+
+
+class TestPosition(unittest.TestCase):
+  def buy_three_lots(self, lot_relief):
+    position = Position('BTC', lot_relief)
+    position.buy(30000, 0.5, 0)
+    position.buy(50000, 0.5, 0)
+    position.buy(40000, 0.5, 0)
+    return position
+
+  def test_fifo(self):
+    position = self.buy_three_lots(LotRelief.FIFO)
+    position.sell(0.75, 0, 1)
+
+    self.assertEqual(0.75, position.quantity)
+    self.assertEqual([(50000, 0.25), (40000, 0.5)], [(lot.price, lot.quantity) for lot in position.lots])
+    self.assertAlmostEqual(43333.3333, position.avg_purchase_price(), places=4)
+
+  def test_lifo(self):
+    position = self.buy_three_lots(LotRelief.LIFO)
+    position.sell(0.75, 0, 1)
+
+    self.assertEqual([(30000, 0.5), (50000, 0.25)], [(lot.price, lot.quantity) for lot in position.lots])
+    self.assertAlmostEqual(36666.6667, position.avg_purchase_price(), places=4)
+
+  def test_hifo(self):
+    position = self.buy_three_lots(LotRelief.HIFO)
+    position.sell(0.75, 0, 1)
+
+    self.assertEqual([(30000, 0.5), (40000, 0.25)], [(lot.price, lot.quantity) for lot in position.lots])
+    self.assertAlmostEqual(33333.3333, position.avg_purchase_price(), places=4)
+
+  def test_avg_purchase_price_with_fees(self):
+    position = Position('BTC')
+    position.buy(30000, 0.125, 22.5)
+    position.buy(35000, 0.125, 26.25)
+
+    self.assertEqual(32500, position.avg_purchase_price())
+    self.assertEqual(32524.375, position.avg_purchase_price(include_fees=True))
+
+    position.sell(0.25, 0, 1)
+
+    self.assertEqual(0, position.quantity)
+    self.assertEqual(0, position.avg_purchase_price(include_fees=True))
+
+  def test_next_streak(self):
+    position = Position('BTC')
+
+    self.assertEqual(1, position.next_streak(100))
+    position.sell(0, 100, 1)
+    self.assertEqual(2, position.next_streak(50))
+    position.sell(0, 50, 2)
+    self.assertEqual(1, position.next_streak(-10))
+    position.sell(0, -10, 1)
+    self.assertEqual(2, position.next_streak(-5))
+
+
+class TestPositionBook(unittest.TestCase):
+  def test_unknown_ticker(self):
+    book = PositionBook()
+
+    self.assertEqual(0.0, book.quantity('BTC'))
+    self.assertEqual(0, book.avg_purchase_price('BTC'))
+    self.assertNotIn('BTC', book)
+
+    book['BTC'].buy(40000, 0.25, 0)
+
+    self.assertIn('BTC', book)
+    self.assertEqual(0.25, book.quantity('BTC'))
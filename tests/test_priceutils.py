@@ -1,6 +1,9 @@
 import unittest
-from mega_money_millions.priceutils import combine_prices, ensure_correct_dtypes
+from functools import reduce
+import numpy as np
 import pandas as pd
+from mega_money_millions.priceutils import combine_many, combine_prices, compact_prices, ensure_correct_dtypes, \
+  memory_report, widen
 from tests import BTC_PICKLE_PATH, ETH_PICKLE_PATH, SHIB_PICKLE_PATH, XRP_PICKLE_PATH
 from pandas.testing import assert_frame_equal
 
@@ -67,3 +70,71 @@ class TestPortfolio(unittest.TestCase):
     self.assertEqual(eth_prices, all_combined.loc[all_combined.index.get_level_values('ticker') == 'ETH'])
     self.assertEqual(xrp_prices, all_combined.loc[all_combined.index.get_level_values('ticker') == 'XRP'])
     self.assertEqual(shib_prices, all_combined.loc[all_combined.index.get_level_values('ticker') == 'SHIB'])
+
+
+class TestCombineMany(unittest.TestCase):
+  def setUp(self):
+    self.btc_prices = pd.read_pickle(BTC_PICKLE_PATH)
+    self.eth_prices = pd.read_pickle(ETH_PICKLE_PATH)
+
+  def test_combine_many(self):
+    sol_prices = self.eth_prices.assign(ticker='SOL')
+    prices = combine_many(iter([self.btc_prices, self.eth_prices, sol_prices]))
+
+    self.assertTrue(prices.equals(combine_prices(combine_prices(self.btc_prices, self.eth_prices), sol_prices)))
+    self.assertTrue(prices.index.is_monotonic_increasing)
+    self.assertEqual(['BTC', 'ETH', 'SOL'], prices.index.get_level_values('ticker').unique().sort_values().tolist())
+
+    with self.assertRaises(ValueError):
+      combine_prices(self.btc_prices, self.btc_prices.drop(columns='ticker'))
+
+  def test_combine_prices_precedence(self):
+    date = self.btc_prices.index[10]
+    overrides = self.btc_prices.iloc[5:15].assign(close=1.0)
+    overrides.loc[date, 'close'] = None
+    multi = combine_prices(self.btc_prices, self.eth_prices)
+
+    # Earlier single-asset frames win, with gaps filled from later ones
+    prices = combine_prices(overrides, self.btc_prices, self.eth_prices)
+    self.assertEqual(1.0, prices.loc[(self.btc_prices.index[5], 'BTC'), 'close'])
+    self.assertEqual(self.btc_prices.loc[date, 'close'], prices.loc[(date, 'BTC'), 'close'])
+
+    # Multi-asset frames win over single-asset ones regardless of order
+    prices = combine_prices(overrides, multi)
+    self.assertTrue(prices.equals(multi))
+
+    # The same as combining pairwise from the left, where later frames only fill in gaps
+    for frames in ([overrides, multi, self.btc_prices], [overrides, self.btc_prices, multi],
+                   [multi, overrides, self.eth_prices]):
+      self.assertTrue(combine_prices(*frames).equals(reduce(combine_prices, frames)))
+    prices = combine_prices(overrides, self.btc_prices, multi)
+    self.assertEqual(1.0, prices.loc[(self.btc_prices.index[5], 'BTC'), 'close'])
+
+  def test_compact_prices(self):
+    prices = combine_prices(self.btc_prices, self.eth_prices)
+    compact = combine_prices(self.btc_prices, self.eth_prices, compact=True)
+
+    for column in ['open', 'close', 'high', 'low', 'volume']:
+      self.assertEqual('float32', compact[column].dtype)
+    self.assertEqual('bool', compact['complete'].dtype)
+    self.assertEqual('category', compact_prices(self.btc_prices)['ticker'].dtype)
+
+    # Prices have at most 7 significant digits, so widening gets back the exact float64 values
+    self.assertTrue(np.array_equal(prices['close'].to_numpy(), widen(compact['close'].to_numpy())))
+    self.assertEqual(6545.12, widen(np.float32(6545.12)))
+
+    # The same values as going through their shortest decimal strings, from tiny prices to volumes in the billions
+    values = np.array([0.00099043, 9.56826e-07, 0.1, 42123.45, 8989759000, 0, -3.25, np.nan, np.inf], dtype='float32')
+    self.assertTrue(np.array_equal(values.astype(str).astype('float64'), widen(values), equal_nan=True))
+    assert_frame_equal(pd.Series(values.astype(str).astype('float64'), name='close').to_frame(),
+                       widen(pd.Series(values, name='close')).to_frame())
+
+    report = memory_report(prices, compact)
+    self.assertLess(report['after'], report['before'])
+    self.assertEqual(report['columns']['close'][0], report['columns']['close'][1] * 2)
+
+    # A compact single-asset frame combines like any other, with its prices widened back (volume has more digits than
+    # float32 holds, so it doesn't come back exactly)
+    combined = combine_prices(compact_prices(self.btc_prices), self.eth_prices)
+    columns = ['close', 'open', 'high', 'low', 'complete']
+    self.assertTrue(combined[columns].equals(prices[columns]))
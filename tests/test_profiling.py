@@ -0,0 +1,101 @@
+import os
+import pstats
+import tempfile
+import unittest
+from mega_money_millions.backtester import run_backtest
+from mega_money_millions.dateutils import days_ago, start_of_day_utc, parse_date
+from mega_money_millions.exchange import Coinbase
+from mega_money_millions.indicators.singleasset import add_crossover, add_sma
+from mega_money_millions.portfolio import Portfolio
+from mega_money_millions.priceutils import combine_prices
+from mega_money_millions.profiling import Profiler
+from tests import load_btc_pickle, load_eth_pickle, sma_crossover
+
+
+class TestProfiler(unittest.TestCase):
+  def setUp(self):
+    btc_prices = load_btc_pickle()
+    add_sma(btc_prices, 45)
+    add_sma(btc_prices, 90)
+    add_crossover(btc_prices, 'SMA45', 'SMA90', 'SMACrossUp', 'SMACrossDown')
+
+    self.prices = combine_prices(btc_prices, load_eth_pickle())
+    self.end_at = start_of_day_utc(parse_date('2024-01-06'))
+    self.start_at = days_ago(365 * 5, self.end_at)
+
+  def test_run_backtest(self):
+    profiler = Profiler()
+    portfolio = run_backtest(self.prices, 10000, self.start_at, self.end_at, on_tick=sma_crossover, profiler=profiler,
+                             record_equity=True)
+
+    # Profiling doesn't change the result
+    self.assertEqual(20803.7814, portfolio.cash())
+
+    report = profiler.report()
+    buys, sells = len(portfolio.buys()), len(portfolio.sells())
+
+    self.assertEqual(len(portfolio.equity_curve), report['ticks'])
+    self.assertEqual({'buy': buys, 'sell': sells, 'max_quantity': buys, 'fee_for_buy': buys, 'fee_for_sell': sells,
+                      'ledger.append': buys + sells}, report['calls'])
+    self.assertEqual(set(Profiler.PHASES), set(report['phases'].keys()))
+
+    for phase in ['slicing', 'strategy', 'equity']:
+      self.assertEqual(report['ticks'], report['phases'][phase]['calls'])
+    self.assertEqual(buys + sells, report['phases']['execution']['calls'])
+
+    strategy = report['phases']['strategy']
+    self.assertEqual(strategy['calls'], sum(strategy['histogram']['counts']))
+    self.assertLessEqual(strategy['p50_us'], strategy['max_us'])
+    self.assertGreater(strategy['total_s'], report['phases']['execution']['total_s'])
+    self.assertNotIn('allocations', report)
+
+    # Coinbase accounts share one exchange, which is left as it was, so a second run isn't timed twice over
+    exchange = Coinbase()
+    for _ in range(2):
+      profiler = Profiler()
+      portfolio = run_backtest(self.prices, 10000, self.start_at, self.end_at, on_tick=sma_crossover,
+                               profiler=profiler, exchange=exchange)
+
+      buys, sells = len(portfolio.buys()), len(portfolio.sells())
+      self.assertEqual(buys, profiler.report()['calls']['fee_for_buy'])
+      self.assertEqual(2 * buys + sells, profiler.report()['phases']['fees']['calls'])
+      self.assertNotIn('fee_for_buy', vars(exchange))
+      self.assertNotIn('buy', vars(portfolio))
+      self.assertNotIn('append', vars(portfolio.ledger))
+
+  def test_allocations_and_cprofile(self):
+    profiler = Profiler(allocations=True, cprofile=True)
+    run_backtest(self.prices, 10000, self.start_at, self.end_at, on_tick=sma_crossover, profiler=profiler)
+
+    allocations = profiler.report()['allocations']
+    self.assertGreater(allocations['max_peak_bytes'], 0)
+    self.assertLessEqual(allocations['mean_peak_bytes'], allocations['max_peak_bytes'])
+
+    with tempfile.TemporaryDirectory() as directory:
+      path = os.path.join(directory, 'backtest.prof')
+      profiler.dump_stats(path)
+      functions = [function for _, _, function in pstats.Stats(path).stats.keys()]
+
+    self.assertIn('sma_crossover', functions)
+
+    with self.assertRaises(ValueError):
+      Profiler().stats()
+
+  def test_instrument(self):
+    profiler = Profiler()
+    portfolio = profiler.instrument(Portfolio(Coinbase(), 10000))
+
+    portfolio.rebalance('2023-12-23', {'BTC': 0.5, 'ETH': 0.5}, {'BTC': 40000, 'ETH': 2000})
+
+    report = profiler.report()
+    self.assertEqual(1, report['calls']['rebalance'])
+    self.assertEqual(1, report['calls']['execute'])
+    self.assertEqual(1, report['calls']['ledger.extend'])
+    # execute is called from rebalance, so only rebalance is timed
+    self.assertEqual(1, report['phases']['execution']['calls'])
+    self.assertEqual(2, len(portfolio.transactions))
+
+    profiler.restore()
+    portfolio.sell('BTC', '2023-12-24', 40000, 0.01)
+    self.assertEqual(1, profiler.report()['calls']['rebalance'])
+    self.assertNotIn('sell', profiler.report()['calls'])
@@ -0,0 +1,74 @@
+import os
+import tempfile
+import unittest
+import pandas as pd
+from mega_money_millions.dateutils import parse_date
+from mega_money_millions.priceutils import combine_prices, compact_prices
+from mega_money_millions.store import PriceStore
+from tests import load_btc_pickle, load_eth_pickle
+
+
+class TestPriceStore(unittest.TestCase):
+  def setUp(self):
+    self.btc_prices, self.eth_prices = load_btc_pickle(), load_eth_pickle()
+    self.directory = tempfile.TemporaryDirectory() # pylint: disable=consider-using-with
+    self.store = PriceStore(self.directory.name)
+
+    self.store.write(self.btc_prices)
+    self.store.write(self.eth_prices)
+
+  def tearDown(self):
+    self.directory.cleanup()
+
+  def test_load(self):
+    self.assertEqual(['BTC', 'ETH'], self.store.tickers())
+    self.assertEqual('2018-06', self.store.partitions('BTC')[0])
+    self.assertTrue(os.path.isfile(os.path.join(self.directory.name, 'BTC', '2024-01', 'close.npy')))
+
+    self.assertTrue(self.store.load().equals(combine_prices(self.btc_prices, self.eth_prices)))
+
+    with self.assertRaises(KeyError):
+      self.store.load(['XRP'])
+
+  def test_load_range_and_columns(self):
+    start_at, end_at = parse_date('2023-03-15'), parse_date('2023-06-02')
+    prices = self.store.load(['BTC'], start_at, end_at, columns=['close', 'complete'])
+    expected = self.btc_prices.loc[start_at:end_at, ['close', 'complete']]
+
+    self.assertEqual(['close', 'complete'], prices.columns.tolist())
+    self.assertTrue(prices.droplevel('ticker').equals(expected))
+
+    # Nothing in range still has the right columns
+    empty = self.store.load(['BTC'], parse_date('2030-01-01'), parse_date('2030-02-01'), columns=['close'])
+    self.assertEqual(0, len(empty))
+    self.assertEqual(['close'], empty.columns.tolist())
+
+  def test_iter_chunks(self):
+    start_at, end_at = parse_date('2023-03-15'), parse_date('2023-06-02')
+    chunks = list(self.store.iter_chunks(start_at=start_at, end_at=end_at))
+
+    self.assertEqual(4, len(chunks))
+    self.assertEqual([start_at, parse_date('2023-03-31')],
+                     chunks[0].index.get_level_values('time')[[0, -1]].tolist())
+    self.assertTrue(pd.concat(chunks).equals(self.store.load(start_at=start_at, end_at=end_at)))
+
+  def test_write_replaces_existing_times(self):
+    self.store.write(self.btc_prices.iloc[-3:].assign(close=1.0))
+
+    self.assertEqual(len(self.btc_prices), len(self.store.load(['BTC'])))
+    self.assertEqual([self.btc_prices['close'].iloc[-4], 1.0, 1.0, 1.0],
+                     self.store.load(['BTC'])['close'].tail(4).tolist())
+    self.assertEqual(self.btc_prices.index[-1], self.store.last_timestamp('BTC'))
+    self.assertIsNone(self.store.last_timestamp('XRP'))
+
+  def test_compact_and_multi_asset_prices(self):
+    store = PriceStore(os.path.join(self.directory.name, 'compact'))
+    prices = compact_prices(combine_prices(self.btc_prices, self.eth_prices))
+    store.write(prices)
+
+    loaded = store.load()
+    self.assertTrue(loaded.equals(prices))
+    self.assertEqual('float32', loaded['close'].dtype)
+
+    with self.assertRaises(ValueError):
+      store.write(pd.DataFrame({'close': [1.0]}))
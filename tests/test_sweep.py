@@ -0,0 +1,74 @@
+import unittest
+import numpy as np
+import pandas as pd
+from mega_money_millions.dateutils import parse_date
+from mega_money_millions.indicators.singleasset import add_crossover, add_sma
+from mega_money_millions.priceutils import combine_prices
+from mega_money_millions.sweep import SharedPrices, parameter_combinations, run_sweep
+from tests import load_btc_pickle, load_eth_pickle
+
+
+def sma_crossover_strategy(fast, slow, percentage_of_cash):
+  cross_up, cross_down = f'SMA{fast}_{slow}CrossUp', f'SMA{fast}_{slow}CrossDown'
+
+  def __on_tick(date, portfolio, prices_for_date):
+    btc = prices_for_date.loc['BTC']
+
+    if btc[cross_up] and portfolio.cash() > 0:
+      portfolio.buy('BTC', date, btc['close'], percentage_of_cash=percentage_of_cash)
+    elif btc[cross_down] and portfolio.quantity_owned('BTC') > 0:
+      portfolio.sell('BTC', date, btc['close'], percentage_of_shares=100)
+
+  return __on_tick
+
+
+class TestSweep(unittest.TestCase):
+  def setUp(self):
+    btc_prices = load_btc_pickle()
+    eth_prices = load_eth_pickle()
+
+    for prices in (btc_prices, eth_prices):
+      for window in (20, 45, 50, 90):
+        add_sma(prices, window)
+      for fast, slow in ((45, 90), (20, 50)):
+        add_crossover(prices, f'SMA{fast}', f'SMA{slow}', f'SMA{fast}_{slow}CrossUp', f'SMA{fast}_{slow}CrossDown')
+
+    self.prices = combine_prices(btc_prices, eth_prices)
+
+  def test_parameter_combinations(self):
+    self.assertEqual([{'fast': 45, 'slow': 90}, {'fast': 20, 'slow': 90}],
+                     parameter_combinations({'fast': [45, 20], 'slow': [90]}))
+    self.assertEqual([{'fast': 45}], parameter_combinations([{'fast': 45}]))
+
+  def test_shared_prices(self):
+    self.prices.iloc[0, self.prices.columns.get_loc('complete')] = pd.NA
+    self.prices['volume'] = self.prices['volume'].astype('float32')
+
+    shared = SharedPrices(self.prices)
+    try:
+      shm, prices = SharedPrices.attach(shared.spec)
+
+      self.assertTrue(np.shares_memory(prices['close'].to_numpy(), np.frombuffer(shm.buf, dtype='uint8')))
+      # Columns in the same order, with the same dtypes and missing values (eg: for strategies checking pd.isna)
+      pd.testing.assert_frame_equal(self.prices, prices)
+
+      del prices
+      shm.close()
+    finally:
+      shared.close()
+
+  def test_run_sweep(self):
+    grid = [{'fast': 45, 'slow': 90, 'percentage_of_cash': 100}, {'fast': 20, 'slow': 50, 'percentage_of_cash': 50}]
+    start_at, end_at = parse_date('2019-01-06'), parse_date('2024-01-06')
+
+    results = run_sweep(self.prices, grid, sma_crossover_strategy, 10000, start_at, end_at, processes=2)
+    serial_results = run_sweep(self.prices, grid, sma_crossover_strategy, 10000, start_at, end_at, processes=1)
+
+    self.assertEqual(grid, [result['params'] for result in results])
+    self.assertEqual(108.0378, results[0]['net_performance'])
+    self.assertEqual(20803.7814, results[0]['transactions'].iloc[-1]['cash'])
+
+    for result, serial_result in zip(results, serial_results):
+      self.assertEqual(serial_result['net_performance'], result['net_performance'])
+      self.assertEqual((serial_result['wins'], serial_result['losses']), (result['wins'], result['losses']))
+      self.assertTrue(serial_result['transactions'].equals(result['transactions']))